@@ -0,0 +1,124 @@
+"""
+Benchmarks the DAX dependency indexer (build_dax_dependency_index and the Dependencies and Unused Objects transforms)
+on synthetic semantic models of growing size, against a naive scan which searches every column and measure name in
+every expression of its semantic model. The naive scan time is estimated from a sample of expressions, as it grows
+with the number of expressions times the number of objects.
+
+Usage: python -m benchmarks.bench_dax_dependencies [--datasets 5] [--tables 200] [--columns 20] [--measures 10] [--scales 1,2,4]
+"""
+import time
+import random
+import argparse
+from benchmarks.synthetic import generate_datasets_info_data
+from src.transformer import (
+    normalize_datasets_info,
+    transform_relationships_info,
+    transform_columns_info,
+    transform_measures_info,
+    transform_calc_groups,
+    build_dax_dependency_index,
+    transform_dax_dependencies,
+    transform_unused_objects
+)
+
+NAIVE_SAMPLE_EXPRESSIONS = 200
+
+
+def add_measure_references(datasets_info_data, n_columns, seed=0):
+    """
+    Rewrites the synthetic measures to refer to other measures, qualified and unqualified columns, with string literals
+    and comments, and adds a calculated column per table.
+    """
+    rng = random.Random(seed)
+
+    for record in datasets_info_data:
+        measures = record["info_measures"]
+        names = [i["[measure_name]"] for i in measures]
+
+        for i, measure in enumerate(measures):
+            table_name = f"Table {measure['[table_id]'] - 1}"
+            other = names[rng.randrange(i)] if i else names[0]
+            measure["[dax_expression]"] = (
+                f"VAR _total = CALCULATE([{other}], '{table_name}'[Column {rng.randrange(n_columns)}] <> \"[Not a reference]\")\n"
+                f"// Divides by [{names[rng.randrange(len(names))]}] when defined\n"
+                f"RETURN DIVIDE(_total, SUMX('{table_name}', '{table_name}'[Column {rng.randrange(n_columns)}]))"
+            )
+
+        for table in record["info_tables"]:
+            record["info_columns"].append({
+                **record["info_columns"][0],
+                "[column_id]": table["[table_id]"] * 1000 + n_columns,
+                "[table_id]": table["[table_id]"],
+                "[column_name]": "Calculated",
+                "[column_type]": "DAX",
+                "[dax_expression]": f"[Column {rng.randrange(n_columns)}] * 2"
+            })
+
+
+def naive_dependencies(columns_df, measures_df, n_expressions):
+    """
+    Searches the names of every column and measure of a semantic model in each of its first n_expressions measure
+    expressions. Returns the number of expressions scanned and the number of names found.
+    """
+    objects = {}
+
+    for (workspace_id, dataset_id, table_name, name) in zip(columns_df["workspace_id"], columns_df["dataset_id"], columns_df["table_name"], columns_df["column_name"]):
+        objects.setdefault((workspace_id, dataset_id), []).append(f"'{table_name}'[{name}]")
+
+    for (workspace_id, dataset_id, name) in zip(measures_df["workspace_id"], measures_df["dataset_id"], measures_df["measure_name"]):
+        objects.setdefault((workspace_id, dataset_id), []).append(f"[{name}]")
+
+    scanned = found = 0
+
+    for workspace_id, dataset_id, expression in zip(measures_df["workspace_id"], measures_df["dataset_id"], measures_df["dax_expression"]):
+        if scanned == n_expressions:
+            break
+
+        found += sum(1 for name in objects[(workspace_id, dataset_id)] if name in expression)
+        scanned += 1
+
+    return scanned, found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--datasets", type=int, default=5)
+    parser.add_argument("--tables", type=int, default=200)
+    parser.add_argument("--columns", type=int, default=20)
+    parser.add_argument("--measures", type=int, default=10)
+    parser.add_argument("--scales", default="1,2,4")
+    args = parser.parse_args()
+
+    print(f"{'tables':>8} {'expressions':>12} {'edges':>8} {'unused':>8} {'indexer':>10} {'per 1k expr':>12} {'naive (est.)':>13}")
+
+    for scale in [int(i) for i in args.scales.split(",")]:
+        n_tables = args.tables * scale
+        datasets_info_data = generate_datasets_info_data(args.datasets, n_tables, args.columns, args.measures)
+        add_measure_references(datasets_info_data, args.columns)
+
+        info_frames = normalize_datasets_info(datasets_info_data)
+        columns_df = transform_columns_info(datasets_info_data, info_frames)
+        measures_df = transform_measures_info(datasets_info_data, info_frames)
+        calc_groups_df = transform_calc_groups(datasets_info_data, info_frames)
+        relationships_df = transform_relationships_info(datasets_info_data, info_frames)
+
+        start = time.perf_counter()
+        dependency_index = build_dax_dependency_index(columns_df, measures_df, calc_groups_df, relationships_df)
+        dependencies_df = transform_dax_dependencies(dependency_index)
+        unused_objects_df = transform_unused_objects(dependency_index)
+        elapsed = time.perf_counter() - start
+
+        n_expressions = int(measures_df["dax_expression"].notna().sum() + columns_df["dax_expression"].notna().sum() + len(calc_groups_df))
+
+        start = time.perf_counter()
+        scanned, _ = naive_dependencies(columns_df, measures_df, NAIVE_SAMPLE_EXPRESSIONS)
+        naive_elapsed = (time.perf_counter() - start) * n_expressions / scanned
+
+        print(
+            f"{args.datasets * n_tables:>8} {n_expressions:>12} {len(dependencies_df):>8} {len(unused_objects_df):>8} {elapsed:>8.2f} s "
+            f"{elapsed * 1000 / n_expressions:>10.3f} s {naive_elapsed:>11.2f} s"
+        )
+
+
+if __name__ == "__main__":
+    main()
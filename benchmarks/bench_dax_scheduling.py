@@ -0,0 +1,74 @@
+"""
+Benchmarks the scheduling of the Dax Studio CMD exports of extract_datasets_dax_info with the fake Dax Studio CMD
+(benchmarks.fake_dscmd), on semantic models of skewed sizes whose slowest ones come last. Reports the run time in the
+given order, then longest first with the duration history of the first run, and with a hung semantic model which is
+killed after its timeout and retried once.
+
+Usage: python -m benchmarks.bench_dax_scheduling [--datasets 24] [--slow 3] [--slow-seconds 2] [--workers 4] [--timeout 3]
+"""
+import os
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+from benchmarks.run_suite import create_fake_dscmd
+from src.dax_durations import DaxDurationHistory
+from src.extract_dax_info_tables import extract_datasets_dax_info
+
+
+def build_datasets(n_datasets, n_slow, hung=False):
+    """
+    Returns the datasets list of the run, with the slow semantic models (and the hung one) last.
+    """
+    datasets = [
+        {"workspace_id": "workspace-0", "workspace_name": "Workspace 0", "dataset_id": f"dataset-{i}", "dataset_name": f"Semantic Model {i}"}
+        for i in range(n_datasets)
+    ]
+
+    if hung:
+        datasets.append({"workspace_id": "workspace-0", "workspace_name": "Workspace 0", "dataset_id": "dataset-hung", "dataset_name": "Hung"})
+
+    return datasets
+
+
+def run(datasets, workers, dscmd_exe, history, timeout):
+    start = time.perf_counter()
+    data = extract_datasets_dax_info("tenant", "client", "secret", datasets, workers, dscmd_exe, history=history, timeout=timeout, max_retries=1)
+    return time.perf_counter() - start, len(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--datasets", type=int, default=24)
+    parser.add_argument("--slow", type=int, default=3)
+    parser.add_argument("--slow-seconds", type=float, default=2)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--timeout", type=float, default=3)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    directory = tempfile.mkdtemp(prefix="bench_dax_scheduling_")
+    durations = {f"Semantic Model {i}": args.slow_seconds for i in range(args.datasets - args.slow, args.datasets)}
+    durations["Hung"] = 3600
+    os.environ["BENCH_DSCMD_DURATIONS"] = json.dumps(durations)
+    os.environ["BENCH_MODEL"] = json.dumps({"tables": 5, "columns": 5, "measures": 2})
+
+    try:
+        dscmd_exe = create_fake_dscmd(directory)
+        history = DaxDurationHistory()
+        print(f"{args.datasets} semantic models, {args.slow} of {args.slow_seconds:.1f} s, {args.workers} workers, {args.timeout:.0f} s timeout")
+
+        for name, hung in [("given order", False), ("longest first", False), ("longest first, hung", True)]:
+            elapsed, exported = run(build_datasets(args.datasets, args.slow, hung), args.workers, dscmd_exe, history, args.timeout)
+            print(f"{name:<22} {elapsed:>7.2f} s   {exported} exported")
+
+        history.report()
+
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Benchmarks reading Dax Studio json outputs with json.load into lists of row dicts, against streaming them into
+columnar InfoRows (read_dscmd_info_tables). Reports the time and peak memory to read all outputs and keep them
+until the transforms, the memory they retain, and checks that both give identical transformed outputs.
+
+Usage: python -m benchmarks.bench_dscmd_reader [--datasets 4] [--tables 1000] [--columns 20] [--measures 5]
+"""
+import os
+import gc
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+from datetime import datetime
+import pandas as pd
+from benchmarks.synthetic import generate_dataset_info_tables
+from src.extract_dax_info_tables import INFO_TABLES_KEYS
+from src.info_rows import read_dscmd_info_tables
+from src.transformer import (
+    normalize_datasets_info,
+    transform_relationships_info,
+    transform_tables_info,
+    transform_columns_info,
+    transform_measures_info,
+    transform_calc_groups
+)
+
+
+def write_dscmd_outputs(directory, n_datasets, tables, columns, measures):
+    """
+    Writes one Dax Studio json output per dataset, as benchmarks.fake_dscmd does. Returns the files by dataset name.
+    """
+    files = {}
+
+    for d in range(n_datasets):
+        dataset_name = f"Semantic Model {d}"
+        file_name = os.path.join(directory, f"dataset_{d}.json")
+        rows = generate_dataset_info_tables(dataset_name, tables, columns, measures)
+
+        with open(file_name, "w", encoding="utf-8") as file:
+            json.dump({"results": [{"tables": [{"rows": i} for i in rows]}]}, file)
+
+        files[dataset_name] = file_name
+
+    return files
+
+
+def read_json_load(file_name):
+    with open(file_name, "r", encoding="utf-8") as file:
+        response = json.load(file).get("results")[0]["tables"]
+
+    return {key: table.get("rows") for key, table in zip(INFO_TABLES_KEYS, response)}
+
+
+def read_dscmd_outputs(file_name):
+    return read_dscmd_info_tables(file_name, INFO_TABLES_KEYS)
+
+
+def read_all(files, read, timestamp):
+    data = []
+
+    for d, (dataset_name, file_name) in enumerate(files.items()):
+        record = {"workspace_id": "workspace-0", "workspace_name": "Workspace 0", "dataset_id": f"dataset-{d}", "dataset_name": dataset_name,
+                  "extract_timestamp": timestamp}
+        record.update(read(file_name))
+        data.append(record)
+
+    return data
+
+
+def transform_all(datasets_info_data):
+    info_frames = normalize_datasets_info(datasets_info_data)
+    return [
+        transform_tables_info(datasets_info_data, info_frames),
+        transform_columns_info(datasets_info_data, info_frames),
+        transform_measures_info(datasets_info_data, info_frames),
+        transform_calc_groups(datasets_info_data, info_frames),
+        transform_relationships_info(datasets_info_data, info_frames)
+    ]
+
+
+def measure(files, read, timestamp):
+    """
+    Returns the read time, read peak memory and retained memory in MB, transform time and transformed outputs.
+    """
+    gc.collect()
+    tracemalloc.start()
+
+    start = time.perf_counter()
+    data = read_all(files, read, timestamp)
+    read_elapsed = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    outputs = transform_all(data)
+    transform_elapsed = time.perf_counter() - start
+
+    return read_elapsed, peak / 1024 ** 2, retained / 1024 ** 2, transform_elapsed, outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--datasets", type=int, default=4)
+    parser.add_argument("--tables", type=int, default=1000)
+    parser.add_argument("--columns", type=int, default=20)
+    parser.add_argument("--measures", type=int, default=5)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench_dscmd_reader_")
+
+    try:
+        files = write_dscmd_outputs(directory, args.datasets, args.tables, args.columns, args.measures)
+        size = sum(os.path.getsize(i) for i in files.values()) / 1024 ** 2
+        print(f"{args.datasets} Dax Studio outputs, {size:.1f} MB of json")
+
+        results = {}
+        timestamp = datetime.now()
+
+        for name, read in [("json.load row dicts", read_json_load), ("streamed InfoRows", read_dscmd_outputs)]:
+            read_elapsed, peak, retained, transform_elapsed, outputs = measure(files, read, timestamp)
+            results[name] = outputs
+            print(
+                f"{name:<22} read {read_elapsed:>6.2f} s {peak:>8.1f} MB peak {retained:>8.1f} MB retained   "
+                f"transform {transform_elapsed:>6.2f} s"
+            )
+
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    for expected, actual in zip(*results.values()):
+        pd.testing.assert_frame_equal(expected, actual)
+
+    print("Transformed outputs are identical.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmarks the memory of the standard and streaming Excel exports on a synthetic columns-like dataframe.
+Each mode runs in a separate process, so peak RSS values do not interfere with each other.
+
+Usage: python -m benchmarks.bench_excel_export [--rows 1000000] [--modes standard streaming]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+import pandas as pd
+from src.loader import export_dataframes_to_excel
+
+
+def peak_rss_mb():
+    """
+    Returns the peak resident set size of the current process in MB.
+    """
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def generate_columns_dataframe(n_rows, seed=0):
+    """
+    Generates a dataframe with the same columns as transform_columns_info.
+    """
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "workspace_id": rng.choice([f"workspace-{i}" for i in range(20)], n_rows),
+        "workspace_name": rng.choice([f"Workspace {i}" for i in range(20)], n_rows),
+        "dataset_id": rng.choice([f"dataset-{i}" for i in range(200)], n_rows),
+        "dataset_name": rng.choice([f"Dataset {i}" for i in range(200)], n_rows),
+        "table_name": rng.choice([f"Table {i}" for i in range(2000)], n_rows),
+        "column_name": [f"Column {i}" for i in range(n_rows)],
+        "column_type": rng.choice(["M", "DAX"], n_rows),
+        "dax_expression": None,
+        "data_type": rng.choice(["Text", "Integer", "Decimal", "DateTime"], n_rows),
+        "description": None,
+        "display_folder": rng.choice([None, "Keys", "Attributes"], n_rows),
+        "is_hidden_flag": rng.integers(0, 2, n_rows),
+        "modified_at": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 10 ** 6, n_rows), unit="s"),
+        "extract_timestamp": pd.Timestamp.now(),
+    })
+
+
+def run_mode(mode, n_rows):
+    """
+    Exports the synthetic dataframe in the given mode and prints the measurements as json.
+    """
+    df = generate_columns_dataframe(n_rows)
+    baseline = peak_rss_mb()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file_name = os.path.join(temp_dir, "bench.xlsx")
+
+        start = time.perf_counter()
+        export_dataframes_to_excel(file_name, [df], ["Columns"], streaming=(mode == "streaming"))
+        elapsed = time.perf_counter() - start
+        file_size = os.path.getsize(file_name)
+
+    print(json.dumps({
+        "mode": mode,
+        "rows": n_rows,
+        "seconds": round(elapsed, 2),
+        "baseline_rss_mb": round(baseline, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "file_mb": round(file_size / 1024 ** 2, 1)
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--modes", nargs="+", default=["standard", "streaming"], choices=["standard", "streaming"])
+    parser.add_argument("--run-mode", choices=["standard", "streaming"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_mode:
+        run_mode(args.run_mode, args.rows)
+        return
+
+    for mode in args.modes:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_excel_export", "--rows", str(args.rows), "--run-mode", mode],
+            capture_output=True, text=True, check=True
+        )
+        result = json.loads(output.stdout.strip().splitlines()[-1])
+        print(
+            f"{result['mode']:<10} {result['rows']:>9} rows {result['seconds']:>8.1f} s "
+            f"{result['peak_rss_mb'] - result['baseline_rss_mb']:>9.1f} MB above baseline ({result['peak_rss_mb']} MB peak RSS)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Checks the retries of failed requests against the mock services (benchmarks.mock_services) with injected failures.
+Each scenario reports its wall time and requests by endpoint family, and fails the run (exit code 1) if a check fails:
+- throttling: a 429 with a Retry-After halves the rate of the endpoint family and pauses all its requests, then the
+  request is retried.
+- server errors: 503 responses are retried with jittered exponential backoff until one succeeds.
+- circuit breaker: requests still failing after their retries open the breaker of the endpoint family, which blocks
+  requests until a single trial request, sent without retries, succeeds.
+- upload_file_in_chunks: a chunk fails with a 503 after the upload session acknowledged half of it. The chunk is only
+  retried by the upload, once, resuming from the acknowledged byte, without retries of the rate controller.
+
+Usage: python -m benchmarks.bench_http_faults [--chunks 4] [--latency 0.0]
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.run_suite import MockServicesProcess
+from src.metrics import metrics
+
+
+def sum_requests(requests_counts, prefix):
+    """
+    Returns the requests of the endpoint families starting with prefix.
+    """
+    return sum(count for family, count in requests_counts.items() if family.startswith(prefix))
+
+
+def get_counter(name, **labels):
+    return metrics.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+
+def timed(func):
+    """
+    Returns the result of func and its wall time, or the exception it raised and its wall time.
+    """
+    start = time.perf_counter()
+
+    try:
+        result = func()
+
+    except Exception as e:
+        result = e
+
+    return result, time.perf_counter() - start
+
+
+def report(name, services, elapsed):
+    stats = services.stats()
+    print(f"{name:<28} {elapsed:>7.2f} s   {stats['requests']}")
+    return stats
+
+
+def check_throttling(services, path):
+    """
+    Sends a request which gets a 429 with a Retry-After of 1 s, and another one to the same endpoint family during the
+    pause. Returns the list of (check, passed).
+    """
+    from src.http_client import HttpClient
+    from src.rate_limiter import RateController, get_endpoint_family
+
+    url = f"{services.url}{path}"
+    rate_controller = RateController(default_rate=20)
+    services.set_faults([{"path": path, "method": "GET", "status": 429, "retry_after": 1, "count": 1}])
+    services.reset()
+
+    with HttpClient(rate_controller=rate_controller) as http_client, ThreadPoolExecutor(1) as executor:
+        throttled = executor.submit(timed, lambda: http_client.get(url))
+        time.sleep(0.2)
+        response, elapsed = timed(lambda: http_client.get(url))
+        throttled_response, throttled_elapsed = throttled.result()
+
+    services.set_faults([])
+    stats = report("throttling", services, throttled_elapsed)
+    family = get_endpoint_family(url)
+    bucket = rate_controller.buckets[family]
+
+    return [
+        ("throttled request retried", getattr(throttled_response, "status_code", None) == 200),
+        ("throttled request retried after its Retry-After", throttled_elapsed >= 1),
+        ("concurrent request paused", getattr(response, "status_code", None) == 200 and elapsed >= 0.7),
+        ("rate halved, then recovering by 5% per success", abs(bucket.rate - bucket.max_rate * 0.6) < 1e-9),
+        ("3 requests, 1 retry", stats["total"] == 3 and get_counter("http_retries_total", family=family, reason="429") == 1)
+    ]
+
+
+def check_server_errors(services, path):
+    """
+    Sends a request which gets 3 503 responses before succeeding. Returns the list of (check, passed).
+    """
+    from src.http_client import HttpClient
+    from src.rate_limiter import RateController, get_endpoint_family
+
+    url = f"{services.url}{path}"
+    rate_controller = RateController(backoff_base=0.2)
+    services.set_faults([{"path": path, "method": "GET", "status": 503, "count": 3}])
+    services.reset()
+
+    with HttpClient(rate_controller=rate_controller) as http_client:
+        response, elapsed = timed(lambda: http_client.get(url))
+
+    services.set_faults([])
+    stats = report("server errors", services, elapsed)
+    family = get_endpoint_family(url)
+
+    return [
+        ("request retried until it succeeds", getattr(response, "status_code", None) == 200),
+        ("4 requests, 3 retries", stats["total"] == 4 and get_counter("http_retries_total", family=family, reason="503") == 3),
+        # Full jitter: each delay is at most backoff_base * 2 ** attempt
+        ("backoff within its bounds", elapsed < 0.2 * (1 + 2 + 4) + 0.5)
+    ]
+
+
+def check_circuit_breaker(services, path):
+    """
+    Sends requests to an endpoint family whose requests all fail with 503 responses, until its breaker opens, then
+    checks the trial requests. Returns the list of (check, passed).
+    """
+    from src.http_client import HttpClient
+    from src.rate_limiter import RateController, CircuitOpenError, get_endpoint_family
+
+    url = f"{services.url}{path}"
+    rate_controller = RateController(max_retries=1, backoff_base=0.01, failure_threshold=3, reset_timeout=0.5)
+    services.set_faults([{"path": path, "method": "GET", "status": 503}])
+    services.reset()
+    start = time.perf_counter()
+
+    with HttpClient(rate_controller=rate_controller) as http_client:
+        failed = [http_client.get(url).status_code for _ in range(3)]
+        blocked, _ = timed(lambda: http_client.get(url))
+
+        time.sleep(0.5)
+        failed_trial, _ = timed(lambda: http_client.get(url))
+        blocked_after_trial, _ = timed(lambda: http_client.get(url))
+
+        services.set_faults([])
+        time.sleep(0.5)
+        trial, _ = timed(lambda: http_client.get(url))
+        closed, _ = timed(lambda: http_client.get(url))
+
+    stats = report("circuit breaker", services, time.perf_counter() - start)
+    family = get_endpoint_family(url)
+
+    return [
+        ("failed requests returned after their retries", failed == [503] * 3),
+        ("breaker opened after 3 failed requests", isinstance(blocked, CircuitOpenError)),
+        ("failed trial sent once, breaker reopened", getattr(failed_trial, "status_code", None) == 503 and isinstance(blocked_after_trial, CircuitOpenError)),
+        ("successful trial closes the breaker", getattr(trial, "status_code", None) == 200 and getattr(closed, "status_code", None) == 200),
+        ("9 requests, 2 blocked", stats["total"] == 3 * 2 + 1 + 2 and get_counter("http_circuit_open_total", family=family) == 2)
+    ]
+
+
+def check_upload_failed_range(services, chunks):
+    """
+    Uploads a file of chunks chunks whose second chunk fails once, and returns the list of (check, passed).
+    """
+    from src.auth import TokenProvider, GRAPH_SCOPE
+    from src.http_client import HttpClient
+    from src.rate_limiter import RateController
+    from src.loader import SHAREPOINT_CHUNK_MULTIPLE, upload_file_in_chunks
+    from benchmarks.mock_services import UPLOAD_PATH
+
+    chunk_size = SHAREPOINT_CHUNK_MULTIPLE
+    acknowledged = chunk_size // 2
+    services.set_faults([{"path": UPLOAD_PATH, "method": "PUT", "status": 503, "retry_after": 0, "count": 1, "range_start": chunk_size,
+                          "acknowledged": acknowledged}])
+
+    with tempfile.TemporaryDirectory() as temp_dir, HttpClient(rate_controller=RateController()) as http_client:
+        file_path = os.path.join(temp_dir, "PowerBI_Docs.xlsx")
+
+        with open(file_path, "wb") as file:
+            file.write(os.urandom(chunks * chunk_size))
+
+        token = TokenProvider("bench-tenant", "bench-client", "bench-secret", GRAPH_SCOPE, http_client)
+        token.get_token()
+        services.reset()
+
+        start = time.perf_counter()
+        item = upload_file_in_chunks(token, "b!drive-1", "Power%20BI%20Docs/PowerBI_Docs.xlsx", file_path, chunk_size, http_client=http_client)
+        elapsed = time.perf_counter() - start
+
+    services.set_faults([])
+    stats = report("upload failed range", services, elapsed)
+    # First chunk, failed chunk, status request, then the chunks from the acknowledged byte
+    expected = 3 + -(-(chunks * chunk_size - chunk_size - acknowledged) // chunk_size)
+
+    return [
+        ("upload completed", item.get("size") == chunks * chunk_size),
+        ("failed chunk injected once", sum_requests(stats["faults"], UPLOAD_PATH) == 1),
+        (f"{expected} upload session requests", sum_requests(stats["requests"], UPLOAD_PATH) == expected)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    from benchmarks.mock_services import POWERBI_PATH
+
+    logging.getLogger().setLevel(logging.ERROR)
+    metrics.enable()
+    tenant = {"workspaces": 1, "datasets": 1, "reports": 1, "pages": 1, "tables": 1, "columns": 1, "measures": 1}
+
+    with MockServicesProcess(tenant, args.latency) as services:
+        services.patch_urls()
+        path = f"{POWERBI_PATH}/groups/"
+        checks = check_throttling(services, path) + check_server_errors(services, path) + check_circuit_breaker(services, path)
+        checks += check_upload_failed_range(services, args.chunks)
+
+    for name, passed in checks:
+        print(f"{'ok' if passed else 'FAILED':<7} {name}")
+
+    if not all(passed for _, passed in checks):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
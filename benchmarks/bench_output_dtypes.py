@@ -0,0 +1,71 @@
+"""
+Memory report of the dax info output frames with the declared dtypes of transformer.OUTPUT_SCHEMAS, against the same
+frames with generic dtypes (object strings and int64 flags), as the transforms returned them before the schemas.
+
+Usage: python -m benchmarks.bench_output_dtypes [--datasets 50] [--tables 40] [--columns 20] [--measures 8]
+"""
+import argparse
+import pandas as pd
+from benchmarks.synthetic import generate_datasets_info_data
+from src.transformer import (
+    normalize_datasets_info,
+    transform_relationships_info,
+    transform_tables_info,
+    transform_columns_info,
+    transform_measures_info,
+    transform_calc_groups
+)
+
+
+def to_generic_dtypes(df):
+    """
+    Casts categoricals back to object and small ints to int64.
+    """
+    dtypes = {}
+
+    for col, dtype in df.dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            dtypes[col] = object
+        elif dtype == "int8":
+            dtypes[col] = "int64"
+
+    return df.astype(dtypes)
+
+
+def frame_memory(df):
+    return df.memory_usage(index=False, deep=True).sum() / 1024 ** 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--datasets", type=int, default=50)
+    parser.add_argument("--tables", type=int, default=40)
+    parser.add_argument("--columns", type=int, default=20)
+    parser.add_argument("--measures", type=int, default=8)
+    args = parser.parse_args()
+
+    datasets_info_data = generate_datasets_info_data(args.datasets, args.tables, args.columns, args.measures)
+    info_frames = normalize_datasets_info(datasets_info_data)
+    outputs = [
+        ("Tables", transform_tables_info(datasets_info_data, info_frames)),
+        ("Columns", transform_columns_info(datasets_info_data, info_frames)),
+        ("Measures", transform_measures_info(datasets_info_data, info_frames)),
+        ("Calculation Groups", transform_calc_groups(datasets_info_data, info_frames)),
+        ("Relationships", transform_relationships_info(datasets_info_data, info_frames))
+    ]
+
+    print(f"{'frame':<20} {'rows':>8} {'generic':>10} {'declared':>10} {'reduction':>10}")
+    total_generic = total_declared = 0
+
+    for name, df in outputs:
+        generic = frame_memory(to_generic_dtypes(df))
+        declared = frame_memory(df)
+        total_generic += generic
+        total_declared += declared
+        print(f"{name:<20} {len(df):>8} {generic:>7.1f} MB {declared:>7.1f} MB {1 - declared / generic:>9.0%}")
+
+    print(f"{'total':<20} {'':>8} {total_generic:>7.1f} MB {total_declared:>7.1f} MB {1 - total_declared / total_generic:>9.0%}")
+
+
+if __name__ == "__main__":
+    main()
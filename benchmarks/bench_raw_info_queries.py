@@ -0,0 +1,236 @@
+"""
+Benchmarks the RAW dax info query mode: id to name resolution of the raw INFO rowsets with vectorized pandas joins
+(normalize_raw_datasets_info), against a row by row resolution with the nested lookups of dax_info_queries.dax.
+Also checks that both give identical transformed outputs.
+
+Usage: python -m benchmarks.bench_raw_info_queries [--tables 5000] [--columns 20] [--measures 5] [--relationships 5000] [--scan-sample 200]
+"""
+import time
+import argparse
+import pandas as pd
+from benchmarks.synthetic import generate_raw_datasets_info_data
+from src.transformer import (
+    INFO_META,
+    INFO_CARDINALITIES,
+    INFO_CROSS_FILTERING_ARROWS,
+    INFO_FILTERING_BEHAVIORS,
+    INFO_PARTITION_TYPES,
+    INFO_COLUMN_TYPES,
+    INFO_COLUMN_DATA_TYPES,
+    INFO_MEASURE_DATA_TYPES,
+    normalize_datasets_info,
+    normalize_raw_datasets_info,
+    transform_relationships_info,
+    transform_tables_info,
+    transform_columns_info,
+    transform_measures_info,
+    transform_calc_groups
+)
+
+
+def flag(value):
+    return 1 if value else 0
+
+
+def resolve_views_row_by_row(record):
+    """
+    Resolves the raw INFO rowsets of a dataset into the dax_info_queries.dax views row by row, with hashed lookups.
+    Used as the reference output of the RAW query mode.
+    """
+    tables = record["info_raw_tables"]
+    columns = [i for i in record["info_raw_columns"] if i["[Type]"] != 3]
+    table_names = {i["[ID]"]: i["[Name]"] for i in tables}
+    column_names = {i["[ID]"]: i["[ExplicitName]"] or i["[InferredName]"] for i in columns}
+
+    relationships = [
+        {
+            "[relationship_id]": i["[ID]"],
+            "[relationship]": (
+                INFO_CARDINALITIES.get(i["[FromCardinality]"], "") + INFO_CROSS_FILTERING_ARROWS.get(i["[CrossFilteringBehavior]"], "") +
+                INFO_CARDINALITIES.get(i["[ToCardinality]"], "")
+            ),
+            "[from_table_id]": i["[FromTableID]"],
+            "[from_table]": table_names.get(i["[FromTableID]"]),
+            "[from_column_id]": i["[FromColumnID]"],
+            "[from_column]": column_names.get(i["[FromColumnID]"]),
+            "[from_cardinality_id]": i["[FromCardinality]"],
+            "[from_cardinality]": INFO_CARDINALITIES.get(i["[FromCardinality]"]),
+            "[to_cardinality_id]": i["[ToCardinality]"],
+            "[to_cardinality]": INFO_CARDINALITIES.get(i["[ToCardinality]"]),
+            "[to_table_id]": i["[ToTableID]"],
+            "[to_table]": table_names.get(i["[ToTableID]"]),
+            "[to_column_id]": i["[ToColumnID]"],
+            "[to_column]": column_names.get(i["[ToColumnID]"]),
+            "[is_active_flag]": flag(i["[IsActive]"]),
+            "[cross_filtering_behavior_id]": i["[CrossFilteringBehavior]"],
+            "[cross_filtering_behavior]": INFO_FILTERING_BEHAVIORS.get(i["[CrossFilteringBehavior]"]),
+            "[security_filtering_behavior_id]": i["[SecurityFilteringBehavior]"],
+            "[security_filtering_behavior]": INFO_FILTERING_BEHAVIORS.get(i["[SecurityFilteringBehavior]"]),
+            "[modified_at]": i["[ModifiedTime]"]
+        }
+        for i in record["info_raw_relationships"]
+    ]
+
+    partitions = {}
+
+    for i in record["info_raw_partitions"]:
+        partitions.setdefault(i["[TableID]"], []).append(i)
+
+    info_tables = []
+
+    for i in tables:
+        if i["[CalculationGroupID]"] == 1:
+            continue
+
+        table = {
+            "[table_id]": i["[ID]"],
+            "[table_name]": i["[Name]"],
+            "[data_category]": "Time" if i["[DataCategory]"] == "Time" else "Regular",
+            "[description]": i["[Description]"],
+            "[is_hidden_flag]": flag(i["[IsHidden]"]),
+            "[modified_at]": i["[ModifiedTime]"],
+            "[table_type]": ("Calculation Group" if i["[CalculationGroupID]"] else "Power Query Table") if not i["[SystemFlags]"] else "DAX Table"
+        }
+
+        for partition in partitions.get(i["[ID]"], [{"[QueryDefinition]": None, "[Type]": None}]):
+            info_tables.append({**table, "[definition]": partition["[QueryDefinition]"], "[type]": INFO_PARTITION_TYPES.get(partition["[Type]"])})
+
+    info_columns = []
+
+    for i in columns:
+        data_type_id = i["[ExplicitDataType]"] if i["[ExplicitDataType]"] != 1 else i["[InferredDataType]"]
+        info_columns.append({
+            "[column_id]": i["[ID]"],
+            "[table_id]": i["[TableID]"],
+            "[column_name]": i["[ExplicitName]"] or i["[InferredName]"],
+            "[column_type_id]": i["[Type]"],
+            "[column_type]": INFO_COLUMN_TYPES.get(i["[Type]"]),
+            "[dax_expression]": i["[Expression]"],
+            "[data_type_id]": data_type_id,
+            "[data_type]": INFO_COLUMN_DATA_TYPES.get(data_type_id),
+            "[data_category]": i["[DataCategory]"],
+            "[description]": i["[Description]"],
+            "[is_hidden_flag]": flag(i["[IsHidden]"]),
+            "[modified_at]": i["[ModifiedTime]"],
+            "[display_folder]": i["[DisplayFolder]"]
+        })
+
+    info_measures = [
+        {
+            "[measure_id]": i["[ID]"],
+            "[table_id]": i["[TableID]"],
+            "[measure_name]": i["[Name]"],
+            "[description]": i["[Description]"],
+            "[data_type_id]": i["[DataType]"],
+            "[data_type]": INFO_MEASURE_DATA_TYPES.get(i["[DataType]"]),
+            "[format_string]": i["[FormatString]"],
+            "[dax_expression]": i["[Expression]"],
+            "[display_folder]": i["[DisplayFolder]"],
+            "[is_hidden_flag]": flag(i["[IsHidden]"]),
+            "[modified_at]": i["[ModifiedTime]"]
+        }
+        for i in record["info_raw_measures"]
+        if not i["[IsSimpleMeasure]"]
+    ]
+
+    groups_tables = {i["[CalculationGroupID]"]: i for i in tables if i["[CalculationGroupID]"] is not None}
+    groups = {i["[ID]"]: i for i in record["info_raw_calculation_groups"]}
+
+    info_calculation_groups = []
+
+    for i in record["info_raw_calculation_items"]:
+        group = groups.get(i["[CalculationGroupID]"], {})
+        table = groups_tables.get(i["[CalculationGroupID]"], {})
+        info_calculation_groups.append({
+            "[calc_group_id]": i["[CalculationGroupID]"],
+            "[calc_item_id]": i["[ID]"],
+            "[calc_item_name]": i["[Name]"],
+            "[expression]": i["[Expression]"],
+            "[calc_item_description]": i["[Description]"],
+            "[modified_at]": i["[ModifiedTime]"],
+            "[table_id]": table.get("[ID]"),
+            "[calc_group_description]": group.get("[Description]"),
+            "[precedence]": group.get("[Precedence]"),
+            "[table_name]": table.get("[Name]")
+        })
+
+    data = {i: record[i] for i in INFO_META}
+    data.update({
+        "info_relationships": relationships,
+        "info_tables": info_tables,
+        "info_columns": info_columns,
+        "info_measures": info_measures,
+        "info_calculation_groups": info_calculation_groups
+    })
+
+    return data
+
+
+def scan_relationships_names(record, sample):
+    """
+    Resolves the from/to table and column names of a sample of relationships with a full scan of the tables and
+    columns rowsets per lookup, as MAXX(FILTER(...)) in relationships_mapped.
+    """
+    tables = record["info_raw_tables"]
+    columns = [i for i in record["info_raw_columns"] if i["[Type]"] != 3]
+
+    for i in record["info_raw_relationships"][:sample]:
+        max((j["[Name]"] for j in tables if j["[ID]"] == i["[FromTableID]"]), default=None)
+        max((j["[Name]"] for j in tables if j["[ID]"] == i["[ToTableID]"]), default=None)
+        max((j["[ExplicitName]"] or j["[InferredName]"] for j in columns if j["[ID]"] == i["[FromColumnID]"]), default=None)
+        max((j["[ExplicitName]"] or j["[InferredName]"] for j in columns if j["[ID]"] == i["[ToColumnID]"]), default=None)
+
+
+def transform_all(datasets_info_data, info_frames):
+    return [
+        transform_tables_info(datasets_info_data, info_frames),
+        transform_columns_info(datasets_info_data, info_frames),
+        transform_measures_info(datasets_info_data, info_frames),
+        transform_calc_groups(datasets_info_data, info_frames),
+        transform_relationships_info(datasets_info_data, info_frames)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tables", type=int, default=5000)
+    parser.add_argument("--columns", type=int, default=20)
+    parser.add_argument("--measures", type=int, default=5)
+    parser.add_argument("--relationships", type=int, default=5000)
+    parser.add_argument("--scan-sample", type=int, default=200)
+    args = parser.parse_args()
+
+    raw_data = generate_raw_datasets_info_data(1, args.tables, args.columns, args.measures, args.relationships)
+    record = raw_data[0]
+    print(
+        f"1 dataset, {len(record['info_raw_tables'])} tables, {len(record['info_raw_columns'])} columns, "
+        f"{len(record['info_raw_measures'])} measures, {len(record['info_raw_relationships'])} relationships"
+    )
+
+    start = time.perf_counter()
+    raw_frames = normalize_raw_datasets_info(raw_data)
+    raw_outputs = transform_all(raw_data, raw_frames)
+    raw_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    views_data = [resolve_views_row_by_row(i) for i in raw_data]
+    views_frames = normalize_datasets_info(views_data)
+    views_outputs = transform_all(views_data, views_frames)
+    views_elapsed = time.perf_counter() - start
+
+    sample = min(args.scan_sample, len(record["info_raw_relationships"]))
+    start = time.perf_counter()
+    scan_relationships_names(record, sample)
+    scan_elapsed = (time.perf_counter() - start) * len(record["info_raw_relationships"]) / max(sample, 1)
+
+    for raw_df, views_df in zip(raw_outputs, views_outputs):
+        pd.testing.assert_frame_equal(raw_df.reset_index(drop=True), views_df.reset_index(drop=True))
+
+    print(f"{'raw + vectorized joins':<34} {raw_elapsed:>8.2f} s")
+    print(f"{'views resolved row by row':<34} {views_elapsed:>8.2f} s")
+    print(f"{'nested scan lookups (estimated)':<34} {scan_elapsed:>8.2f} s  relationships names only, from {sample} relationships")
+    print("Transformed outputs are identical.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmarks the sharded extraction of main.py against the mock services (benchmarks.mock_services) and the fake Dax Studio
+CMD (benchmarks.fake_dscmd). Each node is a forked process with the same number of workers. Reports the run time of a
+single node over the whole tenant, then of --shard-count nodes running at once followed by the --merge-shards run,
+and checks the merged outputs equal the single node outputs.
+
+Usage: python -m benchmarks.bench_sharding [--workspaces 24] [--shards 4] [--workers 2] [--latency 0.02] [--dscmd-startup 0.2]
+"""
+import os
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import multiprocessing
+import pandas as pd
+from benchmarks.run_suite import MockServicesProcess, create_fake_dscmd
+from src.loader import read_partitioned_dataframe, get_frame_name
+
+
+def run_node(settings, argv):
+    """
+    Runs main.main with the given settings and arguments in the current (forked) process.
+    """
+    import main
+
+    for name, value in settings.items():
+        setattr(main, name, value)
+
+    main.main(argv)
+
+
+def run_nodes(settings, argvs):
+    """
+    Runs one forked process per arguments list at once and returns the wall time until all of them exit.
+    """
+    context = multiprocessing.get_context("fork")
+    start = time.perf_counter()
+    processes = [context.Process(target=run_node, args=(settings, argv)) for argv in argvs]
+
+    for process in processes:
+        process.start()
+
+    for process in processes:
+        process.join()
+
+    return time.perf_counter() - start
+
+
+def compare_outputs(expected_dir, actual_dir, sheet_names):
+    """
+    Returns the names of the output frames which differ, ignoring the row order and extract_timestamp.
+    """
+    different = []
+
+    for frame_name in map(get_frame_name, sheet_names):
+        frames = []
+
+        for directory in (expected_dir, actual_dir):
+            df = read_partitioned_dataframe(directory, frame_name).drop(columns="extract_timestamp").astype(object)
+            frames.append(df.sort_values(list(df.columns)).reset_index(drop=True))
+
+        try:
+            pd.testing.assert_frame_equal(*frames, check_dtype=False)
+        except AssertionError:
+            different.append(frame_name)
+
+    return different
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workspaces", type=int, default=24)
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--dscmd-startup", type=float, default=0.2)
+    args = parser.parse_args()
+
+    import main as main_module
+
+    logging.getLogger().setLevel(logging.WARNING)
+    tenant = {"workspaces": args.workspaces, "datasets": 2, "reports": 2, "pages": 3, "tables": 5, "columns": 5, "measures": 3}
+    os.environ["BENCH_MODEL"] = json.dumps({i: tenant[i] for i in ("tables", "columns", "measures")})
+    os.environ["BENCH_DSCMD_STARTUP"] = str(args.dscmd_startup)
+    directory = tempfile.mkdtemp(prefix="bench_sharding_")
+
+    try:
+        with MockServicesProcess(tenant, args.latency) as services:
+            services.patch_urls()
+            settings = {
+                "PBI_TENANT_ID": "bench-tenant", "PBI_CLIENT_ID": "bench-client", "PBI_CLIENT_SECRET": "bench-secret",
+                "LOCAL_EXTRACT": "Y", "OUTPUT_SINK": "CSV", "PBI_EXTRACT_BACKEND": "REST", "DSCMD_PATH": create_fake_dscmd(directory),
+                "PBI_MAX_WORKERS": args.workers, "DAX_MAX_WORKERS": args.workers, "SKIP_UNCHANGED_OUTPUTS": False,
+                "SHARD_OUTPUT_DIR": os.path.join(directory, "shards")
+            }
+            single_dir, merged_dir = os.path.join(directory, "single"), os.path.join(directory, "merged")
+            print(f"{args.workspaces} workspaces, {args.shards} shards, {args.workers} workers per node, {args.latency * 1000:.0f} ms latency")
+
+            elapsed = run_nodes({**settings, "LOCAL_OUTPUT_DIR": single_dir}, [[]])
+            print(f"{'single node':<22} {elapsed:>7.2f} s")
+
+            shards = [["--shard-index", str(i), "--shard-count", str(args.shards), "--run-id", "bench"] for i in range(args.shards)]
+            extract = run_nodes(settings, shards)
+            merge = run_nodes({**settings, "LOCAL_OUTPUT_DIR": merged_dir}, [["--merge-shards", "--shard-count", str(args.shards), "--run-id", "bench"]])
+            print(f"{f'{args.shards} nodes + merge':<22} {extract + merge:>7.2f} s   (merge {merge:.2f} s)")
+
+        different = compare_outputs(single_dir, merged_dir, main_module.SHEET_NAMES)
+        print(f"merged outputs differ: {', '.join(different)}" if different else "merged outputs equal the single node outputs")
+
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
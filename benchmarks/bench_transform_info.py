@@ -0,0 +1,118 @@
+"""
+Benchmarks the dax info transforms with and without a shared normalization of the info_* record paths.
+
+Usage: python -m benchmarks.bench_transform_info [--datasets 50] [--tables 40] [--columns 20] [--measures 8]
+"""
+import time
+import argparse
+import tracemalloc
+import pandas as pd
+from benchmarks.synthetic import generate_datasets_info_data
+from src.transformer import (
+    INFO_META,
+    clean_info_columns_names,
+    normalize_datasets_info,
+    transform_relationships_info,
+    transform_tables_info,
+    transform_columns_info,
+    transform_measures_info,
+    transform_calc_groups
+)
+
+
+def json_normalize_datasets_info(datasets_info_data, record_paths):
+    """
+    Normalizes info_* record paths with pd.json_normalize, as the transforms did before normalize_info_records.
+    """
+    info_frames = {}
+
+    for record_path in record_paths:
+        df = pd.json_normalize(datasets_info_data, meta=INFO_META, record_path=record_path)
+        info_frames[record_path] = clean_info_columns_names(df)
+
+    if "info_tables" in info_frames:
+        df = info_frames["info_tables"][["workspace_id", "dataset_id", "table_id", "table_name"]]
+        info_frames["tables_lookup"] = df.drop_duplicates(subset=["workspace_id", "dataset_id", "table_id"]).set_index(["workspace_id", "dataset_id", "table_id"])
+
+    return info_frames
+
+
+def run_legacy_normalization(datasets_info_data):
+    """
+    Each transform re-runs pd.json_normalize on the record paths it needs, info_tables included.
+    """
+    return [
+        transform_tables_info(datasets_info_data, json_normalize_datasets_info(datasets_info_data, ["info_tables"])),
+        transform_columns_info(datasets_info_data, json_normalize_datasets_info(datasets_info_data, ["info_columns", "info_tables"])),
+        transform_measures_info(datasets_info_data, json_normalize_datasets_info(datasets_info_data, ["info_measures", "info_tables"])),
+        transform_calc_groups(datasets_info_data, json_normalize_datasets_info(datasets_info_data, ["info_calculation_groups"])),
+        transform_relationships_info(datasets_info_data, json_normalize_datasets_info(datasets_info_data, ["info_relationships"]))
+    ]
+
+
+def run_separate_normalization(datasets_info_data):
+    """
+    Each transform normalizes the record paths it needs on its own.
+    """
+    return [
+        transform_tables_info(datasets_info_data),
+        transform_columns_info(datasets_info_data),
+        transform_measures_info(datasets_info_data),
+        transform_calc_groups(datasets_info_data),
+        transform_relationships_info(datasets_info_data)
+    ]
+
+
+def run_shared_normalization(datasets_info_data):
+    """
+    All transforms share a single normalization of the info_* record paths.
+    """
+    info_frames = normalize_datasets_info(datasets_info_data)
+    return [
+        transform_tables_info(datasets_info_data, info_frames),
+        transform_columns_info(datasets_info_data, info_frames),
+        transform_measures_info(datasets_info_data, info_frames),
+        transform_calc_groups(datasets_info_data, info_frames),
+        transform_relationships_info(datasets_info_data, info_frames)
+    ]
+
+
+def measure(func, *args):
+    """
+    Returns the wall time in seconds and the peak traced memory in MB of a function call.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024 ** 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--datasets", type=int, default=50)
+    parser.add_argument("--tables", type=int, default=40)
+    parser.add_argument("--columns", type=int, default=20)
+    parser.add_argument("--measures", type=int, default=8)
+    args = parser.parse_args()
+
+    datasets_info_data = generate_datasets_info_data(args.datasets, args.tables, args.columns, args.measures)
+    n_columns = args.datasets * args.tables * args.columns
+    n_measures = args.datasets * args.tables * args.measures
+    print(f"{args.datasets} datasets, {args.datasets * args.tables} tables, {n_columns} columns, {n_measures} measures")
+
+    runs = [
+        ("legacy json_normalize", run_legacy_normalization), 
+        ("separate", run_separate_normalization), 
+        ("shared", run_shared_normalization)
+    ]
+
+    for name, func in runs:
+        elapsed, peak = measure(func, datasets_info_data)
+        print(f"{name:<22} {elapsed:>8.2f} s {peak:>10.1f} MB peak")
+
+
+if __name__ == "__main__":
+    main()
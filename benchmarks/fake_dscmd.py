@@ -0,0 +1,37 @@
+"""
+Fake Dax Studio CMD for benchmarks: accepts the dscmd_export_to_json arguments and writes synthetic dax info rows
+of the semantic model (see synthetic.generate_dataset_info_tables) in the Dax Studio JSON output format.
+The model size is read from the BENCH_MODEL environment variable (json of tables, columns and measures), and
+BENCH_DSCMD_STARTUP adds a startup delay in seconds, e.g. to model the .NET startup of dscmd.exe, and
+BENCH_DSCMD_DURATIONS (json of seconds by dataset name) adds the query time of some semantic models.
+
+Usage: python -m benchmarks.fake_dscmd csv <file_name> -s <server> -d <dataset_name> -u <user> -p <password> -f <query_file> -t JSON
+"""
+import os
+import sys
+import json
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import generate_dataset_info_tables
+
+
+def main(argv):
+    file_name = argv[argv.index("csv") + 1]
+    dataset_name = argv[argv.index("-d") + 1]
+    query_file = argv[argv.index("-f") + 1]
+    model = json.loads(os.getenv("BENCH_MODEL", "{}"))
+
+    time.sleep(float(os.getenv("BENCH_DSCMD_STARTUP", 0)))
+    time.sleep(json.loads(os.getenv("BENCH_DSCMD_DURATIONS", "{}")).get(dataset_name, 0))
+
+    raw = "raw" in os.path.basename(query_file)
+    tables = generate_dataset_info_tables(dataset_name, raw=raw, **model)
+
+    with open(file_name, "w", encoding="utf-8") as file:
+        json.dump({"results": [{"tables": [{"rows": rows} for rows in tables]}]}, file)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
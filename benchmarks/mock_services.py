@@ -0,0 +1,313 @@
+"""
+Local stand-in of the Microsoft Entra login, Power BI Rest API (Admin Scanner API included) and
+Microsoft Graph API for a synthetic tenant, with request counts by endpoint family.
+
+Runs in its own process, so it does not add to the memory of the benchmarked process:
+    python -m benchmarks.mock_services --tenant '{"workspaces": 5}' [--latency 0.01]
+prints the listening port on the first line of stdout. GET /_stats returns the request counts and POST /_reset clears them.
+
+Failures are injected with --faults, or at runtime with POST /_faults, as a json list of faults:
+    {"path": "/upload", "method": "PUT", "status": 503, "retry_after": 1, "count": 1, "range_start": 0, "acknowledged": 1024}
+Requests whose path starts with path (and of method, if given) get a status response, with a Retry-After header if
+retry_after is given, count times (every time without count). range_start only fails the upload chunks starting at
+this byte, and the upload session acknowledges the first acknowledged bytes of the failed chunk, as after a connection
+cut mid-chunk. Injected failures are counted by endpoint family in the faults of /_stats.
+"""
+import sys
+import json
+import time
+import argparse
+import threading
+from collections import Counter
+from urllib.parse import urlsplit, unquote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from benchmarks.synthetic import generate_tenant
+from src.rate_limiter import get_endpoint_family
+
+# Path prefixes of each mocked service, appended to the server url
+LOGIN_PATH = "/login"
+POWERBI_PATH = "/powerbi/v1.0/myorg"
+GRAPH_PATH = "/graph/v1.0"
+UPLOAD_PATH = "/upload"
+
+
+class MockServices:
+    """
+    Mocked services state: the synthetic tenant, scans, upload sessions, uploaded Sharepoint files and request counts.
+    """
+
+    def __init__(self, tenant, latency=0.0):
+        self.tenant = tenant
+        self.latency = latency
+        self.workspaces = {i["id"]: i for i in tenant["workspaces"]}
+        self.scans = {}
+        self.uploads = {}
+        self.upload_items = {}
+        self.files = {}
+        self.faults = []
+        self.request_counts = Counter()
+        self.fault_counts = Counter()
+        self.lock = threading.Lock()
+
+    def count(self, url):
+        with self.lock:
+            self.request_counts[get_endpoint_family(url)] += 1
+
+    def stats(self):
+        with self.lock:
+            return {"requests": dict(self.request_counts), "total": sum(self.request_counts.values()), "faults": dict(self.fault_counts)}
+
+    def reset(self):
+        with self.lock:
+            self.request_counts.clear()
+            self.fault_counts.clear()
+
+    def set_faults(self, faults):
+        with self.lock:
+            self.faults = [dict(i) for i in faults]
+
+    def take_fault(self, method, path, range_start=None):
+        """
+        Returns the first fault matching a request, counting it down, or None.
+        """
+        with self.lock:
+            for fault in self.faults:
+                if not path.startswith(fault["path"]) or fault.get("method", method) != method or fault.get("count", 1) <= 0:
+                    continue
+
+                if "range_start" in fault and fault["range_start"] != range_start:
+                    continue
+
+                if "count" in fault:
+                    fault["count"] -= 1
+
+                self.fault_counts[get_endpoint_family(path)] += 1
+                return fault
+
+        return None
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    services = None
+
+    def log_message(self, *args):
+        pass
+
+    def send(self, status_code, payload=None, body=None, content_type="application/json", headers=None):
+        body = body if body is not None else json.dumps(payload).encode("utf-8")
+        self.send_response(status_code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_fault(self, fault, path):
+        if fault.get("acknowledged") and path.startswith(UPLOAD_PATH):
+            with self.services.lock:
+                self.services.uploads[path[len(UPLOAD_PATH) + 1:]] += fault["acknowledged"]
+
+        headers = {"Retry-After": str(fault["retry_after"])} if "retry_after" in fault else None
+        self.send(fault["status"], {"error": {"code": "injectedFault", "message": f"Injected {fault['status']} response"}}, headers=headers)
+
+    def read_body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def handle_request(self, method):
+        path = urlsplit(self.path).path
+        body = self.read_body()
+
+        if path == "/_stats":
+            return self.send(200, self.services.stats())
+
+        if path == "/_reset":
+            self.services.reset()
+            return self.send(200, {})
+
+        if path == "/_faults":
+            self.services.set_faults(json.loads(body))
+            return self.send(200, {})
+
+        # Families are counted on the path only, so counts can be compared between runs on different ports
+        self.services.count(self.path)
+
+        if self.services.latency:
+            time.sleep(self.services.latency)
+
+        content_range = self.headers.get("Content-Range")
+        fault = self.services.take_fault(method, path, int(content_range.split(" ")[1].split("-")[0]) if content_range else None)
+
+        if fault:
+            return self.send_fault(fault, path)
+
+        if path.startswith(LOGIN_PATH):
+            return self.send(200, {"token_type": "Bearer", "expires_in": 3599, "access_token": "mock-access-token"})
+
+        if path.startswith(f"{POWERBI_PATH}/admin/"):
+            return self.handle_scanner(method, path, body)
+
+        if path.startswith(f"{POWERBI_PATH}/groups/"):
+            return self.handle_powerbi(path[len(f"{POWERBI_PATH}/groups/"):])
+
+        if path.startswith(GRAPH_PATH):
+            return self.handle_graph(method, path[len(GRAPH_PATH):], body)
+
+        if path.startswith(UPLOAD_PATH):
+            return self.handle_upload(method, path[len(UPLOAD_PATH) + 1:], body)
+
+        self.send(404, {"error": f"Unknown path {path}"})
+
+    def do_GET(self):
+        self.handle_request("GET")
+
+    def do_POST(self):
+        self.handle_request("POST")
+
+    def do_PUT(self):
+        self.handle_request("PUT")
+
+    def handle_powerbi(self, endpoint):
+        segments = [i for i in endpoint.split("/") if i]
+
+        if not segments:
+            return self.send(200, {"value": [{"id": i["id"], "name": i["name"]} for i in self.services.tenant["workspaces"]]})
+
+        workspace = self.services.workspaces.get(segments[0])
+
+        if workspace is None:
+            return self.send(404, {"error": "Workspace not found"})
+
+        if len(segments) == 1:
+            return self.send(200, {k: v for k, v in workspace.items() if k not in ("datasets", "reports")})
+
+        if segments[1:] == ["datasets"]:
+            return self.send(200, {"value": workspace["datasets"]})
+
+        if segments[1:] == ["reports"]:
+            return self.send(200, {"value": [{k: v for k, v in i.items() if k != "pages"} for i in workspace["reports"]]})
+
+        if len(segments) == 4 and segments[1] == "reports" and segments[3] == "pages":
+            report = next((i for i in workspace["reports"] if i["id"] == segments[2]), None)
+            return self.send(200, {"value": report["pages"]}) if report else self.send(404, {"error": "Report not found"})
+
+        if len(segments) == 4 and segments[1] == "datasets" and segments[3] == "refreshes":
+            return self.send(200, {"value": [{"startTime": "2024-06-01T01:00:00Z", "endTime": "2024-06-01T01:05:00Z", "status": "Completed"}]})
+
+        self.send(404, {"error": f"Unknown endpoint {endpoint}"})
+
+    def handle_scanner(self, method, path, body):
+        scans = self.services.scans
+
+        if method == "POST" and path.endswith("/workspaces/getInfo"):
+            with self.services.lock:
+                scan_id = f"00000000-0000-0000-0000-{len(scans) + 1:012d}"
+                scans[scan_id] = json.loads(body).get("workspaces", [])
+
+            return self.send(202, {"id": scan_id, "status": "NotStarted"})
+
+        scan_id = path.rsplit("/", 1)[-1]
+
+        if scan_id not in scans:
+            return self.send(404, {"error": "Scan not found"})
+
+        if "/scanStatus/" in path:
+            return self.send(200, {"id": scan_id, "status": "Succeeded"})
+
+        workspaces = [self.services.workspaces[i] for i in scans[scan_id] if i in self.services.workspaces]
+        result = [{**i, "reports": [{k: v for k, v in j.items() if k != "pages"} for j in i["reports"]]} for i in workspaces]
+        self.send(200, {"workspaces": result})
+
+    def handle_graph(self, method, path, body):
+        if path == "/sites":
+            return self.send(200, {"value": [{"id": "contoso.sharepoint.com,site-1,web-1"}]})
+
+        if path.startswith("/sites/") and path.endswith("/drives"):
+            return self.send(200, {"value": [{"id": "b!drive-1"}]})
+
+        # Drive items are addressed by path: /drives/<drive id>/root:/<item path>[:/<action>]
+        item_path = unquote(path.split("/root:/", 1)[-1]).removesuffix(":/content").removesuffix(":/createUploadSession")
+
+        if method == "POST" and path.endswith(":/createUploadSession"):
+            with self.services.lock:
+                session_id = str(len(self.services.uploads) + 1)
+                self.services.uploads[session_id] = 0
+                self.services.upload_items[session_id] = item_path
+
+            return self.send(200, {"uploadUrl": f"http://{self.headers.get('Host')}{UPLOAD_PATH}/{session_id}"})
+
+        if method == "PUT" and path.endswith(":/content"):
+            self.services.files[item_path] = body
+            return self.send(201, {"id": "item-1", "name": item_path.rsplit("/", 1)[-1]})
+
+        if method == "GET" and "/root:/" in path:
+            if item_path not in self.services.files:
+                return self.send(404, {"error": {"code": "itemNotFound"}})
+
+            if path.endswith(":/content"):
+                return self.send(200, body=self.services.files[item_path], content_type="application/octet-stream")
+
+            return self.send(200, {"id": "item-1", "name": item_path.rsplit("/", 1)[-1], "size": len(self.services.files[item_path])})
+
+        self.send(404, {"error": f"Unknown endpoint {path}"})
+
+    def handle_upload(self, method, session_id, body):
+        uploads = self.services.uploads
+
+        if session_id not in uploads:
+            return self.send(404, {"error": "Upload session not found"})
+
+        if method == "GET":
+            return self.send(200, {"nextExpectedRanges": [f"{uploads[session_id]}-"]})
+
+        # Content-Range: bytes start-end/total
+        byte_range, total = self.headers.get("Content-Range").split(" ")[1].split("/")
+        start, end = (int(i) for i in byte_range.split("-"))
+
+        if start != uploads[session_id]:
+            return self.send(416, {"error": "Unexpected range"})
+
+        uploads[session_id] = end + 1
+
+        if end + 1 >= int(total):
+            # Only the size of files uploaded in chunks is kept
+            self.services.files[self.services.upload_items[session_id]] = bytes(int(total))
+            return self.send(201, {"id": "item-1", "size": int(total)})
+
+        self.send(202, {"nextExpectedRanges": [f"{end + 1}-"]})
+
+
+def start_mock_services(tenant, latency=0.0, port=0, faults=None):
+    """
+    Starts the mock services in a background thread of the current process. Returns the server.
+    """
+    services = MockServices(tenant, latency)
+    services.set_faults(faults or [])
+    handler = type("Handler", (MockHandler,), {"services": services})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tenant", default="{}", help="json of generate_tenant arguments")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--faults", default="[]", help="json list of injected faults")
+    args = parser.parse_args()
+
+    server = start_mock_services(generate_tenant(**json.loads(args.tenant)), args.latency, args.port, json.loads(args.faults))
+    print(server.server_port, flush=True)
+
+    # Serve until the parent process closes stdin
+    sys.stdin.read()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,440 @@
+"""
+Benchmark suite on synthetic tenants served by local mock services (benchmarks.mock_services) and a fake Dax Studio CMD
+(benchmarks.fake_dscmd). For each scale, runs main.main() end to end (staged and pipelined), then each extract_*,
+transform_* and export_* function in isolation, and reports the wall time, the requests sent by endpoint family and
+the peak RSS of each stage. Each scale runs in its own process.
+
+Results are saved as json, and can be compared with the results of another commit:
+    python -m benchmarks.run_suite [--scales small medium] [--output results.json] [--compare baseline.json]
+
+Runs on Linux and macOS (the fake dscmd is started through a shell script).
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import importlib.util
+from datetime import datetime
+import requests
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_DIR, "benchmarks", "results")
+
+# generate_tenant arguments of each scale
+SCALES = {
+    "small": {"workspaces": 5, "datasets": 2, "reports": 2, "pages": 5, "tables": 10, "columns": 10, "measures": 5},
+    "medium": {"workspaces": 25, "datasets": 4, "reports": 4, "pages": 8, "tables": 25, "columns": 15, "measures": 8},
+    "large": {"workspaces": 100, "datasets": 5, "reports": 5, "pages": 10, "tables": 40, "columns": 20, "measures": 10},
+}
+
+SHEET_NAMES = ["Workspaces", "Reports", "Reports Pages", "Semantic Models", "Tables", "Columns", "Measures", "Calculation Groups", "Relationships",
+               "Dependencies", "Unused Objects"]
+
+
+def current_rss_mb():
+    """
+    Returns the current resident set size of the process in MB, or None if it is not available.
+    """
+    try:
+        with open("/proc/self/statm", "r") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def max_rss_mb():
+    """
+    Returns the peak resident set size of the process since it started in MB.
+    """
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+class RssSampler:
+    """
+    Samples the RSS of the process in a background thread, to get the peak RSS of a block of code.
+    Without /proc (e.g. macOS), the peak is the peak RSS of the process so far.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.start_rss = None
+        self.peak_rss = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, current_rss_mb())
+
+    def __enter__(self):
+        self.start_rss = current_rss_mb()
+
+        if self.start_rss is not None:
+            self.peak_rss = self.start_rss
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._thread:
+            self._stop.set()
+            self._thread.join()
+            self.peak_rss = max(self.peak_rss, current_rss_mb())
+        else:
+            self.start_rss = 0.0
+            self.peak_rss = max_rss_mb()
+
+
+class ErrorsCounter(logging.Handler):
+    """
+    Counts the error logs, e.g. of main.main(), which logs critical errors instead of raising them.
+    """
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+        self.count = 0
+
+    def emit(self, record):
+        self.count += 1
+
+
+class MockServicesProcess:
+    """
+    Runs benchmarks.mock_services for a tenant in a child process, and points the Power BI, login and Graph urls of
+    the src modules to it.
+    """
+
+    def __init__(self, tenant, latency=0.0):
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.mock_services", "--tenant", json.dumps(tenant), "--latency", str(latency)],
+            cwd=REPO_DIR, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True
+        )
+        self.url = f"http://127.0.0.1:{int(self.process.stdout.readline())}"
+        self.session = requests.Session()
+
+    def patch_urls(self):
+        import src.auth
+        import src.loader
+        import src.extract_powerbi_api
+        from benchmarks.mock_services import LOGIN_PATH, POWERBI_PATH, GRAPH_PATH
+
+        src.auth.LOGIN_URL = f"{self.url}{LOGIN_PATH}"
+        src.extract_powerbi_api.POWERBI_API_URL = f"{self.url}{POWERBI_PATH}"
+        src.loader.GRAPH_API_URL = f"{self.url}{GRAPH_PATH}"
+
+    def stats(self):
+        return self.session.get(f"{self.url}/_stats").json()
+
+    def set_faults(self, faults):
+        """
+        Sets the failures injected by the mock services (see benchmarks.mock_services), or clears them with [].
+        """
+        self.session.post(f"{self.url}/_faults", json=faults)
+
+    def reset(self):
+        self.session.post(f"{self.url}/_reset")
+
+    def close(self):
+        self.session.close()
+        self.process.stdin.close()
+        self.process.wait(timeout=10)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def create_fake_dscmd(directory):
+    """
+    Writes an executable script which runs benchmarks/fake_dscmd.py with the current python, and returns its path.
+    """
+    path = os.path.join(directory, "dscmd")
+    fake_dscmd = os.path.join(REPO_DIR, "benchmarks", "fake_dscmd.py")
+
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(f'#!/bin/sh\nexec "{sys.executable}" "{fake_dscmd}" "$@"\n')
+
+    os.chmod(path, 0o755)
+    return path
+
+
+def measure_stage(results, services, name, func):
+    """
+    Runs a stage and appends its wall time, requests and peak RSS to results. Returns the stage result.
+    """
+    errors = ErrorsCounter()
+    logging.getLogger().addHandler(errors)
+    services.reset()
+
+    try:
+        with RssSampler() as sampler:
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+
+    finally:
+        logging.getLogger().removeHandler(errors)
+
+    stats = services.stats()
+    results.append({
+        "stage": name,
+        "wall_time_s": round(elapsed, 4),
+        "requests_total": stats["total"],
+        "requests": stats["requests"],
+        "peak_rss_mb": round(sampler.peak_rss, 1),
+        "rss_delta_mb": round(sampler.peak_rss - sampler.start_rss, 1),
+        "errors": errors.count
+    })
+    logging.warning(f"{name:<48} {elapsed:>8.2f} s {stats['total']:>6} requests {sampler.peak_rss:>8.1f} MB peak")
+
+    return result
+
+
+def run_scale(tenant, options):
+    """
+    Runs all stages on a synthetic tenant and returns the list of stage results.
+    """
+    import main
+    from src.auth import TokenProvider, POWERBI_SCOPE, GRAPH_SCOPE
+    from src.http_client import HttpClient
+    from src.rate_limiter import RateController
+    from src.extract_dax_info_tables import extract_datasets_dax_info
+    from src.extract_powerbi_api import (
+        extract_workspaces_ids,
+        extract_workspaces_data,
+        extract_datasets_data,
+        extract_reports_data,
+        extract_reports_pages,
+        extract_scanner_data,
+        extract_datasets_change_signals
+    )
+    from src.transformer import (
+        transform_workspaces,
+        transform_reports,
+        transform_report_pages,
+        transform_datasets,
+        resolve_workspaces_datasets_list,
+        normalize_datasets_info,
+        transform_relationships_info,
+        transform_tables_info,
+        transform_columns_info,
+        transform_measures_info,
+        transform_calc_groups,
+        build_dax_dependency_index,
+        transform_dax_dependencies,
+        transform_unused_objects
+    )
+    from src.loader import SHAREPOINT_CHUNK_MULTIPLE, export_dataframes, load_csv_to_sharepoint
+
+    logging.getLogger().setLevel(logging.WARNING)
+    os.environ["BENCH_MODEL"] = json.dumps({i: tenant[i] for i in ("tables", "columns", "measures")})
+    os.environ["BENCH_DSCMD_STARTUP"] = str(options.dscmd_startup)
+
+    results = []
+    pbi_workers = options.pbi_workers
+    dax_workers = options.dax_workers
+
+    with MockServicesProcess(tenant, options.latency) as services, tempfile.TemporaryDirectory() as temp_dir:
+        services.patch_urls()
+        dscmd_exe = create_fake_dscmd(temp_dir)
+
+        # End to end runs, first so that their peak RSS is not raised by the isolated stages
+        main.PBI_TENANT_ID, main.PBI_CLIENT_ID, main.PBI_CLIENT_SECRET = "bench-tenant", "bench-client", "bench-secret"
+        main.SHAREPOINT_SITE_URL, main.SHAREPOINT_RELATIVE_URL = "https://contoso.sharepoint.com/sites/Bench", "Power%20BI%20Docs"
+        main.LOCAL_EXTRACT = "N"
+        main.PBI_MAX_WORKERS, main.DAX_MAX_WORKERS = pbi_workers, dax_workers
+        main.PBI_EXTRACT_BACKEND = "REST"
+        main.DSCMD_PATH = dscmd_exe
+        main.DAX_INFO_CACHE_DIR = None
+        main.TOKEN_CACHE_FILE = None
+        main.SKIP_UNCHANGED_OUTPUTS = False
+        main.HTTP_MAX_REQUESTS_PER_SECOND = options.max_rps
+
+        for pipelined in (False, True):
+            main.PIPELINED_EXTRACTION = pipelined
+            measure_stage(results, services, f"main.main[{'pipelined' if pipelined else 'staged'}]", lambda: main.main([]))
+
+        # Isolated stages
+        http_client = HttpClient(pool_size=max(10, pbi_workers), rate_controller=RateController(default_rate=options.max_rps))
+        pbi_token = TokenProvider("bench-tenant", "bench-client", "bench-secret", POWERBI_SCOPE, http_client)
+        sp_token = TokenProvider("bench-tenant", "bench-client", "bench-secret", GRAPH_SCOPE, http_client)
+
+        try:
+            workspaces_ids = measure_stage(results, services, "extract_workspaces_ids", lambda: extract_workspaces_ids(pbi_token, http_client))
+            workspaces_data = measure_stage(
+                results, services, "extract_workspaces_data", lambda: extract_workspaces_data(pbi_token, workspaces_ids, pbi_workers, http_client)
+            )
+            reports_data = measure_stage(
+                results, services, "extract_reports_data", lambda: extract_reports_data(pbi_token, workspaces_ids, pbi_workers, http_client)
+            )
+            reports_pages_data = measure_stage(
+                results, services, "extract_reports_pages", lambda: extract_reports_pages(pbi_token, reports_data, pbi_workers, http_client)
+            )
+            datasets_data = measure_stage(
+                results, services, "extract_datasets_data", lambda: extract_datasets_data(pbi_token, workspaces_ids, pbi_workers, http_client)
+            )
+            measure_stage(
+                results, services, "extract_scanner_data",
+                lambda: extract_scanner_data(pbi_token, workspaces_ids, pbi_workers, http_client, poll_interval=0.01)
+            )
+            measure_stage(
+                results, services, "extract_datasets_change_signals",
+                lambda: extract_datasets_change_signals(pbi_token, datasets_data, pbi_workers, http_client)
+            )
+
+            workspaces_datasets_list = resolve_workspaces_datasets_list(datasets_data, workspaces_data)
+            datasets_info_data = measure_stage(
+                results, services, "extract_datasets_dax_info[DSCMD]",
+                lambda: extract_datasets_dax_info("bench-tenant", "bench-client", "bench-secret", workspaces_datasets_list, dax_workers, dscmd_exe)
+            )
+
+            workspaces_df = measure_stage(results, services, "transform_workspaces", lambda: transform_workspaces(workspaces_data))
+            reports_df = measure_stage(results, services, "transform_reports", lambda: transform_reports(reports_data, datasets_data, workspaces_data))
+            reports_pages_df = measure_stage(
+                results, services, "transform_report_pages", lambda: transform_report_pages(reports_pages_data, reports_data, workspaces_data)
+            )
+            datasets_df = measure_stage(results, services, "transform_datasets", lambda: transform_datasets(datasets_data, workspaces_data))
+            info_frames = measure_stage(results, services, "normalize_datasets_info", lambda: normalize_datasets_info(datasets_info_data))
+            info_dfs = [
+                measure_stage(results, services, transform.__name__, lambda: transform(datasets_info_data, info_frames))
+                for transform in (transform_tables_info, transform_columns_info, transform_measures_info, transform_calc_groups, transform_relationships_info)
+            ]
+
+            dependency_index = measure_stage(results, services, "build_dax_dependency_index", lambda: build_dax_dependency_index(*info_dfs[1:]))
+            dependency_dfs = [
+                measure_stage(results, services, transform.__name__, lambda: transform(dependency_index))
+                for transform in (transform_dax_dependencies, transform_unused_objects)
+            ]
+
+            dataframes = [workspaces_df, reports_df, reports_pages_df, datasets_df] + info_dfs + dependency_dfs
+            sinks = [("EXCEL", False), ("EXCEL", True), ("CSV", False), ("SQLITE", False)]
+
+            if importlib.util.find_spec("pyarrow"):
+                sinks.append(("PARQUET", False))
+
+            for sink, streaming in sinks:
+                output_dir = tempfile.mkdtemp(dir=temp_dir)
+                measure_stage(
+                    results, services, f"export_dataframes[{sink}{' streaming' if streaming else ''}]",
+                    lambda: export_dataframes(sink, output_dir, dataframes, SHEET_NAMES, streaming=streaming)
+                )
+
+            measure_stage(
+                results, services, "load_csv_to_sharepoint",
+                lambda: load_csv_to_sharepoint(
+                    sp_token, main.SHAREPOINT_SITE_URL, main.SHAREPOINT_RELATIVE_URL, "PowerBI_Docs.xlsx", dataframes, SHEET_NAMES, http_client
+                )
+            )
+            measure_stage(
+                results, services, "load_csv_to_sharepoint[chunked]",
+                lambda: load_csv_to_sharepoint(
+                    sp_token, main.SHAREPOINT_SITE_URL, main.SHAREPOINT_RELATIVE_URL, "PowerBI_Docs.xlsx", dataframes, SHEET_NAMES, http_client,
+                    upload_threshold=0, chunk_size=SHAREPOINT_CHUNK_MULTIPLE
+                )
+            )
+
+        finally:
+            http_client.close()
+
+    return results
+
+
+def get_commit():
+    """
+    Returns the current git commit of the repository, or None.
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout.strip()
+
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(baseline, current, threshold=0.2):
+    """
+    Prints the wall time and peak RSS changes of each stage against a baseline result, flagging the changes above threshold.
+    """
+    print(f"Comparing {current.get('commit')} against {baseline.get('commit')}")
+
+    for scale, scale_results in current["scales"].items():
+        baseline_stages = {i["stage"]: i for i in baseline["scales"].get(scale, {}).get("stages", [])}
+
+        for stage in scale_results["stages"]:
+            base = baseline_stages.get(stage["stage"])
+
+            if base is None:
+                continue
+
+            changes = []
+
+            for key in ("wall_time_s", "requests_total", "peak_rss_mb"):
+                change = (stage[key] - base[key]) / base[key] if base[key] else 0.0
+                flag = " !" if change > threshold else ""
+                changes.append(f"{key} {base[key]} -> {stage[key]} ({change:+.0%}){flag}")
+
+            print(f"{scale:<8} {stage['stage']:<48} {' | '.join(changes)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", nargs="+", default=["small", "medium"], choices=list(SCALES))
+    parser.add_argument("--pbi-workers", type=int, default=8)
+    parser.add_argument("--dax-workers", type=int, default=4)
+    parser.add_argument("--max-rps", type=float, default=1000, help="requests per second per endpoint family of the rate controller")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every mocked response")
+    parser.add_argument("--dscmd-startup", type=float, default=0.0, help="seconds added to every fake dscmd run")
+    parser.add_argument("--output", help="json results file. The default is benchmarks/results/<timestamp>-<commit>.json")
+    parser.add_argument("--compare", help="json results file of a baseline run to compare with")
+    parser.add_argument("--child-scale", help=argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    # Child process: runs one scale and prints its results as json on the last line of stdout
+    if options.child_scale:
+        print(json.dumps(run_scale(SCALES[options.child_scale], options)))
+        return
+
+    commit = get_commit()
+    output = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": {k: v for k, v in vars(options).items() if k not in ("output", "compare", "child_scale", "scales")},
+        "scales": {}
+    }
+
+    for scale in options.scales:
+        print(f"Running the {scale} scale: {SCALES[scale]}", flush=True)
+        args = [sys.executable, "-m", "benchmarks.run_suite", "--child-scale", scale] + sys.argv[1:]
+        process = subprocess.run(args, cwd=REPO_DIR, stdout=subprocess.PIPE, text=True, check=True)
+        output["scales"][scale] = {"tenant": SCALES[scale], "stages": json.loads(process.stdout.strip().splitlines()[-1])}
+
+    output_file = options.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+
+    with open(output_file, "w", encoding="utf-8") as file:
+        json.dump(output, file, indent=2)
+
+    print(f"Saved results to {output_file}")
+
+    if options.compare:
+        with open(options.compare, "r", encoding="utf-8") as file:
+            compare_results(json.load(file), output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+import uuid
+import zlib
+import random
+from datetime import datetime
+
+DATA_TYPES = ["Text", "Integer", "Decimal", "DateTime", "Currency", "Boolean"]
+
+
+def generate_datasets_info_data(n_datasets=10, n_tables=20, n_columns=10, n_measures=5, n_relationships=10, seed=0):
+    """
+    Generates synthetic dax info data with the same shape as extract_datasets_dax_info.
+    n_tables is per dataset, n_columns and n_measures are per table.
+    """
+    rng = random.Random(seed)
+    timestamp = datetime.now()
+    modified_at = "2024-01-01T00:00:00"
+    data = []
+
+    for d in range(n_datasets):
+        tables = []
+        columns = []
+        measures = []
+        relationships = []
+        calc_items = []
+
+        for t in range(n_tables):
+            table_id = t + 1
+            table_name = f"Table {t}"
+
+            tables.append({
+                "[table_id]": table_id,
+                "[table_name]": table_name,
+                "[data_category]": "Regular",
+                "[description]": None,
+                "[is_hidden_flag]": rng.randint(0, 1),
+                "[modified_at]": modified_at,
+                "[table_type]": "Power Query Table",
+                "[definition]": f'let Source = Sql.Database("server", "db"){{[Name="{table_name}"]}} in Source',
+                "[type]": "M"
+            })
+
+            for c in range(n_columns):
+                columns.append({
+                    "[column_id]": table_id * 1000 + c,
+                    "[table_id]": table_id,
+                    "[column_name]": f"Column {c}",
+                    "[column_type_id]": 1,
+                    "[column_type]": "M",
+                    "[dax_expression]": None,
+                    "[data_type_id]": 2,
+                    "[data_type]": rng.choice(DATA_TYPES),
+                    "[data_category]": None,
+                    "[description]": None,
+                    "[is_hidden_flag]": rng.randint(0, 1),
+                    "[modified_at]": modified_at,
+                    "[display_folder]": rng.choice([None, "Keys", "Attributes"])
+                })
+
+            for m in range(n_measures):
+                measures.append({
+                    "[measure_id]": table_id * 1000 + m,
+                    "[table_id]": table_id,
+                    "[measure_name]": f"Measure {t}.{m}",
+                    "[description]": None,
+                    "[data_type_id]": 8,
+                    "[data_type]": "Decimal",
+                    "[format_string]": "#,0.00",
+                    "[dax_expression]": f"SUM('{table_name}'[Column {rng.randrange(n_columns)}])",
+                    "[display_folder]": None,
+                    "[is_hidden_flag]": 0,
+                    "[modified_at]": modified_at
+                })
+
+        for r in range(min(n_relationships, max(n_tables - 1, 0))):
+            relationships.append({
+                "[relationship_id]": r + 1,
+                "[relationship]": "Many <--- One",
+                "[from_table]": f"Table {r}",
+                "[from_column]": "Column 0",
+                "[to_table]": f"Table {r + 1}",
+                "[to_column]": "Column 0",
+                "[is_active_flag]": 1,
+                "[modified_at]": modified_at
+            })
+
+        calc_items.append({
+            "[calc_group_id]": n_tables + 1,
+            "[calc_item_id]": 1,
+            "[calc_item_name]": "YTD",
+            "[expression]": "CALCULATE(SELECTEDMEASURE(), DATESYTD('Date'[Date]))",
+            "[calc_item_description]": None,
+            "[modified_at]": modified_at,
+            "[table_id]": n_tables + 1,
+            "[calc_group_description]": None,
+            "[precedence]": 0,
+            "[table_name]": "Time Intelligence"
+        })
+
+        data.append({
+            "workspace_id": f"workspace-{d % 5}",
+            "workspace_name": f"Workspace {d % 5}",
+            "dataset_id": f"dataset-{d}",
+            "dataset_name": f"Dataset {d}",
+            "extract_timestamp": timestamp,
+            "info_relationships": relationships,
+            "info_tables": tables,
+            "info_columns": columns,
+            "info_measures": measures,
+            "info_calculation_groups": calc_items
+        })
+
+    return data
+
+
+def generate_raw_datasets_info_data(n_datasets=1, n_tables=5000, n_columns=20, n_measures=5, n_relationships=5000, seed=0):
+    """
+    Generates synthetic raw INFO rowsets (dax_info_raw_queries.dax) with the same shape as extract_datasets_dax_info
+    in the RAW query mode. n_tables is per dataset, n_columns and n_measures are per table. Each dataset also has
+    a calculation group table and a calculated table.
+    """
+    rng = random.Random(seed)
+    timestamp = datetime.now()
+    modified_at = "2024-01-01T00:00:00"
+    data = []
+
+    for d in range(n_datasets):
+        tables = []
+        partitions = []
+        columns = []
+        measures = []
+        relationships = []
+
+        for t in range(n_tables):
+            table_id = t + 1
+            table_name = f"Table {t}"
+
+            tables.append({
+                "[ID]": table_id,
+                "[Name]": table_name,
+                "[DataCategory]": rng.choice([None, "Time"]) if t % 50 == 0 else None,
+                "[Description]": None,
+                "[IsHidden]": rng.random() < 0.2,
+                "[ModifiedTime]": modified_at,
+                "[SystemFlags]": 0,
+                "[CalculationGroupID]": None
+            })
+
+            partitions.append({
+                "[TableID]": table_id,
+                "[QueryDefinition]": f'let Source = Sql.Database("server", "db"){{[Name="{table_name}"]}} in Source',
+                "[Type]": 4
+            })
+
+            # Row number column of the table, filtered out by the views
+            columns.append({
+                "[ID]": table_id * 1000,
+                "[TableID]": table_id,
+                "[ExplicitName]": None,
+                "[InferredName]": f"RowNumber-{table_id}",
+                "[Type]": 3,
+                "[Expression]": None,
+                "[ExplicitDataType]": 6,
+                "[InferredDataType]": 19,
+                "[DataCategory]": None,
+                "[Description]": None,
+                "[IsHidden]": True,
+                "[ModifiedTime]": modified_at,
+                "[DisplayFolder]": None
+            })
+
+            for c in range(n_columns):
+                calculated = c % 10 == 9
+                columns.append({
+                    "[ID]": table_id * 1000 + c + 1,
+                    "[TableID]": table_id,
+                    "[ExplicitName]": f"Column {c}" if c % 3 else None,
+                    "[InferredName]": f"Column {c}",
+                    "[Type]": 2 if calculated else 1,
+                    "[Expression]": f"'{table_name}'[Column 0] * 2" if calculated else None,
+                    "[ExplicitDataType]": rng.choice([1, 2, 6, 8]),
+                    "[InferredDataType]": rng.choice([2, 9, 11]),
+                    "[DataCategory]": None,
+                    "[Description]": None,
+                    "[IsHidden]": rng.random() < 0.3,
+                    "[ModifiedTime]": modified_at,
+                    "[DisplayFolder]": rng.choice([None, "Keys", "Attributes"])
+                })
+
+            for m in range(n_measures):
+                measures.append({
+                    "[ID]": table_id * 1000 + m,
+                    "[TableID]": table_id,
+                    "[Name]": f"Measure {t}.{m}",
+                    "[Description]": None,
+                    "[DataType]": rng.choice([6, 8, 10]),
+                    "[FormatString]": "#,0.00",
+                    "[Expression]": f"SUM('{table_name}'[Column {rng.randrange(max(n_columns, 1))}])",
+                    "[DisplayFolder]": None,
+                    "[IsHidden]": False,
+                    "[IsSimpleMeasure]": m == 0 and t % 10 == 0,
+                    "[ModifiedTime]": modified_at
+                })
+
+        for r in range(min(n_relationships, max(n_tables - 1, 0))):
+            from_table, to_table = rng.randrange(1, n_tables + 1), rng.randrange(1, n_tables + 1)
+            relationships.append({
+                "[ID]": r + 1,
+                "[FromTableID]": from_table,
+                "[FromColumnID]": from_table * 1000 + 1,
+                "[FromCardinality]": 2,
+                "[ToTableID]": to_table,
+                "[ToColumnID]": to_table * 1000 + 1,
+                "[ToCardinality]": 1,
+                "[CrossFilteringBehavior]": rng.choice([1, 1, 1, 2]),
+                "[IsActive]": rng.random() < 0.9,
+                "[SecurityFilteringBehavior]": 1,
+                "[ModifiedTime]": modified_at
+            })
+
+        # Calculation group table, and a calculated table
+        tables.append({
+            "[ID]": n_tables + 1, "[Name]": "Time Intelligence", "[DataCategory]": None, "[Description]": None, "[IsHidden]": False, 
+            "[ModifiedTime]": modified_at, "[SystemFlags]": 0, "[CalculationGroupID]": n_tables + 100
+        })
+        partitions.append({"[TableID]": n_tables + 1, "[QueryDefinition]": None, "[Type]": 7})
+        tables.append({
+            "[ID]": n_tables + 2, "[Name]": "Calendar", "[DataCategory]": "Time", "[Description]": "Dates", "[IsHidden]": False, 
+            "[ModifiedTime]": modified_at, "[SystemFlags]": 2, "[CalculationGroupID]": None
+        })
+        partitions.append({"[TableID]": n_tables + 2, "[QueryDefinition]": "CALENDARAUTO()", "[Type]": 2})
+
+        calculation_groups = [{"[ID]": n_tables + 100, "[Description]": None, "[Precedence]": 0}]
+        calculation_items = [
+            {
+                "[ID]": i + 1, "[CalculationGroupID]": n_tables + 100, "[Name]": name, 
+                "[Expression]": f"CALCULATE(SELECTEDMEASURE(), {name}('Calendar'[Date]))", "[Description]": None, "[ModifiedTime]": modified_at
+            }
+            for i, name in enumerate(["DATESYTD", "DATESQTD", "DATESMTD"])
+        ]
+
+        data.append({
+            "workspace_id": f"workspace-{d % 5}",
+            "workspace_name": f"Workspace {d % 5}",
+            "dataset_id": f"dataset-{d}",
+            "dataset_name": f"Dataset {d}",
+            "extract_timestamp": timestamp,
+            "info_raw_relationships": relationships,
+            "info_raw_tables": tables,
+            "info_raw_partitions": partitions,
+            "info_raw_columns": columns,
+            "info_raw_measures": measures,
+            "info_raw_calculation_groups": calculation_groups,
+            "info_raw_calculation_items": calculation_items
+        })
+
+    return data
+
+
+def generate_tenant(workspaces=5, datasets=2, reports=2, pages=5, tables=10, columns=10, measures=5, seed=0):
+    """
+    Generates a synthetic Power BI tenant: N workspaces, with M datasets and R reports per workspace and P pages per report.
+    tables, columns and measures describe each semantic model (columns and measures are per table) and are only
+    used to generate its dax info rows, see generate_dataset_info_tables.
+    Ids are guids, as in the Power BI Rest API.
+    """
+    rng = random.Random(seed)
+    new_id = lambda: str(uuid.UUID(int=rng.getrandbits(128), version=4))
+    data = []
+
+    for w in range(workspaces):
+        workspace_datasets = [
+            {"id": new_id(), "name": f"Semantic Model {w}.{d}", "configuredBy": "owner@contoso.com", "createdDate": "2024-01-01T00:00:00Z"}
+            for d in range(datasets)
+        ]
+        workspace_reports = [
+            {
+                "id": new_id(),
+                "name": f"Report {w}.{r}",
+                "reportType": "PowerBIReport",
+                "datasetId": workspace_datasets[r % datasets]["id"] if datasets else None,
+                "pages": [{"name": f"ReportSection{p}", "displayName": f"Page {p}", "order": p} for p in range(pages)]
+            }
+            for r in range(reports)
+        ]
+
+        data.append({
+            "id": new_id(),
+            "name": f"Workspace {w}",
+            "type": "Workspace",
+            "isOnDedicatedCapacity": True,
+            "capacityId": "00000000-0000-0000-0000-000000000001",
+            "defaultDatasetStorageFormat": "Small",
+            "datasets": workspace_datasets,
+            "reports": workspace_reports
+        })
+
+    return {
+        "workspaces": data,
+        "model": {"tables": tables, "columns": columns, "measures": measures}
+    }
+
+
+def generate_dataset_info_tables(dataset_name, tables=10, columns=10, measures=5, raw=False):
+    """
+    Generates the dax info rows of a semantic model, as a list of rows lists in the order of the EVALUATE statements
+    of dax_info_queries.dax (or dax_info_raw_queries.dax if raw). The rows only depend on the dataset name.
+    """
+    seed = zlib.crc32(dataset_name.encode("utf-8"))
+
+    if raw:
+        record = generate_raw_datasets_info_data(1, tables, columns, measures, max(tables - 1, 0), seed)[0]
+    else:
+        record = generate_datasets_info_data(1, tables, columns, measures, max(tables - 1, 0), seed)[0]
+
+    return [rows for key, rows in record.items() if key.startswith("info_")]
@@ -1,14 +1,24 @@
 import os
 import logging
+import argparse
+from datetime import datetime
 from dotenv import load_dotenv
-from src.extract_dax_info_tables import extract_datasets_dax_info
+from src.dax_info_cache import DaxInfoCache
+from src.dax_durations import DaxDurationHistory
+from src.extract_dax_info_tables import extract_datasets_dax_info, get_dax_query_file
+from src.auth import TokenProvider, POWERBI_SCOPE, GRAPH_SCOPE
 from src.extract_powerbi_api import (
-    get_powerbi_access_token, 
     extract_workspaces_ids, 
     extract_workspaces_data, 
     extract_datasets_data, 
     extract_reports_data, 
-    extract_reports_pages
+    extract_reports_pages,
+    extract_scanner_data,
+    extract_datasets_change_signals,
+    WORKSPACES_COLUMNS,
+    DATASETS_COLUMNS,
+    REPORTS_COLUMNS,
+    REPORTS_PAGES_COLUMNS
 )
 from src.transformer import (
     transform_workspaces, 
@@ -16,13 +26,25 @@ from src.transformer import (
     transform_report_pages, 
     transform_datasets, 
     resolve_workspaces_datasets_list, 
+    normalize_datasets_info,
+    normalize_raw_datasets_info,
     transform_relationships_info, 
     transform_tables_info,
     transform_columns_info,
     transform_measures_info,
-    transform_calc_groups
+    transform_calc_groups,
+    build_dax_dependency_index,
+    transform_dax_dependencies,
+    transform_unused_objects
 )
-from src.loader import get_sharepoint_access_token, load_csv_to_sharepoint, export_dataframes_to_excel
+from src.extract_pipeline import extract_pipelined
+from src.checkpoint import CheckpointStore, extract_units, workspace_unit, report_unit, dataset_unit
+from src.records import as_record_table
+from src.http_client import HttpClient
+from src.rate_limiter import RateController
+from src.loader import load_csv_to_sharepoint, export_dataframes
+from src.sharding import select_shard, start_shard, write_shard, merge_shards
+from src.metrics import metrics
 
 logging.basicConfig(
     level=logging.INFO,
@@ -40,33 +62,245 @@ PBI_CLIENT_ID = os.getenv("PBI_CLIENT_ID")
 PBI_CLIENT_SECRET = os.getenv("PBI_CLIENT_SECRET")
 SHAREPOINT_SITE_URL = os.getenv("SHAREPOINT_SITE_URL")
 SHAREPOINT_RELATIVE_URL = os.getenv("SHAREPOINT_RELATIVE_URL")
+SHAREPOINT_UPLOAD_THRESHOLD_MB = float(os.getenv("SHAREPOINT_UPLOAD_THRESHOLD_MB", 4))
+SHAREPOINT_CHUNK_SIZE_MB = float(os.getenv("SHAREPOINT_CHUNK_SIZE_MB", 10))
 LOCAL_EXTRACT = os.getenv("LOCAL_EXTRACT")
 LOCAL_OUTPUT_DIR = os.getenv("LOCAL_OUTPUT_DIR")
+OUTPUT_SINK = os.getenv("OUTPUT_SINK", "EXCEL").upper()
+EXCEL_STREAMING = os.getenv("EXCEL_STREAMING", "N") == "Y"
+SKIP_UNCHANGED_OUTPUTS = os.getenv("SKIP_UNCHANGED_OUTPUTS", "Y") == "Y"
+PBI_MAX_WORKERS = int(os.getenv("PBI_MAX_WORKERS", 1))
+PBI_EXTRACT_BACKEND = os.getenv("PBI_EXTRACT_BACKEND", "REST").upper()
+DAX_MAX_WORKERS = int(os.getenv("DAX_MAX_WORKERS", 1))
+PIPELINED_EXTRACTION = os.getenv("PIPELINED_EXTRACTION", "N") == "Y"
+DSCMD_PATH = os.getenv("DSCMD_PATH")
+DAX_QUERY_MODE = os.getenv("DAX_QUERY_MODE", "VIEWS").upper()
+DAX_INFO_CACHE_DIR = os.getenv("DAX_INFO_CACHE_DIR")
+DAX_INFO_CACHE_MAX_AGE_DAYS = int(os.getenv("DAX_INFO_CACHE_MAX_AGE_DAYS", 7))
+DAX_DURATION_HISTORY_FILE = os.getenv("DAX_DURATION_HISTORY_FILE")
+DAX_TIMEOUT_SECONDS = float(os.getenv("DAX_TIMEOUT_SECONDS", 0))
+DAX_MAX_RETRIES = int(os.getenv("DAX_MAX_RETRIES", 1))
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR")
+TOKEN_CACHE_FILE = os.getenv("TOKEN_CACHE_FILE")
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", max(10, PBI_MAX_WORKERS)))
+HTTP_MAX_REQUESTS_PER_SECOND = float(os.getenv("HTTP_MAX_REQUESTS_PER_SECOND", 20))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", 5))
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", 120))
+METRICS_REPORT_FILE = os.getenv("METRICS_REPORT_FILE")
+METRICS_PROMETHEUS_FILE = os.getenv("METRICS_PROMETHEUS_FILE")
+SHARD_OUTPUT_DIR = os.getenv("SHARD_OUTPUT_DIR", os.path.join("tools", "shards"))
+
+OUTPUT_FILE_NAME = "PowerBI_Docs.xlsx"
+SHEET_NAMES = ["Workspaces", "Reports", "Reports Pages", "Semantic Models", "Tables", "Columns", "Measures", "Calculation Groups", "Relationships",
+               "Dependencies", "Unused Objects"]
+
+def parse_args(argv=None):
+    """
+    Parses the command line arguments.
+    """
+    parser = argparse.ArgumentParser(description="Power BI Docs extractor")
+    parser.add_argument("--full-refresh", action="store_true", help="ignore the dax info cache and the output content hashes: query every semantic model and write every output")
+    parser.add_argument("--resume", action="store_true", help="reuse the extracted data of the previous run in CHECKPOINT_DIR and only extract what is missing")
+    parser.add_argument("--shard-index", type=int, help="only extract the workspaces of this shard, from 0 to --shard-count - 1, and write partial outputs to SHARD_OUTPUT_DIR")
+    parser.add_argument("--shard-count", type=int, help="number of shards the workspaces are partitioned into, by a stable hash of their ids")
+    parser.add_argument("--merge-shards", action="store_true", help="merge the partial outputs of the --shard-count shards in SHARD_OUTPUT_DIR and publish them")
+    parser.add_argument("--run-id", help="id of a sharded run, e.g. its date, given to every shard and to --merge-shards, which rejects partial outputs of other runs")
+    args = parser.parse_args(argv)
+
+    if args.shard_count is not None and args.shard_count < 1:
+        parser.error("--shard-count must be at least 1")
+
+    if args.merge_shards:
+        if args.shard_count is None or args.shard_index is not None:
+            parser.error("--merge-shards requires --shard-count and no --shard-index")
+
+    elif (args.shard_index is None) != (args.shard_count is None):
+        parser.error("--shard-index and --shard-count must be used together")
+
+    elif args.shard_index is not None and not 0 <= args.shard_index < args.shard_count:
+        parser.error("--shard-index must be between 0 and --shard-count - 1")
+
+    if (args.shard_count is not None) != (args.run_id is not None):
+        parser.error("--run-id is required with --shard-count, and only used by sharded runs")
+
+    return args
+
+
+def publish_dataframes(dataframes, sheet_names, http_client, skip_unchanged=False, info_datasets=None):
+    """
+    Writes the output frames to LOCAL_OUTPUT_DIR with OUTPUT_SINK, or uploads the workbook to Sharepoint.
+    info_datasets lists the (workspace_id, dataset_id) of the semantic models whose dax info was extracted in the run.
+    """
+    if LOCAL_EXTRACT == "Y":
+        export_dataframes(
+            OUTPUT_SINK, LOCAL_OUTPUT_DIR, dataframes, sheet_names, file_name=OUTPUT_FILE_NAME, streaming=EXCEL_STREAMING, skip_unchanged=skip_unchanged,
+            info_datasets=info_datasets
+        )
+    else:
+        sp_token = TokenProvider(PBI_TENANT_ID, PBI_CLIENT_ID, PBI_CLIENT_SECRET, GRAPH_SCOPE, http_client, TOKEN_CACHE_FILE)
+        load_csv_to_sharepoint(
+            sp_token, SHAREPOINT_SITE_URL, SHAREPOINT_RELATIVE_URL, OUTPUT_FILE_NAME, dataframes, sheet_names, http_client, EXCEL_STREAMING,
+            int(SHAREPOINT_UPLOAD_THRESHOLD_MB * 1024 * 1024), int(SHAREPOINT_CHUNK_SIZE_MB * 1024 * 1024), skip_unchanged
+        )
+
+
+def main(argv=None):  
+    args = parse_args(argv)
+
+    # Run metrics are only recorded when a report file is configured
+    if METRICS_REPORT_FILE or METRICS_PROMETHEUS_FILE:
+        metrics.enable()
+
+    # Shared pooled and rate controlled connections for Power BI Rest API, Entra and Graph API calls
+    rate_controller = RateController(default_rate=HTTP_MAX_REQUESTS_PER_SECOND, max_retries=HTTP_MAX_RETRIES)
+    http_client = HttpClient(
+        pool_size=HTTP_POOL_SIZE, headers={"User-Agent": "powerbi-docs-extractor"}, timeout=HTTP_TIMEOUT_SECONDS or None, rate_controller=rate_controller
+    )
+
+    # Outputs whose content did not change since the last run are not written again
+    skip_unchanged = SKIP_UNCHANGED_OUTPUTS and not args.full_refresh
+    sharded = args.shard_index is not None
 
-def main():  
     try:
+        if args.merge_shards:
+            logging.info(f"Merging the partial outputs of {args.shard_count} shards...")
+            dataframes, info_datasets = merge_shards(SHARD_OUTPUT_DIR, args.shard_count, args.run_id, SHEET_NAMES)
+
+            logging.info("Loading data to target object storage...")
+            publish_dataframes(dataframes, SHEET_NAMES, http_client, skip_unchanged, info_datasets)
+            logging.info("Succesfully completed the Power BI Docs merge.")
+            metrics.set_gauge("run_success", 1)
+            return
+
         logging.info("Starting Power BI Docs extractor...")
 
-        # Get access token for Power BI Rest API
-        pbi_token = get_powerbi_access_token(PBI_TENANT_ID, PBI_CLIENT_ID, PBI_CLIENT_SECRET)
+        # A failed shard run leaves no manifest, so the merge never publishes the partial outputs of a previous run
+        if sharded:
+            start_shard(SHARD_OUTPUT_DIR, args.shard_index, args.shard_count)
+
+        # Token provider for Power BI Rest API, refreshed before the token expires
+        pbi_token = TokenProvider(PBI_TENANT_ID, PBI_CLIENT_ID, PBI_CLIENT_SECRET, POWERBI_SCOPE, http_client, TOKEN_CACHE_FILE)
+
+        # Checkpoint of the extracted data, persisted unit by unit so a failed run can be resumed
+        checkpoint = None
+
+        if CHECKPOINT_DIR:
+            checkpoint_config = {"backend": PBI_EXTRACT_BACKEND, "dax_query_mode": DAX_QUERY_MODE}
+
+            # The checkpoint of a shard is not resumed by another shard
+            if sharded:
+                checkpoint_config["shard"] = f"{args.shard_index}/{args.shard_count}"
+
+            checkpoint = CheckpointStore(CHECKPOINT_DIR, checkpoint_config, args.resume)
+
+        elif args.resume:
+            logging.warning("CHECKPOINT_DIR is not set. Ignoring --resume...")
 
         # Extract list of workspaces ids from Power BI Rest API
-        workspaces_ids = extract_workspaces_ids(pbi_token)
-        
-        # Extract data from Power BI Rest API
-        logging.info("Extracting workspaces data...")
-        workspaces_data = extract_workspaces_data(pbi_token, workspaces_ids)
+        workspaces_ids = extract_units(
+            checkpoint, "workspaces_ids", ["all"], lambda items: extract_workspaces_ids(pbi_token, http_client), str, lambda record: "all"
+        )
+
+        if sharded:
+            workspaces_ids = select_shard(workspaces_ids, args.shard_index, args.shard_count)
+            logging.info(f"Extracting shard {args.shard_index} of {args.shard_count}: {len(workspaces_ids)} workspaces...")
+
+            if not workspaces_ids:
+                write_shard(SHARD_OUTPUT_DIR, args.shard_index, args.shard_count, args.run_id, [], [], 0, [])
+                metrics.set_gauge("run_success", 1)
+                return
         
-        logging.info("Extracting report data...")
-        reports_data = extract_reports_data(pbi_token, workspaces_ids)
-        reports_pages_data = extract_reports_pages(pbi_token, reports_data)
+        # Extract timestamp shared by all the Power BI Rest API records of the run
+        run_timestamp = datetime.now()
 
-        logging.info("Extracting semantic models data...")
-        datasets_data = extract_datasets_data(pbi_token, workspaces_ids)    
+        # Persistent dax info cache, keyed by semantic model change signals
+        dax_info_cache = None
 
-        # Extract data from Dax Studio CDM
-        workspaces_datasets_list = resolve_workspaces_datasets_list(datasets_data, workspaces_data)
-        datasets_info_data = extract_datasets_dax_info(PBI_TENANT_ID, PBI_CLIENT_ID, PBI_CLIENT_SECRET, workspaces_datasets_list)
+        if DAX_INFO_CACHE_DIR:
+            dax_query_file = get_dax_query_file(DAX_QUERY_MODE)
+            dax_info_cache = DaxInfoCache(DAX_INFO_CACHE_DIR, dax_query_file, args.full_refresh, DAX_INFO_CACHE_MAX_AGE_DAYS)
+
+        # Durations of the dax info exports, to export the slowest semantic models first and size their timeouts
+        dax_history = DaxDurationHistory(DAX_DURATION_HISTORY_FILE)
+
+        if PIPELINED_EXTRACTION:
+            # Extract data from Power BI Rest API and Dax Studio CDM, starting each dataset as soon as it is known
+            logging.info("Extracting Power BI data with pipelined stages...")
+            workspaces_data, reports_data, reports_pages_data, datasets_data, datasets_info_data = extract_pipelined(
+                pbi_token, workspaces_ids, PBI_TENANT_ID, PBI_CLIENT_ID, PBI_CLIENT_SECRET, PBI_EXTRACT_BACKEND,
+                PBI_MAX_WORKERS, DAX_MAX_WORKERS, http_client, DSCMD_PATH, dax_info_cache, DAX_QUERY_MODE, checkpoint, run_timestamp,
+                dax_history, DAX_TIMEOUT_SECONDS, DAX_MAX_RETRIES
+            )
+
+        else:
+            # Extract data from Power BI Rest API
+            if PBI_EXTRACT_BACKEND == "SCANNER":
+                logging.info("Extracting workspaces, report and semantic models data with the Admin Scanner API...")
+                workspaces_data, datasets_data, reports_data = extract_units(
+                    checkpoint, ("workspaces", "datasets", "reports"), workspaces_ids,
+                    lambda ids: extract_scanner_data(pbi_token, ids, PBI_MAX_WORKERS, http_client, timestamp=run_timestamp), str, workspace_unit
+                )
+            
+            else:
+                logging.info("Extracting workspaces data...")
+                workspaces_data = extract_units(
+                    checkpoint, "workspaces", workspaces_ids, lambda ids: extract_workspaces_data(pbi_token, ids, PBI_MAX_WORKERS, http_client, run_timestamp), str, workspace_unit
+                )
+                
+                logging.info("Extracting report data...")
+                reports_data = extract_units(
+                    checkpoint, "reports", workspaces_ids, lambda ids: extract_reports_data(pbi_token, ids, PBI_MAX_WORKERS, http_client, run_timestamp), str, workspace_unit
+                )
+
+                logging.info("Extracting semantic models data...")
+                datasets_data = extract_units(
+                    checkpoint, "datasets", workspaces_ids, lambda ids: extract_datasets_data(pbi_token, ids, PBI_MAX_WORKERS, http_client, run_timestamp), str, workspace_unit
+                )
+
+            # Records read back from a checkpoint are lists, kept as column-oriented tables like the extracted ones
+            workspaces_data = as_record_table(workspaces_data, WORKSPACES_COLUMNS)
+            datasets_data = as_record_table(datasets_data, DATASETS_COLUMNS)
+            reports_data = as_record_table(reports_data, REPORTS_COLUMNS)
+
+            reports_pages_data = extract_units(
+                checkpoint, "reports_pages", reports_data, 
+                lambda reports: extract_reports_pages(pbi_token, reports, PBI_MAX_WORKERS, http_client, run_timestamp), report_unit, report_unit
+            )
+            reports_pages_data = as_record_table(reports_pages_data, REPORTS_PAGES_COLUMNS)
+
+            # Extract data from Dax Studio CDM
+            workspaces_datasets_list = resolve_workspaces_datasets_list(datasets_data, workspaces_data)
+
+            def extract_datasets_info(datasets_list):
+                if dax_info_cache:
+                    units = {dataset_unit(i) for i in datasets_list}
+                    datasets_to_check = [i for i in datasets_data if dataset_unit(i) in units]
+                    change_signals = extract_datasets_change_signals(pbi_token, datasets_to_check, PBI_MAX_WORKERS, http_client)
+
+                    for i in datasets_list:
+                        i["change_signal"] = change_signals.get((i.get("workspace_id"), i.get("dataset_id")))
+
+                # Each semantic model is checkpointed as soon as it is exported
+                on_result = (lambda record: checkpoint.put("datasets_info", dataset_unit(record), [record])) if checkpoint else None
+
+                return extract_datasets_dax_info(
+                    PBI_TENANT_ID, PBI_CLIENT_ID, PBI_CLIENT_SECRET, datasets_list, DAX_MAX_WORKERS, DSCMD_PATH, dax_info_cache,
+                    DAX_QUERY_MODE, on_result, dax_history, DAX_TIMEOUT_SECONDS, DAX_MAX_RETRIES
+                )
+
+            datasets_info_data = extract_units(
+                checkpoint, "datasets_info", workspaces_datasets_list, extract_datasets_info, dataset_unit, dataset_unit, persist_empty=False
+            )
+
+        if dax_info_cache:
+            # Drop cached semantic models which no longer exist
+            dax_info_cache.prune([(i.get("workspace_id"), i.get("dataset_id")) for i in datasets_data])
+            dax_info_cache.save()
+
+        # Slow and timed out semantic models are listed in the run metrics
+        dax_history.report()
+        dax_history.prune([(i.get("workspace_id"), i.get("dataset_id")) for i in datasets_data])
+        dax_history.save()
 
         # Transform data and prepare for load
         logging.info("Transforming and preparing data for load...")
@@ -74,30 +308,67 @@ def main():
         reports_df = transform_reports(reports_data, datasets_data, workspaces_data)
         reports_pages_df = transform_report_pages(reports_pages_data, reports_data, workspaces_data)
         datasets_df = transform_datasets(datasets_data, workspaces_data)
-        tables_df = transform_tables_info(datasets_info_data)
-        columns_df = transform_columns_info(datasets_info_data)
-        measures_df = transform_measures_info(datasets_info_data)
-        calc_groups_df = transform_calc_groups(datasets_info_data)
-        relationships_df = transform_relationships_info(datasets_info_data)
-
-        # Load prepared data to Sharepoint
-        logging.info("Loading data to target object storage...")
-        dataframes = [workspaces_df, reports_df, reports_pages_df, datasets_df, tables_df, columns_df, measures_df, calc_groups_df, relationships_df]
-        sheet_names = ["Workspaces", "Reports", "Reports Pages", "Semantic Models", "Tables", "Columns", "Measures", "Calculation Groups", "Relationships"]
-        file_name = "PowerBI_Docs.xlsx"
-        
-        if LOCAL_EXTRACT == "Y":
-            file_name = os.path.join(LOCAL_OUTPUT_DIR, "PowerBI_Docs.xlsx")
-            export_dataframes_to_excel(file_name, dataframes, sheet_names)
-            logging.info("Succesfully completed the Power BI Docs extraction.")
+
+        if DAX_QUERY_MODE == "RAW":
+            info_frames = normalize_raw_datasets_info(datasets_info_data)
         else:
-            sp_token = get_sharepoint_access_token(PBI_TENANT_ID, PBI_CLIENT_ID, PBI_CLIENT_SECRET)
-            load_csv_to_sharepoint(sp_token, SHAREPOINT_SITE_URL, SHAREPOINT_RELATIVE_URL, file_name, dataframes, sheet_names)
+            info_frames = normalize_datasets_info(datasets_info_data)
+
+        tables_df = transform_tables_info(datasets_info_data, info_frames)
+        columns_df = transform_columns_info(datasets_info_data, info_frames)
+        measures_df = transform_measures_info(datasets_info_data, info_frames)
+        calc_groups_df = transform_calc_groups(datasets_info_data, info_frames)
+        relationships_df = transform_relationships_info(datasets_info_data, info_frames)
+        dependency_index = build_dax_dependency_index(columns_df, measures_df, calc_groups_df, relationships_df)
+        dependencies_df = transform_dax_dependencies(dependency_index)
+        unused_objects_df = transform_unused_objects(dependency_index)
+
+        # Semantic models whose dax info was extracted in the run; failed exports keep their previous rows in the SQLite sink
+        info_datasets = [(i.get("workspace_id"), i.get("dataset_id")) for i in datasets_info_data]
+
+        dataframes = [workspaces_df, reports_df, reports_pages_df, datasets_df, tables_df, columns_df, measures_df, calc_groups_df, relationships_df,
+                      dependencies_df, unused_objects_df]
 
+        if sharded:
+            # The partial outputs of the shards are published at once by --merge-shards
+            write_shard(SHARD_OUTPUT_DIR, args.shard_index, args.shard_count, args.run_id, dataframes, SHEET_NAMES, len(workspaces_ids), info_datasets)
+            logging.info(f"Succesfully completed the Power BI Docs extraction of shard {args.shard_index} of {args.shard_count}.")
+        else:
+            # Load prepared data to Sharepoint
+            logging.info("Loading data to target object storage...")
+            publish_dataframes(dataframes, SHEET_NAMES, http_client, skip_unchanged, info_datasets)
             logging.info("Succesfully completed the Power BI Docs extraction.")
+
+        metrics.set_gauge("run_success", 1)
     
     except Exception as e:
+        metrics.set_gauge("run_success", 0)
         logging.error(f"Critical error: {e}")
 
+    finally:
+        http_client.close()
+        save_metrics()
+
+
+def save_metrics():
+    """
+    Writes the run metrics to the configured json report and Prometheus textfile.
+    """
+    if not metrics.enabled:
+        return
+
+    metrics.set_gauge("run_duration_seconds", metrics.elapsed())
+    metrics.disable()
+
+    try:
+        if METRICS_REPORT_FILE:
+            metrics.save_json(METRICS_REPORT_FILE)
+
+        if METRICS_PROMETHEUS_FILE:
+            metrics.save_prometheus(METRICS_PROMETHEUS_FILE)
+
+    except OSError as e:
+        logging.error(f"Failed to save run metrics: {e}")
+
 if __name__ == "__main__":
     main()
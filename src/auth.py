@@ -0,0 +1,141 @@
+import os
+import json
+import time
+import threading
+import requests
+
+LOGIN_URL = "https://login.microsoftonline.com"
+
+POWERBI_SCOPE = "https://analysis.windows.net/powerbi/api/.default"
+GRAPH_SCOPE = "https://graph.microsoft.com/.default"
+
+# Tokens are refreshed when they expire in less than this number of seconds
+TOKEN_REFRESH_MARGIN = 300
+
+
+class TokenProvider:
+    """
+    Provides Bearer tokens for a service principal and scope with the client credentials flow.
+    Tokens are cached in memory (shared by all providers of the same tenant, client and scope) and optionally
+    in a json file on disk, and are refreshed proactively before they expire. Safe to use from concurrent workers.
+    """
+
+    _cache = {}
+    _locks = {}
+    _locks_lock = threading.Lock()
+
+    def __init__(self, tenant_id, client_id, client_secret, scope, http_client=None, cache_file=None, refresh_margin=TOKEN_REFRESH_MARGIN):
+        self.tenant_id = tenant_id
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.scope = scope
+        self.http_client = http_client
+        self.cache_file = cache_file
+        self.refresh_margin = refresh_margin
+        self.key = f"{tenant_id}|{client_id}|{scope}"
+
+        with TokenProvider._locks_lock:
+            self._lock = TokenProvider._locks.setdefault(self.key, threading.Lock())
+
+    def get_token(self):
+        """
+        Returns a valid access token, requesting a new one if the cached token is missing or about to expire.
+        """
+        with self._lock:
+            entry = TokenProvider._cache.get(self.key) or self._read_cache_file()
+
+            if entry and entry["expires_at"] - self.refresh_margin > time.time():
+                TokenProvider._cache[self.key] = entry
+                return entry["access_token"]
+
+            entry = self._request_token()
+            TokenProvider._cache[self.key] = entry
+            self._write_cache_file(entry)
+            return entry["access_token"]
+
+    def invalidate(self):
+        """
+        Drops the cached token, e.g. after a 401 response.
+        """
+        with self._lock:
+            TokenProvider._cache.pop(self.key, None)
+            self._write_cache_file(None)
+
+    def _request_token(self):
+        url = f"{LOGIN_URL}/{self.tenant_id}/oauth2/v2.0/token"
+
+        payload = {
+            "grant_type": "client_credentials",
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+            "scope": self.scope
+        }
+
+        requested_at = time.time()
+
+        # A token request has no side effects, so it is retried on server errors like a GET
+        if self.http_client is None:
+            response = requests.post(url=url, data=payload)
+        else:
+            response = self.http_client.post(url=url, data=payload, idempotent=True)
+
+        if response.status_code == 200:
+            response_json = response.json()
+            return {
+                "access_token": response_json["access_token"],
+                "expires_at": requested_at + int(response_json.get("expires_in", 3599))
+            }
+
+        raise KeyError(f"Error to get access token for {self.scope}: {response.status_code} - {response.text}")
+
+    def _read_cache_file(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return None
+
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as file:
+                return json.load(file).get(self.key)
+
+        except (OSError, ValueError):
+            return None
+
+    def _write_cache_file(self, entry):
+        if not self.cache_file:
+            return
+
+        data = {}
+
+        if os.path.exists(self.cache_file):
+            try:
+                with open(self.cache_file, "r", encoding="utf-8") as file:
+                    data = json.load(file)
+
+            except (OSError, ValueError):
+                data = {}
+
+        if entry is None:
+            data.pop(self.key, None)
+        else:
+            data[self.key] = entry
+
+        cache_dir = os.path.dirname(os.path.abspath(self.cache_file))
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # The cache file holds bearer tokens, so it is only readable by the current user
+        temp_file = f"{self.cache_file}.tmp"
+        file_descriptor = os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+
+        with os.fdopen(file_descriptor, "w", encoding="utf-8") as file:
+            json.dump(data, file)
+
+        os.replace(temp_file, self.cache_file)
+
+
+def resolve_access_token(access_token):
+    """
+    Returns a token string for either a token string or a TokenProvider.
+    """
+    if isinstance(access_token, TokenProvider):
+        return access_token.get_token()
+
+    return access_token
@@ -0,0 +1,188 @@
+import os
+import json
+import logging
+import threading
+from datetime import datetime
+from src.info_rows import InfoRows, decode_info_rows
+
+MANIFEST_FILE = "manifest.json"
+
+# Keys restored as datetimes when the records of a checkpoint are read back
+DATETIME_KEYS = ["extract_timestamp"]
+
+
+def workspace_unit(record):
+    return record.get("workspace_id")
+
+
+def report_unit(record):
+    return f"{record.get('workspace_id')}:{record.get('report_id')}"
+
+
+def dataset_unit(record):
+    return f"{record.get('workspace_id')}:{record.get('dataset_id')}"
+
+
+def encode_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+
+    if isinstance(value, InfoRows):
+        return value.to_json()
+
+    return str(value)
+
+
+def decode_records(value):
+    """
+    Restores the datetimes and InfoRows of records read back from a checkpoint, in nested lists too.
+    """
+    if isinstance(value, list):
+        return [decode_records(i) for i in value]
+
+    if isinstance(value, dict):
+        for key in DATETIME_KEYS:
+            if isinstance(value.get(key), str):
+                value[key] = datetime.fromisoformat(value[key])
+
+        decode_info_rows(value)
+
+    return value
+
+
+class CheckpointStore:
+    """
+    Persists the raw output of each extraction unit (e.g. the reports of a workspace, or the dax info of a dataset)
+    as soon as it completes, in one append-only JSONL file per stage. Each line is {"unit": ..., "records": [...]}.
+    With resume, the units of the previous run are read back, so only the missing units are extracted again.
+    Without resume, or if the run config changed, the checkpoint is cleared. Safe to use from concurrent workers.
+    """
+
+    def __init__(self, checkpoint_dir, config, resume=False):
+        self.checkpoint_dir = checkpoint_dir
+        self.config = config
+        self.units = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        manifest_file = os.path.join(checkpoint_dir, MANIFEST_FILE)
+        manifest = None
+
+        if resume and os.path.exists(manifest_file):
+            with open(manifest_file, "r", encoding="utf-8") as file:
+                manifest = json.load(file)
+
+        if manifest and manifest.get("config") == config:
+            self.load()
+            logging.info(f"Resuming from checkpoint {checkpoint_dir} with {sum(len(i) for i in self.units.values())} completed units.")
+            return
+
+        if resume:
+            logging.warning(f"No checkpoint to resume in {checkpoint_dir} for the current config. Starting a new run...")
+
+        self.clear()
+
+        with open(manifest_file, "w", encoding="utf-8") as file:
+            json.dump({"config": config, "started_at": datetime.now().isoformat()}, file)
+
+    def _stage_file(self, stage):
+        return os.path.join(self.checkpoint_dir, f"{stage}.jsonl")
+
+    def load(self):
+        """
+        Reads back the units of every stage file. A truncated last line, e.g. after a crash, is skipped.
+        """
+        self.units = {}
+
+        for file_name in os.listdir(self.checkpoint_dir):
+            if not file_name.endswith(".jsonl"):
+                continue
+
+            stage = file_name[:-len(".jsonl")]
+            units = self.units.setdefault(stage, {})
+
+            with open(os.path.join(self.checkpoint_dir, file_name), "r", encoding="utf-8") as file:
+                for line_number, line in enumerate(file, 1):
+                    try:
+                        entry = json.loads(line)
+
+                    except ValueError:
+                        logging.warning(f"Skipping invalid checkpoint line {file_name}:{line_number}.")
+                        continue
+
+                    units[entry["unit"]] = decode_records(entry["records"])
+
+    def get(self, stage, unit):
+        """
+        Returns the records of a completed unit, or None if it is missing.
+        """
+        with self._lock:
+            return self.units.get(stage, {}).get(unit)
+
+    def put(self, stage, unit, records):
+        """
+        Appends the records of a completed unit to its stage file.
+        """
+        line = json.dumps({"unit": unit, "records": records}, default=encode_value)
+
+        with self._lock:
+            with open(self._stage_file(stage), "a", encoding="utf-8") as file:
+                file.write(line + "\n")
+
+            self.units.setdefault(stage, {})[unit] = records
+
+    def clear(self):
+        """
+        Removes all checkpointed units.
+        """
+        for file_name in os.listdir(self.checkpoint_dir):
+            if file_name.endswith(".jsonl") or file_name == MANIFEST_FILE:
+                os.remove(os.path.join(self.checkpoint_dir, file_name))
+
+        self.units = {}
+
+
+def extract_units(checkpoint, stages, items, extract, item_unit, record_unit, persist_empty=True):
+    """
+    Extracts the items which are not completed in the checkpoint with extract(missing_items), stores their records
+    by unit, and returns the records of all items in the order of items.
+    stages is a stage name, with extract returning a list of records, or a tuple of stage names, with extract returning
+    a tuple of lists. Units already stored while extract was running (e.g. by a callback) are not stored again.
+    With persist_empty=False, units without records are considered failed and are not stored.
+    Without checkpoint, returns extract(items).
+    """
+    if checkpoint is None:
+        return extract(items)
+
+    stages_list = [stages] if isinstance(stages, str) else list(stages)
+    units = [item_unit(i) for i in items]
+    missing = [item for item, unit in zip(items, units) if any(checkpoint.get(stage, unit) is None for stage in stages_list)]
+
+    if missing:
+        result = extract(missing)
+        results = [result] if isinstance(stages, str) else list(result)
+
+        for stage, records in zip(stages_list, results):
+            grouped = {}
+
+            for record in records:
+                grouped.setdefault(record_unit(record), []).append(record)
+
+            for item in missing:
+                unit = item_unit(item)
+                unit_records = grouped.get(unit, [])
+
+                if (unit_records or persist_empty) and checkpoint.get(stage, unit) is None:
+                    checkpoint.put(stage, unit, unit_records)
+
+    outputs = []
+
+    for stage in stages_list:
+        records = []
+
+        for unit in units:
+            records.extend(checkpoint.get(stage, unit) or [])
+
+        outputs.append(records)
+
+    return outputs[0] if isinstance(stages, str) else tuple(outputs)
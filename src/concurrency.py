@@ -0,0 +1,15 @@
+from concurrent.futures import ThreadPoolExecutor
+
+
+def map_concurrently(func, items, max_workers=1):
+    """
+    Applies a function to each item with a bounded pool of worker threads.
+    Results are returned in the same order as the input items.
+    """
+    items = list(items)
+
+    if max_workers is None or max_workers <= 1 or len(items) <= 1:
+        return [func(i) for i in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        return list(executor.map(func, items))
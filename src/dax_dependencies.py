@@ -0,0 +1,122 @@
+import re
+
+# Tokens of a DAX expression, matched in a single left to right pass: string literals and comments are consumed whole
+# so references inside them are ignored, 'Table Name'[Name], Table[Name] and [Name] are the references, and other
+# identifiers (functions, keywords, variables) are consumed whole so a reference never starts inside them.
+DAX_TOKENS = re.compile(r"""
+    "[^"]*(?:""[^"]*)*"?
+  | //[^\n]* | --[^\n]* | /\*.*?(?:\*/|\Z)
+  | (?:'(?P<quoted_table>[^']*(?:''[^']*)*)' | (?P<table>[^\W\d]\w*))? \[(?P<name>[^\]]*(?:\]\][^\]]*)*)\]
+  | '[^']*(?:''[^']*)*'?
+  | [^\W\d]\w*
+""", re.VERBOSE | re.DOTALL)
+
+OBJECT_COLUMN = "Column"
+OBJECT_MEASURE = "Measure"
+OBJECT_CALCULATION_ITEM = "Calculation Item"
+
+
+def iter_dax_references(expression):
+    """
+    Yields the (table_name, name) references of a DAX expression, with table_name None for unqualified [Name] references.
+    """
+    # findall returns every token with empty groups for the ones which are not references, without a match object each
+    for quoted_table, table, name in DAX_TOKENS.findall(expression):
+        if not name:
+            continue
+
+        if quoted_table:
+            table = quoted_table.replace("''", "'")
+
+        yield table or None, name.replace("]]", "]")
+
+
+class DaxDependencyIndex:
+    """
+    Inverted index of the columns and measures of semantic models by case-insensitive name. The references of each DAX
+    expression added are resolved with dict lookups into dependency edges, so the index is built in one pass over
+    the objects and expressions, and the objects no expression or relationship refers to are found without rescanning.
+    Semantic models are identified by a (workspace_id, dataset_id) key, and objects by (object_type, table_name, name).
+    """
+
+    __slots__ = ("models", "columns", "measures", "objects", "edges", "referenced")
+
+    def __init__(self):
+        self.models = {}
+        self.columns = {}
+        self.measures = {}
+        self.objects = []
+        self.edges = []
+        self.referenced = set()
+
+    def add_model(self, model, workspace_name, dataset_name, extract_timestamp):
+        if model not in self.models:
+            self.models[model] = (workspace_name, dataset_name, extract_timestamp)
+
+    def add_column(self, model, table_name, column_name, is_hidden_flag=None, candidate=True):
+        """
+        Indexes a column. Columns which are not candidates (e.g. of calculation group tables) are resolved but never unused.
+        """
+        self.columns[(model, table_name.casefold(), column_name.casefold())] = (OBJECT_COLUMN, table_name, column_name)
+
+        if candidate:
+            self.objects.append((model, OBJECT_COLUMN, table_name, column_name, is_hidden_flag))
+
+    def add_measure(self, model, table_name, measure_name, is_hidden_flag=None):
+        self.measures[(model, measure_name.casefold())] = (OBJECT_MEASURE, table_name, measure_name)
+        self.objects.append((model, OBJECT_MEASURE, table_name, measure_name, is_hidden_flag))
+
+    def resolve(self, model, table_name, reference_table, reference_name):
+        """
+        Returns the object a reference of an expression of table_name refers to, or None. Table[Name] is a column, or a
+        measure qualified by its table. [Name] is a measure, or a column of the same table in row context.
+        """
+        name = reference_name.casefold()
+
+        if reference_table is not None:
+            return self.columns.get((model, reference_table.casefold(), name)) or self.measures.get((model, name))
+
+        target = self.measures.get((model, name))
+
+        if target is None and table_name is not None:
+            target = self.columns.get((model, table_name.casefold(), name))
+
+        return target
+
+    def add_expression(self, model, object_type, table_name, name, expression):
+        """
+        Adds an edge from an object to each distinct object its DAX expression refers to. References which do not
+        resolve (e.g. columns of table variables) are ignored.
+        """
+        source = (object_type, table_name, name)
+        seen = set()
+
+        for reference_table, reference_name in iter_dax_references(expression):
+            target = self.resolve(model, table_name, reference_table, reference_name)
+
+            if target is None or target == source or target in seen:
+                continue
+
+            seen.add(target)
+            self.edges.append((model, source, target))
+            self.referenced.add((model, target))
+
+    def add_relationship_column(self, model, table_name, column_name):
+        """
+        Marks a column used by a relationship as referenced.
+        """
+        target = self.columns.get((model, table_name.casefold(), column_name.casefold()))
+
+        if target is not None:
+            self.referenced.add((model, target))
+
+    def iter_unused(self):
+        """
+        Yields the (model, object_type, table_name, name, is_hidden_flag) of the indexed columns and measures which no
+        expression or relationship refers to.
+        """
+        referenced = self.referenced
+
+        for model, object_type, table_name, name, is_hidden_flag in self.objects:
+            if (model, (object_type, table_name, name)) not in referenced:
+                yield model, object_type, table_name, name, is_hidden_flag
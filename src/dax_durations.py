@@ -0,0 +1,179 @@
+import os
+import json
+import logging
+import threading
+from datetime import datetime
+from src.metrics import metrics
+
+# Recorded export durations kept per semantic model. The expected duration of a semantic model is their mean
+DURATION_HISTORY_SIZE = 5
+
+# A semantic model with a duration history gets at least this factor times its slowest recorded duration as timeout
+TIMEOUT_HISTORY_FACTOR = 3
+
+# Each retry of a timed out export gets this factor times the timeout of the previous attempt
+RETRY_TIMEOUT_FACTOR = 2
+
+# Slowest semantic models of a run listed in the run metrics, in addition to the ones which timed out
+SLOW_DATASETS_REPORTED = 10
+
+
+class DaxDurationHistory:
+    """
+    Durations of the dax info exports by semantic model, keyed by workspace id and dataset id, and persisted to a json
+    file between runs when a file name is given. The historically slowest semantic models are scheduled first (longest
+    processing time first), so a run does not end waiting on a slow export started last, and their timeouts are sized
+    from their history. The duration and status of each export of the current run are kept for the run metrics.
+    Safe to use from concurrent workers.
+    """
+
+    def __init__(self, file_name=None):
+        self.file_name = file_name
+        self.datasets = {}
+        self.run = {}
+        self._lock = threading.Lock()
+
+        if file_name and os.path.exists(file_name):
+            try:
+                with open(file_name, "r", encoding="utf-8") as file:
+                    self.datasets = json.load(file).get("datasets", {})
+
+            except (OSError, ValueError) as e:
+                logging.warning(f"Invalid dax info duration history {file_name}: {e}. Starting a new history...")
+
+    @staticmethod
+    def _key(dataset):
+        return f"{dataset.get('workspace_id')}_{dataset.get('dataset_id')}"
+
+    def expected_duration(self, dataset):
+        """
+        Returns the expected export duration of a semantic model in seconds: the mean of its recorded durations, or the
+        duration of its last timed out export if longer. None without history.
+        """
+        entry = self.datasets.get(self._key(dataset))
+
+        if not entry:
+            return None
+
+        durations = entry.get("durations")
+        expected = sum(durations) / len(durations) if durations else None
+
+        if entry.get("timed_out_s") is not None:
+            expected = max(expected or 0, entry["timed_out_s"])
+
+        return expected
+
+    def order_longest_first(self, items, key=lambda item: item):
+        """
+        Returns items sorted by the expected duration of their semantic model, longest first. key returns the dataset
+        of an item. Semantic models without history (e.g. new ones) come first, in their original order.
+        """
+        def expected(item):
+            duration = self.expected_duration(key(item))
+            return float("inf") if duration is None else duration
+
+        return sorted(items, key=expected, reverse=True)
+
+    def get_timeout(self, dataset, timeout, attempt=0):
+        """
+        Returns the timeout in seconds of an export attempt of a semantic model: the base timeout, raised for semantic
+        models whose completed exports were close to it, and multiplied by RETRY_TIMEOUT_FACTOR for each retry.
+        None if timeout is not set.
+        """
+        if not timeout:
+            return None
+
+        entry = self.datasets.get(self._key(dataset))
+
+        if entry and entry.get("durations"):
+            timeout = max(timeout, TIMEOUT_HISTORY_FACTOR * max(entry["durations"]))
+
+        return timeout * RETRY_TIMEOUT_FACTOR ** attempt
+
+    def record(self, dataset, duration, status):
+        """
+        Records an export attempt of a semantic model, with status "ok", "timeout" or "failed". The duration of a timed
+        out attempt is kept as a lower bound until the next completed export, so the semantic model is scheduled first
+        next time, but it does not raise its timeout.
+        """
+        key = self._key(dataset)
+
+        with self._lock:
+            run_entry = self.run.setdefault(key, {
+                "workspace_name": dataset.get("workspace_name"),
+                "dataset_name": dataset.get("dataset_name"),
+                "duration_s": 0.0,
+                "attempts": 0
+            })
+            run_entry["duration_s"] += duration
+            run_entry["attempts"] += 1
+            run_entry["status"] = status
+
+            if status != "failed":
+                entry = self.datasets.setdefault(key, {"durations": []})
+                entry["dataset_name"] = dataset.get("dataset_name")
+                entry["updated_at"] = datetime.now().isoformat()
+
+                if status == "timeout":
+                    entry["timed_out_s"] = round(duration, 3)
+                else:
+                    entry["durations"] = (entry["durations"] + [round(duration, 3)])[-DURATION_HISTORY_SIZE:]
+                    entry.pop("timed_out_s", None)
+
+        metrics.observe("dax_info_export_duration_seconds", duration, status=status)
+
+        if status == "timeout":
+            metrics.increment("dax_info_timeouts_total")
+
+    def report(self):
+        """
+        Logs the semantic models which timed out, and sets the dax_info_dataset_duration_seconds gauge of the slowest
+        semantic models of the run and of the ones which timed out, so they are listed in the run metrics.
+        """
+        with self._lock:
+            entries = list(self.run.values())
+
+        slowest = sorted(entries, key=lambda i: i["duration_s"], reverse=True)[:SLOW_DATASETS_REPORTED]
+        timed_out = [i for i in entries if i["status"] == "timeout"]
+
+        for entry in slowest + timed_out:
+            metrics.set_gauge(
+                "dax_info_dataset_duration_seconds", round(entry["duration_s"], 3), workspace_name=entry["workspace_name"],
+                dataset_name=entry["dataset_name"], status=entry["status"], attempts=entry["attempts"]
+            )
+
+        if timed_out:
+            names = ", ".join(f"{i['workspace_name']} - {i['dataset_name']}" for i in timed_out)
+            logging.warning(f"{len(timed_out)} semantic models timed out: {names}")
+
+    def prune(self, datasets_keys):
+        """
+        Removes the history of semantic models which are not in the given list of (workspace_id, dataset_id).
+        """
+        keep = {self._key({"workspace_id": workspace_id, "dataset_id": dataset_id}) for workspace_id, dataset_id in datasets_keys}
+
+        with self._lock:
+            for key in list(self.datasets):
+                if key not in keep:
+                    self.datasets.pop(key)
+
+    def save(self):
+        """
+        Persists the history, if a file name is set.
+        """
+        if not self.file_name:
+            return
+
+        directory = os.path.dirname(self.file_name)
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._lock:
+            state = {"datasets": dict(self.datasets)}
+            temp_file = f"{self.file_name}.tmp"
+
+            with open(temp_file, "w", encoding="utf-8") as file:
+                json.dump(state, file)
+
+            os.replace(temp_file, self.file_name)
@@ -0,0 +1,138 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from src.info_rows import encode_info_rows, decode_info_rows
+
+INFO_KEYS_PREFIX = "info_"
+
+
+def hash_file(file_name):
+    """
+    Returns the sha256 hash of a file content.
+    """
+    with open(file_name, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+class DaxInfoCache:
+    """
+    Persistent local store of dax info results, keyed by workspace id and dataset id.
+    Each entry records the change signal of the dataset when it was extracted, so unchanged datasets
+    can reuse their cached info_* rows. The whole cache is invalidated when the DAX query file changes.
+    Safe to use from concurrent workers.
+    """
+
+    def __init__(self, cache_dir, dax_query_file, full_refresh=False, max_age_days=None):
+        self.cache_dir = cache_dir
+        self.state_file = os.path.join(cache_dir, "state.json")
+        self.full_refresh = full_refresh
+        self.max_age = timedelta(days=max_age_days) if max_age_days else None
+        self.queries_hash = hash_file(dax_query_file)
+        self._lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self.datasets = {}
+
+        if os.path.exists(self.state_file):
+            with open(self.state_file, "r", encoding="utf-8") as file:
+                state = json.load(file)
+
+            if state.get("queries_hash") == self.queries_hash:
+                self.datasets = state.get("datasets", {})
+            else:
+                logging.info("DAX info queries changed since the last run. Invalidating the dax info cache...")
+                self.clear()
+
+    @staticmethod
+    def _key(workspace_id, dataset_id):
+        return f"{workspace_id}_{dataset_id}"
+
+    def _entry_file(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, workspace_id, dataset_id, signal):
+        """
+        Returns the cached info_* rows of a dataset if its change signal did not change, otherwise None.
+        """
+        if self.full_refresh or signal is None:
+            return None
+
+        key = self._key(workspace_id, dataset_id)
+        entry = self.datasets.get(key)
+
+        if entry is None or entry.get("signal") != signal:
+            return None
+
+        if self.max_age and datetime.now() - datetime.fromisoformat(entry.get("cached_at")) > self.max_age:
+            return None
+
+        try:
+            with open(self._entry_file(key), "r", encoding="utf-8") as file:
+                return decode_info_rows(json.load(file))
+
+        except (OSError, ValueError):
+            return None
+
+    def put(self, record, signal):
+        """
+        Stores the info_* rows of a dataset record with its change signal.
+        """
+        if signal is None:
+            return
+
+        key = self._key(record.get("workspace_id"), record.get("dataset_id"))
+        info = {k: v for k, v in record.items() if k.startswith(INFO_KEYS_PREFIX)}
+
+        with open(self._entry_file(key), "w", encoding="utf-8") as file:
+            json.dump(info, file, default=encode_info_rows)
+
+        with self._lock:
+            self.datasets[key] = {
+                "signal": signal,
+                "cached_at": datetime.now().isoformat()
+            }
+
+    def prune(self, datasets_keys):
+        """
+        Removes cached datasets which are not in the given list of (workspace_id, dataset_id).
+        """
+        keep = {self._key(workspace_id, dataset_id) for workspace_id, dataset_id in datasets_keys}
+
+        with self._lock:
+            for key in list(self.datasets):
+                if key not in keep:
+                    self.datasets.pop(key)
+
+                    if os.path.exists(self._entry_file(key)):
+                        os.remove(self._entry_file(key))
+
+    def clear(self):
+        """
+        Removes all cached datasets.
+        """
+        for file_name in os.listdir(self.cache_dir):
+            if file_name.endswith(".json"):
+                os.remove(os.path.join(self.cache_dir, file_name))
+
+        self.datasets = {}
+
+    def save(self):
+        """
+        Persists the cache state.
+        """
+        with self._lock:
+            state = {
+                "queries_hash": self.queries_hash,
+                "datasets": dict(self.datasets)
+            }
+
+            temp_file = f"{self.state_file}.tmp"
+
+            with open(temp_file, "w", encoding="utf-8") as file:
+                json.dump(state, file)
+
+            os.replace(temp_file, self.state_file)
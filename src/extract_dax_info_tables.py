@@ -1,9 +1,17 @@
 import os
-import json
+import sys
+import time
+import signal
+import shutil
+import tempfile
 import subprocess
 import logging
 from urllib.parse import quote
 from datetime import datetime
+from src.concurrency import map_concurrently
+from src.metrics import metrics, traced
+from src.info_rows import read_dscmd_info_tables
+from src.dax_durations import DaxDurationHistory
 
 logging.basicConfig(
     level=logging.INFO,
@@ -12,79 +20,285 @@ logging.basicConfig(
     datefmt='%Y-%m-%d %H:%M'
 )
 
-def dscmd_export_to_json(tenant_id, client_id, client_secret, server, dataset_name, dax_query_file, file_name):
+# Keys of the dax info results, in the same order as the EVALUATE statements in dax_info_queries.dax
+INFO_TABLES_KEYS = ["info_relationships", "info_tables", "info_columns", "info_measures", "info_calculation_groups"]
+
+# Keys of the raw INFO rowsets, in the same order as the EVALUATE statements in dax_info_raw_queries.dax
+RAW_INFO_TABLES_KEYS = [
+    "info_raw_relationships", "info_raw_tables", "info_raw_partitions", "info_raw_columns", "info_raw_measures",
+    "info_raw_calculation_groups", "info_raw_calculation_items"
+]
+
+# DAX query file and result keys by query mode. VIEWS resolves names in DAX, RAW pulls the INFO rowsets and
+# leaves the resolution to transformer.normalize_raw_datasets_info
+DAX_QUERY_MODES = {
+    "VIEWS": ("dax_info_queries.dax", INFO_TABLES_KEYS),
+    "RAW": ("dax_info_raw_queries.dax", RAW_INFO_TABLES_KEYS)
+}
+
+
+def kill_process_tree(process):
+    """
+    Kills a process started by run_process and the processes it started.
+    """
+    if sys.platform == "win32":
+        subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)], capture_output=True)
+    else:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+
+        except ProcessLookupError:
+            pass
+
+    try:
+        process.kill()
+
+    except OSError:
+        pass
+
+
+def run_process(prompt, timeout=None):
+    """
+    Runs a command and returns its stdout and stderr, as subprocess.run with check=True. The command runs in its own
+    process group, so when it does not complete within timeout seconds, it is killed with the processes it started,
+    and subprocess.TimeoutExpired is raised.
+    """
+    if sys.platform == "win32":
+        options = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    else:
+        options = {"start_new_session": True}
+
+    process = subprocess.Popen(prompt, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, **options)
+
+    try:
+        stdout, stderr = process.communicate(timeout=timeout)
+
+    except subprocess.TimeoutExpired:
+        kill_process_tree(process)
+        stdout, stderr = process.communicate()
+        raise subprocess.TimeoutExpired(prompt, timeout, stdout, stderr)
+
+    except BaseException:
+        kill_process_tree(process)
+        process.wait()
+        raise
+
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, prompt, stdout, stderr)
+
+    return stdout, stderr
+
+
+@traced()
+def dscmd_export_to_json(tenant_id, client_id, client_secret, server, dataset_name, dax_query_file, file_name, dscmd_exe=None, timeout=None):
     """
     Outputs a json file based on the results of a DAX query with Dax Studio Portable.
+    Dax Studio is killed if it does not complete within timeout seconds, and subprocess.TimeoutExpired is raised.
     """
-    dscmd_exe = os.path.join(os.getcwd(), "tools", "dax_studio", "dscmd.exe")
+    if dscmd_exe is None:
+        dscmd_exe = os.path.join(os.getcwd(), "tools", "dax_studio", "dscmd.exe")
 
     prompt = [
         dscmd_exe,
         "csv", file_name,
         "-s", server,
         "-d", dataset_name,
-        "-u", f"app:{client_id}@{tenant_id}", 
+        "-u", f"app:{client_id}@{tenant_id}",
         "-p", client_secret,
         "-f", dax_query_file,
         "-t", "JSON"
     ]
 
-    subprocess.run(prompt, capture_output=True, text=True, check=True)
-    
+    run_process(prompt, timeout)
+
+
+def create_dax_info_temp_dir():
+    """
+    Creates a temporary directory for the Dax Studio outputs of a run in the tools directory, and returns its path.
+    """
+    tools_dir = os.path.join(os.getcwd(), "tools")
+    os.makedirs(tools_dir, exist_ok=True)
+    return tempfile.mkdtemp(prefix="dax_info_", dir=tools_dir)
+
 
-def extract_datasets_dax_info(tenant_id, client_id, client_secret, workspaces_datasets_list):
+def get_dax_query_file(query_mode="VIEWS"):
+    """
+    Returns the path of the DAX query file of a query mode.
     """
-    Query data from dax info functions from workspaces and datasets with Dax Studio Portable.
+    return os.path.join(os.getcwd(), "src", DAX_QUERY_MODES[query_mode][0])
+
+
+@traced()
+def extract_dataset_dax_info(tenant_id, client_id, client_secret, dataset, dax_query_file, temp_dir, timestamp, dscmd_exe=None,
+                             info_keys=INFO_TABLES_KEYS, timeout=None):
+    """
+    Query data from dax info functions for a single dataset with Dax Studio Portable.
+    Each call writes to its own temp file, so datasets can be exported concurrently. The output is streamed into
+    columnar InfoRows, one row at a time.
+    Returns None if the export fails, and raises subprocess.TimeoutExpired if it does not complete within timeout seconds.
+    """
+    workspace_name = dataset.get("workspace_name")
+    dataset_name = dataset.get("dataset_name")
+
+    server = f"powerbi://api.powerbi.com/v1.0/myorg/{quote(workspace_name)}"
+
+    file_descriptor, temp_file = tempfile.mkstemp(prefix=f"{dataset.get('dataset_id')}_", suffix=".json", dir=temp_dir)
+    os.close(file_descriptor)
+
+    try:
+        dscmd_export_to_json(tenant_id, client_id, client_secret, server, dataset_name, dax_query_file, temp_file, dscmd_exe, timeout)
+        metrics.increment("dscmd_output_bytes_total", os.path.getsize(temp_file))
+
+        info_tables = read_dscmd_info_tables(temp_file, info_keys)
+
+        response_data = {
+            "workspace_id": dataset.get("workspace_id"),
+            "workspace_name": workspace_name,
+            "dataset_id" : dataset.get("dataset_id"),
+            "dataset_name" : dataset_name,
+            "extract_timestamp" : timestamp
+        }
+
+        response_data.update(info_tables)
+
+        logging.info(f"Sucessfully exported data from {server} - {dataset_name}")
+        return response_data
+
+    except subprocess.TimeoutExpired:
+        logging.warning(f"Export from {server} - {dataset_name} timed out after {timeout:g}s.")
+        raise
+
+    except subprocess.CalledProcessError as e:
+        logging.error(f"Export error from {server} - {dataset_name}: {e.stdout} {e.stderr}.")
+
+    except (OSError, ValueError, KeyError, IndexError, TypeError) as e:
+        logging.error(f"Export error from {server} - {dataset_name}: invalid Dax Studio output. {e}")
+
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+    return None
+
+
+@traced()
+def extract_datasets_dax_info(tenant_id, client_id, client_secret, workspaces_datasets_list, max_workers=1, dscmd_exe=None, cache=None,
+                              query_mode="VIEWS", on_result=None, history=None, timeout=None, max_retries=0, temp_dir=None):
+    """
+    Query data from dax info functions from workspaces and datasets with Dax Studio Portable. query_mode selects the
+    DAX query file, see DAX_QUERY_MODES.
+    Up to max_workers Dax Studio processes run concurrently.
+    If a DaxInfoCache is given, datasets with an unchanged "change_signal" reuse their cached results.
+    If on_result is given, it is called with each extracted dataset record as soon as it completes.
+    The durations of the exports are recorded in the DaxDurationHistory history, if given, and datasets are exported
+    longest first according to it. With a timeout in seconds, each Dax Studio export is killed after its timeout
+    (see DaxDurationHistory.get_timeout), and the timed out datasets are queued and retried once the other exports are
+    done, up to max_retries times with longer timeouts.
+    The Dax Studio outputs are written to temp_dir if given (e.g. shared by the calls of a pipeline), otherwise to a
+    temporary directory of the call. The cache is not saved, the caller saves it once all the exports are done.
     """
     timestamp = datetime.now()
-    temp_file = os.path.join(os.getcwd(), "tools", "temp.json")
-    dax_query_file = os.path.join(os.getcwd(), "src", "dax_info_queries.dax")
-
-    data = []
-
-    for i in workspaces_datasets_list:
-        workspace_id = i.get("workspace_id")
-        workspace_name = i.get("workspace_name")
-        dataset_id = i.get("dataset_id")
-        dataset_name = i.get("dataset_name")
-        
-        server = f"powerbi://api.powerbi.com/v1.0/myorg/{quote(workspace_name)}"
-
-        try: 
-            dscmd_export_to_json(tenant_id, client_id, client_secret, server, dataset_name, dax_query_file, temp_file)
-
-            with open(temp_file, "r", encoding="utf-8") as file:
-                dscmd_data = json.load(file)
-        
-            response = dscmd_data.get("results")[0]["tables"]
-
-            response_data = {
-                "workspace_id": workspace_id,
-                "workspace_name": workspace_name,
-                "dataset_id" : dataset_id,
-                "dataset_name" : dataset_name,
-                "extract_timestamp" : timestamp
-            }
-
-            for i, v in enumerate(response):
-                
-                if i == 0:
-                    response_data["info_relationships"] = v.get("rows")
-                if i == 1:
-                    response_data["info_tables"] = v.get("rows")
-                if i == 2:
-                    response_data["info_columns"] = v.get("rows")
-                if i == 3:
-                    response_data["info_measures"] = v.get("rows")
-                if i == 4:
-                    response_data["info_calculation_groups"] = v.get("rows")
-
-            data.append(response_data)
-                    
-            logging.info(f"Sucessfully exported data from {server} - {dataset_name}")
-        
-        except subprocess.CalledProcessError as e:
-            logging.error(f"Export error: {e.stdout} {e.stderr}.")
-
-    os.remove(temp_file)
-    return data
\ No newline at end of file
+    dax_query_file = get_dax_query_file(query_mode)
+    info_keys = DAX_QUERY_MODES[query_mode][1]
+
+    results = [None] * len(workspaces_datasets_list)
+    pending = []
+
+    for index, dataset in enumerate(workspaces_datasets_list):
+        cached_info = cache.get(dataset.get("workspace_id"), dataset.get("dataset_id"), dataset.get("change_signal")) if cache else None
+
+        if cached_info is None:
+            pending.append(index)
+            continue
+
+        response_data = {
+            "workspace_id": dataset.get("workspace_id"),
+            "workspace_name": dataset.get("workspace_name"),
+            "dataset_id" : dataset.get("dataset_id"),
+            "dataset_name" : dataset.get("dataset_name"),
+            "extract_timestamp" : timestamp
+        }
+        response_data.update(cached_info)
+        results[index] = response_data
+
+        metrics.increment("dax_info_cache_hits_total")
+        logging.info(f"Reusing cached data for {dataset.get('workspace_name')} - {dataset.get('dataset_name')}")
+
+    if history is None:
+        history = DaxDurationHistory()
+
+    pending = history.order_longest_first(pending, lambda index: workspaces_datasets_list[index])
+
+    def complete(index, result):
+        if result is not None:
+            if cache:
+                cache.put(result, workspaces_datasets_list[index].get("change_signal"))
+
+            if on_result:
+                on_result(result)
+
+        return result
+
+    def export(index, attempt, extract_dataset):
+        dataset = workspaces_datasets_list[index]
+        status = "ok"
+        start = time.perf_counter()
+
+        try:
+            result = extract_dataset(dataset, history.get_timeout(dataset, timeout, attempt))
+
+        except subprocess.TimeoutExpired:
+            result, status = None, "timeout"
+
+        if result is None and status == "ok":
+            status = "failed"
+
+        history.record(dataset, time.perf_counter() - start, status)
+        return complete(index, result), status
+
+    def export_pending(extract_dataset):
+        """
+        Exports the pending datasets, then the ones which timed out, up to max_retries times.
+        """
+        queue = pending
+
+        for attempt in range(max_retries + 1):
+            if attempt:
+                metrics.increment("dax_info_retries_total", len(queue))
+                logging.warning(f"Retrying {len(queue)} timed out semantic models ({attempt}/{max_retries})...")
+
+            outcomes = map_concurrently(lambda index: export(index, attempt, extract_dataset), queue, max_workers)
+            retry = []
+
+            for index, (result, status) in zip(queue, outcomes):
+                results[index] = result
+
+                if status == "timeout":
+                    retry.append(index)
+
+            queue = retry
+
+            if not queue:
+                break
+
+    run_temp_dir = temp_dir or create_dax_info_temp_dir()
+
+    try:
+        export_pending(
+            lambda dataset, attempt_timeout: extract_dataset_dax_info(
+                tenant_id, client_id, client_secret, dataset, dax_query_file, run_temp_dir, timestamp, dscmd_exe, info_keys, attempt_timeout
+            )
+        )
+
+    finally:
+        if temp_dir is None:
+            shutil.rmtree(run_temp_dir, ignore_errors=True)
+
+    data = [i for i in results if i is not None]
+
+    failed = [i.get("dataset_name") for i, result in zip(workspaces_datasets_list, results) if result is None]
+
+    if failed:
+        logging.warning(f"Failed to export {len(failed)} of {len(results)} semantic models: {', '.join(failed)}")
+
+    return data
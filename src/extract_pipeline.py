@@ -0,0 +1,164 @@
+import shutil
+from src.pipeline import Pipeline
+from src.metrics import traced
+from src.checkpoint import extract_units, workspace_unit, report_unit, dataset_unit
+from src.extract_dax_info_tables import extract_datasets_dax_info, create_dax_info_temp_dir
+from src.transformer import resolve_workspaces_datasets_list
+from src.records import RecordTable
+from src.extract_powerbi_api import (
+    SCAN_BATCH_SIZE,
+    WORKSPACES_COLUMNS,
+    DATASETS_COLUMNS,
+    REPORTS_COLUMNS,
+    REPORTS_PAGES_COLUMNS,
+    extract_workspaces_data,
+    extract_datasets_data,
+    extract_reports_data,
+    extract_reports_pages,
+    extract_scanner_data,
+    extract_datasets_change_signals
+)
+
+
+@traced()
+def extract_pipelined(access_token, workspaces_ids, tenant_id, client_id, client_secret, backend="REST", rest_workers=1, dax_workers=1,
+                      http_client=None, dscmd_exe=None, dax_info_cache=None, dax_query_mode="VIEWS", checkpoint=None, timestamp=None, dax_history=None, dax_timeout=None, dax_max_retries=0):
+    """
+    Extracts Power BI Rest API and dax info data with a pipeline of tasks instead of stage by stage.
+    Reports pages are fetched as soon as the reports of a workspace are known, and the dax info of a dataset is
+    extracted as soon as its workspace and datasets are known, while other workspaces are still being fetched.
+    REST calls run in a pool of rest_workers threads and dax info exports in a pool of dax_workers threads.
+    If a CheckpointStore is given, each task stores its output as soon as it completes, and tasks whose output is
+    already stored are not extracted again. timestamp is the extract timestamp of the Power BI Rest API records.
+    The datasets of each workspace are scheduled longest first according to the DaxDurationHistory dax_history, and
+    dax_timeout and dax_max_retries are the timeout and retries of each export, see extract_datasets_dax_info.
+    The change signal of each dataset is fetched by its own REST task before its dax info task, and the dax info cache
+    is saved once all the tasks are done.
+    Returns workspaces_data, reports_data, reports_pages_data and datasets_data as RecordTables, and datasets_info_data,
+    in the same order as the staged extraction.
+    """
+    pipeline = Pipeline({"rest": rest_workers, "dax": dax_workers})
+
+    # Dax Studio outputs of all the dax info tasks
+    temp_dir = create_dax_info_temp_dir()
+
+    def schedule_reports_pages(reports_data):
+        for report in reports_data:
+            if report.get("report_type") == "PowerBIReport":
+                pipeline.add_task(
+                    f"pages:{report.get('workspace_id')}:{report.get('report_id')}",
+                    lambda report=report: extract_units(
+                        checkpoint, "reports_pages", [report], lambda reports: extract_reports_pages(access_token, reports, 1, http_client, timestamp),
+                        report_unit, report_unit
+                    ),
+                    pool="rest"
+                )
+
+    def extract_dataset_dax_info(dataset, *change_signals):
+        for signals in change_signals:
+            dataset["change_signal"] = signals.get((dataset.get("workspace_id"), dataset.get("dataset_id")))
+
+        return extract_units(
+            checkpoint, "datasets_info", [dataset],
+            lambda datasets: extract_datasets_dax_info(
+                tenant_id, client_id, client_secret, datasets, 1, dscmd_exe, dax_info_cache, dax_query_mode,
+                history=dax_history, timeout=dax_timeout, max_retries=dax_max_retries, temp_dir=temp_dir
+            ),
+            dataset_unit, dataset_unit, persist_empty=False
+        )
+
+    def schedule_datasets_dax_info(workspaces_data, datasets_data):
+        if not datasets_data:
+            return
+
+        workspaces_datasets_list = resolve_workspaces_datasets_list(datasets_data, workspaces_data)
+        datasets_by_unit = {dataset_unit(i): i for i in datasets_data}
+
+        if dax_history:
+            workspaces_datasets_list = dax_history.order_longest_first(workspaces_datasets_list)
+
+        for dataset in workspaces_datasets_list:
+            unit = dataset_unit(dataset)
+            dependencies = []
+
+            # Change signals are only needed for datasets which are not checkpointed yet
+            if dax_info_cache and (checkpoint is None or checkpoint.get("datasets_info", unit) is None):
+                pipeline.add_task(
+                    f"signal:{unit}",
+                    lambda unit=unit: extract_datasets_change_signals(access_token, [datasets_by_unit[unit]], 1, http_client),
+                    pool="rest"
+                )
+                dependencies.append(f"signal:{unit}")
+
+            pipeline.add_task(f"dax:{unit}", lambda *signals, dataset=dataset: extract_dataset_dax_info(dataset, *signals), dependencies, "dax")
+
+    if backend == "SCANNER":
+        batches = [workspaces_ids[i:i + SCAN_BATCH_SIZE] for i in range(0, len(workspaces_ids), SCAN_BATCH_SIZE)]
+
+        for index, batch in enumerate(batches):
+            pipeline.add_task(
+                f"scan:{index}",
+                lambda batch=batch: extract_units(
+                    checkpoint, ("workspaces", "datasets", "reports"), batch, lambda ids: extract_scanner_data(access_token, ids, 1, http_client, timestamp=timestamp),
+                    str, workspace_unit
+                ),
+                pool="rest"
+            )
+            pipeline.add_task(f"schedule_pages:{index}", lambda result: schedule_reports_pages(result[2]), [f"scan:{index}"], "rest")
+            pipeline.add_task(f"schedule_dax:{index}", lambda result: schedule_datasets_dax_info(result[0], result[1]), [f"scan:{index}"], "rest")
+
+    else:
+        for workspace_id in workspaces_ids:
+            for stage, task, extract in [
+                ("workspaces", "workspace", extract_workspaces_data),
+                ("reports", "reports", extract_reports_data),
+                ("datasets", "datasets", extract_datasets_data)
+            ]:
+                pipeline.add_task(
+                    f"{task}:{workspace_id}",
+                    lambda w=workspace_id, stage=stage, extract=extract: extract_units(
+                        checkpoint, stage, [w], lambda ids: extract(access_token, ids, 1, http_client, timestamp), str, workspace_unit
+                    ),
+                    pool="rest"
+                )
+
+            pipeline.add_task(f"schedule_pages:{workspace_id}", schedule_reports_pages, [f"reports:{workspace_id}"], "rest")
+            pipeline.add_task(f"schedule_dax:{workspace_id}", schedule_datasets_dax_info, [f"workspace:{workspace_id}", f"datasets:{workspace_id}"], "rest")
+
+    try:
+        results = pipeline.run()
+
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    if dax_info_cache:
+        dax_info_cache.save()
+
+    workspaces_data = RecordTable(WORKSPACES_COLUMNS)
+    datasets_data = RecordTable(DATASETS_COLUMNS)
+    reports_data = RecordTable(REPORTS_COLUMNS)
+
+    if backend == "SCANNER":
+        for index in range(len(batches)):
+            workspaces_batch, datasets_batch, reports_batch = results[f"scan:{index}"]
+            workspaces_data.extend(workspaces_batch)
+            datasets_data.extend(datasets_batch)
+            reports_data.extend(reports_batch)
+
+    else:
+        for workspace_id in workspaces_ids:
+            workspaces_data.extend(results[f"workspace:{workspace_id}"])
+            datasets_data.extend(results[f"datasets:{workspace_id}"])
+            reports_data.extend(results[f"reports:{workspace_id}"])
+
+    reports_pages_data = RecordTable(REPORTS_PAGES_COLUMNS)
+
+    for i in reports_data:
+        reports_pages_data.extend(results.get(f"pages:{i.get('workspace_id')}:{i.get('report_id')}", []))
+
+    datasets_info_data = []
+
+    for i in datasets_data:
+        datasets_info_data.extend(results.get(f"dax:{i.get('workspace_id')}:{i.get('dataset_id')}", []))
+
+    return workspaces_data, reports_data, reports_pages_data, datasets_data, datasets_info_data
@@ -1,42 +1,50 @@
+import time
+import logging
 import requests
 from datetime import datetime
+from src.auth import TokenProvider, POWERBI_SCOPE, resolve_access_token
+from src.concurrency import map_concurrently
+from src.metrics import traced
+from src.records import RecordTable
 
-def get_powerbi_access_token(tenant_id, client_id, client_secret):
-    """
-    Generate Bearer token for Power BI Rest API with service principal.
-    """
-    url = f"https://login.microsoftonline.com/{tenant_id}/oauth2/v2.0/token"
+POWERBI_API_URL = "https://api.powerbi.com/v1.0/myorg"
+POWERBI_APP_URL = "https://app.powerbi.com"
 
-    payload = {
-        "grant_type": "client_credentials",
-        "client_id": client_id,
-        "client_secret": client_secret,
-        "scope": "https://analysis.windows.net/powerbi/api/.default"
-    }
+# Status codes of the refreshes endpoint for semantic models without refresh history (e.g. DirectQuery or Live Connection)
+NO_REFRESH_HISTORY_STATUS_CODES = {400, 404, 415}
 
-    response = requests.post(url=url, data=payload)
-        
-    if response.status_code == 200:
-        response_json = response.json()
-        data = response_json["access_token"]
-        return data
+# Admin Scanner API limits
+SCAN_BATCH_SIZE = 100
+SCAN_MAX_CONCURRENT = 16
 
-    else:
-        raise KeyError(f"Error to get Power BI access token: {response.status_code} - {response}")
+# Columns of the extracted records of each entity
+WORKSPACES_COLUMNS = ["workspace_id", "workspace_name", "type", "is_dedicated_capacity", "capacity_id", "dataset_storage_format", "extract_timestamp"]
+DATASETS_COLUMNS = ["workspace_id", "dataset_id", "dataset_name", "configured_by", "created_at", "web_url", "extract_timestamp"]
+REPORTS_COLUMNS = ["workspace_id", "report_id", "report_name", "report_type", "dataset_id", "web_url", "extract_timestamp"]
+REPORTS_PAGES_COLUMNS = ["workspace_id", "report_id", "page_id", "page_name", "order", "extract_timestamp"]
+
+def get_powerbi_access_token(tenant_id, client_id, client_secret, http_client=None):
+    """
+    Generate Bearer token for Power BI Rest API with service principal.
+    """
+    return TokenProvider(tenant_id, client_id, client_secret, POWERBI_SCOPE, http_client).get_token()
     
     
-def extract_powerbi_data(access_token, endpoint):
+@traced()
+def extract_powerbi_data(access_token, endpoint, http_client=None):
     """
     Extract data from Power BI Rest API.
+    The access token can be a token string or a TokenProvider, which is asked for a token on every request.
     """
-    url = f"https://api.powerbi.com/v1.0/myorg/groups/{endpoint}"
+    url = f"{POWERBI_API_URL}/groups/{endpoint}"
     
     headers = {
-        "Authorization": f"Bearer {access_token}",
+        "Authorization": f"Bearer {resolve_access_token(access_token)}",
         "Content-Type": "application/json"  
     }
 
-    response = requests.get(url=url, headers=headers)
+    http = http_client or requests
+    response = http.get(url=url, headers=headers)
 
     if response.status_code == 200:
         data = response.json()
@@ -46,12 +54,13 @@ def extract_powerbi_data(access_token, endpoint):
         raise KeyError(f"Failed request for {endpoint}. Status code: {response.status_code}. Error message: {response.text}")
     
 
-def extract_workspaces_ids(access_token):
+@traced()
+def extract_workspaces_ids(access_token, http_client=None):
     """
     Extracts workspaces ids which the user has access.
     """
     endpoint = ""
-    response = extract_powerbi_data(access_token, endpoint).get("value")
+    response = extract_powerbi_data(access_token, endpoint, http_client).get("value")
 
     all_data = []
 
@@ -62,24 +71,25 @@ def extract_workspaces_ids(access_token):
     return all_data
 
 
-def extract_workspaces_data(access_token, workspaces_ids):
+@traced()
+def extract_workspaces_data(access_token, workspaces_ids, max_workers=1, http_client=None, timestamp=None):
     """
     Extracts workspaces data for a given list of workspaces ids.
+    Up to max_workers requests are sent concurrently.
+    Returns a RecordTable, with timestamp (the run timestamp, or now) as the extract_timestamp of all records.
     """
-    timestamp = datetime.now()
-    data = []
+    data = RecordTable(WORKSPACES_COLUMNS, {"extract_timestamp": timestamp or datetime.now()})
 
-    for workspace_id in workspaces_ids:
-        endpoint = workspace_id
-        response = extract_powerbi_data(access_token, endpoint)
+    responses = map_concurrently(lambda endpoint: extract_powerbi_data(access_token, endpoint, http_client), workspaces_ids, max_workers)
+
+    for workspace_id, response in zip(workspaces_ids, responses):
         response_data = {
             "workspace_id" : workspace_id,
             "workspace_name" : response.get("name"),
             "type" : response.get("type"),
             "is_dedicated_capacity": response.get("isOnDedicatedCapacity"),
             "capacity_id" : response.get("capacityId"),
-            "dataset_storage_format" : response.get("defaultDatasetStorageFormat"),
-            "extract_timestamp" : timestamp
+            "dataset_storage_format" : response.get("defaultDatasetStorageFormat")
         }
 
         data.append(response_data)
@@ -87,17 +97,19 @@ def extract_workspaces_data(access_token, workspaces_ids):
     return data
 
 
-def extract_datasets_data(access_token, workspaces_ids):
+@traced()
+def extract_datasets_data(access_token, workspaces_ids, max_workers=1, http_client=None, timestamp=None):
     """
     Extracts datasets data for a given list of workspaces ids.
+    Up to max_workers requests are sent concurrently.
+    Returns a RecordTable, with timestamp (the run timestamp, or now) as the extract_timestamp of all records.
     """
-    timestamp = datetime.now()
-    data = []
+    data = RecordTable(DATASETS_COLUMNS, {"extract_timestamp": timestamp or datetime.now()})
 
-    for workspace_id in workspaces_ids:
-        endpoint = f"{workspace_id}/datasets"
-        response = extract_powerbi_data(access_token, endpoint).get("value")
+    endpoints = [f"{workspace_id}/datasets" for workspace_id in workspaces_ids]
+    responses = map_concurrently(lambda endpoint: extract_powerbi_data(access_token, endpoint, http_client).get("value"), endpoints, max_workers)
 
+    for workspace_id, response in zip(workspaces_ids, responses):
         for i in response:
             response_data = {
                 "workspace_id" : workspace_id,
@@ -105,8 +117,7 @@ def extract_datasets_data(access_token, workspaces_ids):
                 "dataset_name" : i.get("name"),
                 "configured_by": i.get("configuredBy"),
                 "created_at" : i.get("createdDate"),
-                "web_url" : i.get("webUrl"),
-                "extract_timestamp" : timestamp
+                "web_url" : i.get("webUrl")
             }
 
             data.append(response_data)
@@ -114,17 +125,19 @@ def extract_datasets_data(access_token, workspaces_ids):
     return data
 
 
-def extract_reports_data(access_token, workspaces_ids):
+@traced()
+def extract_reports_data(access_token, workspaces_ids, max_workers=1, http_client=None, timestamp=None):
     """
     Extracts reports data for a given list of workspaces ids.
+    Up to max_workers requests are sent concurrently.
+    Returns a RecordTable, with timestamp (the run timestamp, or now) as the extract_timestamp of all records.
     """
-    timestamp = datetime.now()
-    data = []
+    data = RecordTable(REPORTS_COLUMNS, {"extract_timestamp": timestamp or datetime.now()})
 
-    for workspace_id in workspaces_ids:
-        endpoint = f"{workspace_id}/reports"
-        response = extract_powerbi_data(access_token, endpoint).get("value")
+    endpoints = [f"{workspace_id}/reports" for workspace_id in workspaces_ids]
+    responses = map_concurrently(lambda endpoint: extract_powerbi_data(access_token, endpoint, http_client).get("value"), endpoints, max_workers)
 
+    for workspace_id, response in zip(workspaces_ids, responses):
         for i in response:
             response_data = {
                 "workspace_id" : workspace_id,
@@ -132,8 +145,7 @@ def extract_reports_data(access_token, workspaces_ids):
                 "report_name" : i.get("name"),
                 "report_type" : i.get("reportType"),
                 "dataset_id": i.get("datasetId"),
-                "web_url" : i.get("webUrl"),
-                "extract_timestamp" : timestamp
+                "web_url" : i.get("webUrl")
             }
 
             data.append(response_data)
@@ -141,34 +153,215 @@ def extract_reports_data(access_token, workspaces_ids):
     return data
 
 
-def extract_reports_pages(access_token, reports_data):
+@traced()
+def extract_reports_pages(access_token, reports_data, max_workers=1, http_client=None, timestamp=None):
     """
     Extracts reports pages data for a given list[dict] of reports data.
+    Up to max_workers requests are sent concurrently.
+    Returns a RecordTable, with timestamp (the run timestamp, or now) as the extract_timestamp of all records.
     """
-    timestamp = datetime.now()
-    data = []
+    data = RecordTable(REPORTS_PAGES_COLUMNS, {"extract_timestamp": timestamp or datetime.now()})
 
-    for i in reports_data:
-        workspace_id = i.get("workspace_id")
-        report_id = i.get("report_id")
-        report_type = i.get("report_type")
+    reports = [
+        (i.get("workspace_id"), i.get("report_id")) 
+        for i in reports_data 
+        if i.get("report_type") == "PowerBIReport"
+    ]
+    endpoints = [f"{workspace_id}/reports/{report_id}/pages" for workspace_id, report_id in reports]
+    responses = map_concurrently(lambda endpoint: extract_powerbi_data(access_token, endpoint, http_client).get("value"), endpoints, max_workers)
 
-        if report_type == "PowerBIReport":
+    for (workspace_id, report_id), response in zip(reports, responses):
+        for i in response:
+            response_data = {
+                "workspace_id" : workspace_id,
+                "report_id" : report_id,
+                "page_id" : i.get("name"),
+                "page_name" : i.get("displayName"),
+                "order" : i.get("order")
+            }
 
-            endpoint = f"{workspace_id}/reports/{report_id}/pages"
+            data.append(response_data)
 
-            response = extract_powerbi_data(access_token, endpoint).get("value")
+    return data
 
-            for i in response:
-                response_data = {
-                    "workspace_id" : workspace_id,
-                    "report_id" : report_id,
-                    "page_id" : i.get("name"),
-                    "page_name" : i.get("displayName"),
-                    "order" : i.get("order"),
-                    "extract_timestamp" : timestamp
-                }
 
-                data.append(response_data)
+@traced()
+def extract_datasets_change_signals(access_token, datasets_data, max_workers=1, http_client=None):
+    """
+    Extracts a change signal for each dataset from its created date and its latest refresh.
+    Returns a dict keyed by (workspace_id, dataset_id). The signal is None for datasets without refresh history
+    (e.g. DirectQuery or Live Connection), whose changes it would not reflect, and for datasets whose refresh history
+    could not be fetched, so they are not served from the dax info cache.
+    """
+    http = http_client or requests
+
+    def extract_latest_refresh(dataset):
+        endpoint = f"{dataset.get('workspace_id')}/datasets/{dataset.get('dataset_id')}/refreshes?$top=1"
+        headers = {"Authorization": f"Bearer {resolve_access_token(access_token)}"}
+
+        try:
+            response = http.get(url=f"{POWERBI_API_URL}/groups/{endpoint}", headers=headers)
+
+        except requests.RequestException as e:
+            logging.warning(f"Failed request for {endpoint}: {e}. Skipping the dax info cache of {dataset.get('dataset_name')}...")
+            return None
+
+        if response.status_code in NO_REFRESH_HISTORY_STATUS_CODES:
+            return None
+
+        if response.status_code != 200:
+            logging.warning(
+                f"Failed request for {endpoint}. Status code: {response.status_code}. "
+                f"Skipping the dax info cache of {dataset.get('dataset_name')}..."
+            )
+            return None
+
+        refreshes = response.json().get("value")
+
+        if not refreshes:
+            return None
+
+        return refreshes[0].get("endTime") or refreshes[0].get("startTime")
+
+    responses = map_concurrently(extract_latest_refresh, datasets_data, max_workers)
+
+    data = {}
+
+    for dataset, latest_refresh in zip(datasets_data, responses):
+        key = (dataset.get("workspace_id"), dataset.get("dataset_id"))
+        data[key] = f"{dataset.get('created_at')}|{latest_refresh}" if latest_refresh else None
 
     return data
+
+
+@traced()
+def request_powerbi_admin_api(access_token, method, endpoint, http_client=None, **kwargs):
+    """
+    Sends a request to the Power BI Admin Rest API.
+    """
+    url = f"{POWERBI_API_URL}/admin/{endpoint}"
+
+    headers = {
+        "Authorization": f"Bearer {resolve_access_token(access_token)}",
+        "Content-Type": "application/json"  
+    }
+
+    http = http_client or requests
+    response = http.request(method, url=url, headers=headers, **kwargs)
+
+    if response.status_code in [200, 202]:
+        data = response.json()
+        return data
+    
+    else:
+        raise KeyError(f"Failed request for admin/{endpoint}. Status code: {response.status_code}. Error message: {response.text}")
+
+
+def submit_workspaces_scan(access_token, workspaces_ids, http_client=None):
+    """
+    Submits a batch of up to 100 workspaces ids to the Admin Scanner API and returns the scan id.
+    """
+    if len(workspaces_ids) > SCAN_BATCH_SIZE:
+        raise ValueError(f"A workspaces scan accepts up to {SCAN_BATCH_SIZE} workspaces, got {len(workspaces_ids)}.")
+
+    endpoint = "workspaces/getInfo?lineage=False&datasourceDetails=False&datasetSchema=False&datasetExpressions=False"
+    response = request_powerbi_admin_api(access_token, "POST", endpoint, http_client, json={"workspaces": list(workspaces_ids)})
+    return response.get("id")
+
+
+def wait_for_workspaces_scan(access_token, scan_id, http_client=None, poll_interval=5, timeout=900):
+    """
+    Polls the status of a workspaces scan until it succeeds.
+    """
+    deadline = time.monotonic() + timeout
+
+    while True:
+        response = request_powerbi_admin_api(access_token, "GET", f"workspaces/scanStatus/{scan_id}", http_client)
+        status = response.get("status")
+
+        if status == "Succeeded":
+            return
+        
+        if status == "Failed":
+            raise KeyError(f"Workspaces scan {scan_id} failed: {response.get('error')}")
+        
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"Workspaces scan {scan_id} did not complete within {timeout} seconds. Last status: {status}")
+        
+        time.sleep(poll_interval)
+
+
+def get_workspaces_scan_result(access_token, scan_id, http_client=None):
+    """
+    Gets the list of scanned workspaces for a completed workspaces scan.
+    """
+    response = request_powerbi_admin_api(access_token, "GET", f"workspaces/scanResult/{scan_id}", http_client)
+    return response.get("workspaces", [])
+
+
+def scan_workspaces(access_token, workspaces_ids, http_client=None, poll_interval=5):
+    """
+    Submits, waits for and fetches a single workspaces scan.
+    """
+    scan_id = submit_workspaces_scan(access_token, workspaces_ids, http_client)
+    wait_for_workspaces_scan(access_token, scan_id, http_client, poll_interval)
+    return get_workspaces_scan_result(access_token, scan_id, http_client)
+
+
+@traced()
+def extract_scanner_data(access_token, workspaces_ids, max_workers=1, http_client=None, poll_interval=5, timestamp=None):
+    """
+    Extracts workspaces, datasets and reports data for a given list of workspaces ids with the Admin Scanner API.
+    Workspaces are scanned in batches of up to 100, with up to max_workers scans in flight.
+    Returns the same RecordTables as extract_workspaces_data, extract_datasets_data and extract_reports_data.
+    """
+    constants = {"extract_timestamp": timestamp or datetime.now()}
+    workspaces_data = RecordTable(WORKSPACES_COLUMNS, constants)
+    datasets_data = RecordTable(DATASETS_COLUMNS, constants)
+    reports_data = RecordTable(REPORTS_COLUMNS, constants)
+
+    batches = [workspaces_ids[i:i + SCAN_BATCH_SIZE] for i in range(0, len(workspaces_ids), SCAN_BATCH_SIZE)]
+    responses = map_concurrently(
+        lambda batch: scan_workspaces(access_token, batch, http_client, poll_interval), 
+        batches, 
+        min(max_workers, SCAN_MAX_CONCURRENT)
+    )
+
+    scanned_workspaces = {i.get("id"): i for response in responses for i in response}
+
+    for workspace_id in workspaces_ids:
+        workspace = scanned_workspaces.get(workspace_id)
+
+        if workspace is None:
+            continue
+
+        workspaces_data.append({
+            "workspace_id" : workspace_id,
+            "workspace_name" : workspace.get("name"),
+            "type" : workspace.get("type"),
+            "is_dedicated_capacity": workspace.get("isOnDedicatedCapacity"),
+            "capacity_id" : workspace.get("capacityId"),
+            "dataset_storage_format" : workspace.get("defaultDatasetStorageFormat")
+        })
+
+        for i in workspace.get("datasets", []):
+            datasets_data.append({
+                "workspace_id" : workspace_id,
+                "dataset_id" : i.get("id"),
+                "dataset_name" : i.get("name"),
+                "configured_by": i.get("configuredBy"),
+                "created_at" : i.get("createdDate"),
+                "web_url" : i.get("webUrl") or f"{POWERBI_APP_URL}/groups/{workspace_id}/datasets/{i.get('id')}"
+            })
+
+        for i in workspace.get("reports", []):
+            reports_data.append({
+                "workspace_id" : workspace_id,
+                "report_id" : i.get("id"),
+                "report_name" : i.get("name"),
+                "report_type" : i.get("reportType"),
+                "dataset_id": i.get("datasetId"),
+                "web_url" : i.get("webUrl") or f"{POWERBI_APP_URL}/groups/{workspace_id}/reports/{i.get('id')}"
+            })
+
+    return workspaces_data, datasets_data, reports_data
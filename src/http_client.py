@@ -0,0 +1,97 @@
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from src.metrics import metrics
+from src.rate_limiter import get_endpoint_family
+
+# Methods whose requests can be sent again after a server error without side effects
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+def get_body_size(body):
+    """
+    Returns the size in bytes of a prepared request body, or 0 if it is empty or streamed.
+    """
+    if isinstance(body, bytes):
+        return len(body)
+
+    if isinstance(body, str):
+        return len(body.encode("utf-8"))
+
+    return 0
+
+
+class HttpClient:
+    """
+    Shared HTTP client with pooled keep-alive connections for the Power BI Rest API,
+    Microsoft Entra and Microsoft Graph API calls. If a RateController is given, every request is paced
+    and retried by it.
+    """
+
+    def __init__(self, pool_size=10, headers=None, timeout=None, rate_controller=None):
+        self.timeout = timeout
+        self.rate_controller = rate_controller
+        self.session = requests.Session()
+
+        if headers:
+            self.session.headers.update(headers)
+
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method, url, idempotent=None, max_retries=None, **kwargs):
+        """
+        Sends a request through the pooled session. Requests are idempotent by their method unless idempotent is given,
+        e.g. for a POST which only reads data. max_retries overrides the retries of the rate controller, e.g. 0 for
+        requests which the caller retries itself.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+
+        if self.rate_controller is None:
+            return self._send(method, url, **kwargs)
+
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        
+        return self.rate_controller.send(url, lambda: self._send(method, url, **kwargs), idempotent, max_retries)
+
+    def _send(self, method, url, **kwargs):
+        """
+        Sends a single request attempt, recording its status, latency and size when metrics are enabled.
+        """
+        if not metrics.enabled:
+            return self.session.request(method, url, **kwargs)
+
+        family = get_endpoint_family(url)
+        start = time.perf_counter()
+
+        try:
+            response = self.session.request(method, url, **kwargs)
+
+        except requests.RequestException as e:
+            metrics.record_http_request(family, method, type(e).__name__, time.perf_counter() - start)
+            raise
+
+        metrics.record_http_request(
+            family, method, response.status_code, time.perf_counter() - start, get_body_size(response.request.body), len(response.content)
+        )
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
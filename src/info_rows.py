@@ -0,0 +1,324 @@
+import json
+from itertools import chain
+import pandas as pd
+
+# Characters read from the Dax Studio output file at a time
+READ_CHUNK_SIZE = 1024 * 1024
+
+# Rows decoded before they are moved to the columns, see InfoRows.extend
+READ_BATCH_ROWS = 4096
+
+JSON_WHITESPACE = " \t\r\n"
+
+
+class InfoRows:
+    """
+    Columnar rows of a dax info result table: one list of values per column instead of one dict per row.
+    Rows missing a column get None for it.
+    """
+
+    __slots__ = ("columns", "length")
+
+    def __init__(self, columns=None, length=0):
+        self.columns = columns or {}
+        self.length = length
+
+    @classmethod
+    def from_rows(cls, rows):
+        info_rows = cls()
+        info_rows.extend(list(rows))
+        return info_rows
+
+    @classmethod
+    def from_json(cls, value):
+        return cls(value["columns"], value["length"])
+
+    def to_json(self):
+        return {"columns": self.columns, "length": self.length}
+
+    def append(self, row):
+        columns = self.columns
+        length = self.length
+
+        for key, value in row.items():
+            column = columns.get(key)
+
+            if column is None:
+                column = columns[key] = [None] * length
+
+            column.append(value)
+
+        self.length = length + 1
+
+        if len(row) < len(columns):
+            for column in columns.values():
+                if len(column) == length:
+                    column.append(None)
+
+    def extend(self, rows):
+        """
+        Appends a list of row dicts. When all rows have the same keys in the same order, they are moved to the
+        columns at once.
+        """
+        if not rows:
+            return
+
+        keys = list(rows[0])
+
+        if any(list(row) != keys for row in rows):
+            for row in rows:
+                self.append(row)
+
+            return
+
+        columns = self.columns
+        length = self.length
+
+        for key, values in zip(keys, zip(*[row.values() for row in rows])):
+            column = columns.get(key)
+
+            if column is None:
+                column = columns[key] = [None] * length
+
+            column.extend(values)
+
+        self.length = length + len(rows)
+
+        for column in columns.values():
+            if len(column) < self.length:
+                column.extend([None] * (self.length - len(column)))
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        """
+        Yields the rows as dicts.
+        """
+        names = list(self.columns)
+
+        for values in zip(*self.columns.values()):
+            yield dict(zip(names, values))
+
+
+def encode_info_rows(value):
+    """
+    json default function which writes InfoRows as {"columns": ..., "length": ...}. Other values are written as strings.
+    """
+    if isinstance(value, InfoRows):
+        return value.to_json()
+
+    return str(value)
+
+
+def decode_info_rows(record):
+    """
+    Restores the InfoRows of the info_* keys of a record read back from json. Lists of rows are kept as they are.
+    """
+    for key, value in record.items():
+        if key.startswith("info_") and isinstance(value, dict) and "columns" in value:
+            record[key] = InfoRows.from_json(value)
+
+    return record
+
+
+def concat_info_rows(tables):
+    """
+    Returns a dataframe with the rows of a list of InfoRows, with columns in order of first appearance.
+    """
+    names = list(dict.fromkeys(chain.from_iterable(i.columns for i in tables)))
+
+    if not any(len(i) for i in tables):
+        return pd.DataFrame(index=range(0))
+
+    data = {}
+
+    for name in names:
+        data[name] = list(chain.from_iterable(i.columns.get(name) or [None] * len(i) for i in tables))
+
+    return pd.DataFrame(data)
+
+
+class JsonStreamReader:
+    """
+    Pull parser over a json text file, which reads it in chunks. Containers are walked with iter_object and
+    iter_array, and values inside them are decoded one at a time with value().
+    """
+
+    def __init__(self, file, chunk_size=READ_CHUNK_SIZE):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        data = self.file.read(self.chunk_size)
+
+        if not data:
+            return False
+
+        self.buffer = self.buffer[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """
+        Skips whitespace and returns the next character, or "" at the end of the file.
+        """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in JSON_WHITESPACE:
+                self.pos += 1
+
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+
+            if not self._fill():
+                return ""
+
+    def expect(self, char):
+        found = self.peek()
+
+        if found != char:
+            raise ValueError(f"Invalid json: expected {char!r}, found {found!r}.")
+
+        self.pos += 1
+
+    def value(self):
+        """
+        Decodes the next json value.
+        """
+        self.peek()
+
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+
+                continue
+
+            # A value which ends with the buffer (e.g. a number) may continue in the next chunk
+            if end == len(self.buffer) and self._fill():
+                continue
+
+            self.pos = end
+            return value
+
+    def _next_item(self, closing):
+        found = self.peek()
+        self.pos += 1
+
+        if found == closing:
+            return False
+
+        if found != ",":
+            raise ValueError(f"Invalid json: expected ',' or {closing!r}, found {found!r}.")
+
+        return True
+
+    def iter_array(self):
+        """
+        Walks an array. The caller reads each item before asking for the next one.
+        """
+        self.expect("[")
+
+        if self.peek() == "]":
+            self.pos += 1
+            return
+
+        while True:
+            yield
+
+            if not self._next_item("]"):
+                return
+
+    def iter_object(self):
+        """
+        Walks an object, yielding its keys. The caller reads the value of each key before asking for the next one.
+        """
+        self.expect("{")
+
+        if self.peek() == "}":
+            self.pos += 1
+            return
+
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+
+            if not self._next_item("}"):
+                return
+
+
+def read_table_rows(reader):
+    """
+    Reads the "rows" array of a result table into InfoRows, in batches of READ_BATCH_ROWS rows.
+    """
+    rows = InfoRows()
+
+    if reader.peek() != "[":
+        reader.value()
+        return rows
+
+    batch = []
+
+    for _ in reader.iter_array():
+        batch.append(reader.value())
+
+        if len(batch) == READ_BATCH_ROWS:
+            rows.extend(batch)
+            batch = []
+
+    rows.extend(batch)
+    return rows
+
+
+def read_dscmd_info_tables(file_name, info_keys, chunk_size=READ_CHUNK_SIZE):
+    """
+    Streams the Dax Studio json output {"results": [{"tables": [{"rows": [...]}, ...]}]} of a DAX query file, and
+    returns the rows of each result table of the first result as InfoRows, keyed by info_keys in order.
+    Rows are decoded in small batches, so the whole output is never loaded as python objects.
+    """
+    tables = {}
+    has_results = False
+
+    with open(file_name, "r", encoding="utf-8") as file:
+        reader = JsonStreamReader(file, chunk_size)
+
+        for key in reader.iter_object():
+            if key != "results":
+                reader.value()
+                continue
+
+            for result_index, _ in enumerate(reader.iter_array()):
+                if result_index > 0:
+                    reader.value()
+                    continue
+
+                has_results = True
+
+                for result_key in reader.iter_object():
+                    if result_key != "tables":
+                        reader.value()
+                        continue
+
+                    for table_index, _ in enumerate(reader.iter_array()):
+                        rows = InfoRows()
+
+                        for table_key in reader.iter_object():
+                            if table_key == "rows":
+                                rows = read_table_rows(reader)
+                            else:
+                                reader.value()
+
+                        if table_index < len(info_keys):
+                            tables[info_keys[table_index]] = rows
+
+    if not has_results:
+        raise ValueError("No results in Dax Studio output.")
+
+    return tables
@@ -1,8 +1,19 @@
 import os
+import glob
+import json
+import time
+import shutil
+import hashlib
+import sqlite3
 import requests
 import logging
+import tempfile
+import numpy as np
 import pandas as pd
-from io import BytesIO
+from openpyxl import Workbook
+from src.auth import TokenProvider, GRAPH_SCOPE, resolve_access_token
+from src.metrics import traced, metrics
+from src.rate_limiter import parse_retry_after
 
 logging.basicConfig(
     level=logging.INFO,
@@ -11,54 +22,585 @@ logging.basicConfig(
     datefmt='%Y-%m-%d %H:%M'
 )
 
-def export_dataframes_to_excel(file_name, dataframes, sheet_names):
+GRAPH_API_URL = 'https://graph.microsoft.com/v1.0'
+
+# Microsoft Graph upload limits. Upload session chunks must be a multiple of 320 KiB.
+SHAREPOINT_UPLOAD_THRESHOLD = 4 * 1024 * 1024
+SHAREPOINT_CHUNK_MULTIPLE = 320 * 1024
+SHAREPOINT_CHUNK_SIZE = 32 * SHAREPOINT_CHUNK_MULTIPLE
+SHAREPOINT_CHUNK_MAX_RETRIES = 5
+
+# Excel worksheet limits
+EXCEL_MAX_ROWS = 1048576
+EXCEL_MAX_SHEET_NAME_LENGTH = 31
+EXCEL_STREAMING_CHUNK_SIZE = 10000
+
+# Content hashes of the written frames. Volatile columns are ignored, so a frame is unchanged if only they differ.
+CONTENT_HASH_IGNORED_COLUMNS = ["extract_timestamp"]
+CONTENT_HASH_FILE = "_content_hash"
+
+# Partition value of the rows without extract date or workspace id in the PARQUET and CSV sinks
+NULL_PARTITION = "__null__"
+
+# Primary key of the SQLite table of each frame. Key columns which are not in the frame (the partition number of the
+# tables with several partitions) are computed as the row number within the other key columns.
+SQLITE_PRIMARY_KEYS = {
+    "workspaces": ["workspace_id"],
+    "reports": ["workspace_id", "report_id"],
+    "reports_pages": ["workspace_id", "report_id", "page_id"],
+    "semantic_models": ["workspace_id", "dataset_id"],
+    "tables": ["workspace_id", "dataset_id", "table_name", "partition_number"],
+    "columns": ["workspace_id", "dataset_id", "table_name", "column_name"],
+    "measures": ["workspace_id", "dataset_id", "table_name", "measure_name"],
+    "calculation_groups": ["workspace_id", "dataset_id", "table_name", "calc_item_name"],
+    "relationships": ["workspace_id", "dataset_id", "from_table", "from_column", "to_table", "to_column"],
+    "dependencies": ["workspace_id", "dataset_id", "object_type", "table_name", "object_name", "referenced_object_type", "referenced_table_name",
+                     "referenced_object_name"],
+    "unused_objects": ["workspace_id", "dataset_id", "object_type", "table_name", "object_name"]
+}
+
+# Secondary indexes of the SQLite tables, on the columns the catalog is usually searched by
+SQLITE_INDEXES = {
+    "workspaces": [["workspace_name"]],
+    "reports": [["workspace_name"], ["report_name"], ["dataset_id"]],
+    "reports_pages": [["page_name"]],
+    "semantic_models": [["workspace_name"], ["dataset_name"]],
+    "tables": [["workspace_name", "is_hidden_flag"], ["dataset_name"], ["table_name"]],
+    "columns": [["workspace_name"], ["dataset_name"], ["column_name"], ["is_hidden_flag"]],
+    "measures": [["workspace_name"], ["dataset_name"], ["measure_name"]],
+    "calculation_groups": [["dataset_name"], ["calc_item_name"]],
+    "relationships": [["dataset_name"], ["from_table", "from_column"], ["to_table", "to_column"]],
+    "dependencies": [["dataset_name"], ["object_name"], ["referenced_table_name", "referenced_object_name"]],
+    "unused_objects": [["dataset_name"], ["object_type", "is_hidden_flag"]]
+}
+# Frames of the dax info of each semantic model. Their rows are only synchronized for the semantic models whose dax
+# info was extracted in the run, so a failed export does not delete the rows of its semantic model
+SQLITE_DATASET_INFO_FRAMES = ["tables", "columns", "measures", "calculation_groups", "relationships", "dependencies", "unused_objects"]
+SQLITE_DATASETS_TABLE = "semantic_models"
+SQLITE_BATCH_SIZE = 10000
+SQLITE_CONTENT_HASHES_TABLE = "_content_hashes"
+
+
+def split_excel_sheets(df, sheet_name):
+    """
+    Splits a dataframe into slices that fit in an Excel worksheet, including the header row.
+    Rows above the limit spill to continuation sheets named "<sheet_name> (2)", "<sheet_name> (3)"...
+    """
+    max_rows = EXCEL_MAX_ROWS - 1
+
+    if len(df) <= max_rows:
+        return [(df, sheet_name)]
+    
+    sheets = []
+
+    for i, start in enumerate(range(0, len(df), max_rows)):
+        name = sheet_name
+
+        if i > 0:
+            suffix = f" ({i + 1})"
+            name = sheet_name[:EXCEL_MAX_SHEET_NAME_LENGTH - len(suffix)] + suffix
+        
+        sheets.append((df.iloc[start:start + max_rows], name))
+
+    logging.info(f'Sheet "{sheet_name}" has {len(df)} rows and was split into {len(sheets)} sheets.')
+    return sheets
+
+
+def iter_excel_rows(df, chunk_size=EXCEL_STREAMING_CHUNK_SIZE):
+    """
+    Yields the rows of a dataframe as tuples of Excel-compatible values, converting one chunk of rows at a time.
+    """
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size].astype(object)
+        chunk = chunk.where(chunk.notna(), None)
+        yield from chunk.itertuples(index=False, name=None)
+
+
+@traced()
+def export_dataframes_to_excel(file_name, dataframes, sheet_names, streaming=False):
     """
     Exports multiple dataframes to an Excel file, each dataframe on a different sheet.
+    In streaming mode the sheets are written row by row with openpyxl write-only mode, which keeps memory bounded.
     """
+    if streaming:
+        export_dataframes_to_excel_streaming(file_name, dataframes, sheet_names)
+        return
+    
     with pd.ExcelWriter(file_name, engine='openpyxl') as writer:
         for df, sheet_name in zip(dataframes, sheet_names):
-            df.to_excel(writer, sheet_name=sheet_name, index=False)
+            for sheet_df, sheet_part_name in split_excel_sheets(df, sheet_name):
+                sheet_df.to_excel(writer, sheet_name=sheet_part_name, index=False)
 
 
-def get_sharepoint_access_token(tenant_id, client_id, client_secret):
+def export_dataframes_to_excel_streaming(file_name, dataframes, sheet_names):
     """
-    Generate Bearer token for Sharepoint via Microsoft Graph API with service principal.
+    Exports multiple dataframes to an Excel file with openpyxl write-only mode, streaming each sheet row by row.
     """
-    url = f'https://login.microsoftonline.com/{tenant_id}/oauth2/v2.0/token'
+    workbook = Workbook(write_only=True)
 
-    payload = {
-        'grant_type': 'client_credentials',
-        'client_id': client_id,
-        'client_secret': client_secret,
-        'scope': 'https://graph.microsoft.com/.default'
-    }
-    response = requests.post(url=url, data=payload)
-    if response.status_code == 200:
-        response_json = response.json()
-        data = response_json['access_token']
-        return data
+    for df, sheet_name in zip(dataframes, sheet_names):
+        for sheet_df, sheet_part_name in split_excel_sheets(df, sheet_name):
+            worksheet = workbook.create_sheet(sheet_part_name)
+            worksheet.append([str(col) for col in sheet_df.columns])
+
+            for row in iter_excel_rows(sheet_df):
+                worksheet.append(row)
+
+    workbook.save(file_name)
+
+
+def hash_dataframe(df, ignored_columns=CONTENT_HASH_IGNORED_COLUMNS):
+    """
+    Returns a stable sha256 content hash of a dataframe: its column names, dtypes and values in row order, without
+    the ignored columns. Categoricals are hashed by value, so the hash does not depend on their codes.
+    """
+    df = df.drop(columns=[col for col in ignored_columns if col in df.columns])
+
+    digest = hashlib.sha256()
+    digest.update(json.dumps([[str(col), str(dtype)] for col, dtype in df.dtypes.items()]).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def hash_dataframes(dataframes, sheet_names):
+    """
+    Returns the content hash of each dataframe by sheet name.
+    """
+    return {sheet_name: hash_dataframe(df) for df, sheet_name in zip(dataframes, sheet_names)}
+
+
+def get_hashes_file_name(file_name):
+    """
+    Returns the name of the content hashes file stored next to a workbook, e.g. "PowerBI_Docs.hashes.json".
+    """
+    return f"{os.path.splitext(file_name)[0]}.hashes.json"
+
+
+def read_json_file(file_name):
+    """
+    Returns the content of a json file, or None if it is missing or invalid.
+    """
+    try:
+        with open(file_name, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    except (OSError, ValueError):
+        return None
+
+
+def write_json_file(file_name, data):
+    with open(file_name, "w", encoding="utf-8") as file:
+        json.dump(data, file, indent=2)
+
+
+def get_frame_name(sheet_name):
+    """
+    Converts a sheet name to a file system friendly frame name, e.g. "Reports Pages" to "reports_pages".
+    """
+    return sheet_name.strip().lower().replace(" ", "_")
+
+
+def export_partitioned_dataframe(output_dir, df, frame_name, write_partition, file_extension):
+    """
+    Writes a dataframe partitioned by extract date and workspace id, with the Hive-style layout
+    <output_dir>/<frame_name>/extract_date=<YYYY-MM-DD>/workspace_id=<id>/part-0.<file_extension>.
+    As in Hive-style datasets, the workspace_id column is stored in the directory name only, and
+    existing partitions of the same extract date are replaced. Rows without extract date or workspace id are written
+    to the NULL_PARTITION partition.
+    """
+    frame_dir = os.path.join(output_dir, frame_name)
+    os.makedirs(frame_dir, exist_ok=True)
+
+    schema = {col: str(dtype) for col, dtype in df.dtypes.items()}
+
+    with open(os.path.join(frame_dir, "_schema.json"), "w", encoding="utf-8") as file:
+        json.dump(schema, file, indent=2)
+
+    extract_dates = pd.to_datetime(df["extract_timestamp"]).dt.strftime("%Y-%m-%d").fillna(NULL_PARTITION)
+
+    for extract_date in extract_dates.unique():
+        shutil.rmtree(os.path.join(frame_dir, f"extract_date={extract_date}"), ignore_errors=True)
+
+    for (extract_date, workspace_id), partition_df in df.groupby([extract_dates, df["workspace_id"]], sort=False, observed=True, dropna=False):
+        workspace_id = NULL_PARTITION if pd.isna(workspace_id) else workspace_id
+        partition_dir = os.path.join(frame_dir, f"extract_date={extract_date}", f"workspace_id={workspace_id}")
+        os.makedirs(partition_dir, exist_ok=True)
+        write_partition(partition_df.drop(columns="workspace_id"), os.path.join(partition_dir, f"part-0.{file_extension}"))
+
+
+def export_partitioned_dataframes(output_dir, dataframes, sheet_names, write_partition, file_extension, skip_unchanged=False):
+    """
+    Writes each dataframe with export_partitioned_dataframe, and stores its content hash in a _content_hash file next to
+    its _schema.json. With skip_unchanged, frames whose content hash did not change since they were written are skipped,
+    and keep their previous partitions.
+    """
+    for df, sheet_name in zip(dataframes, sheet_names):
+        frame_name = get_frame_name(sheet_name)
+        hash_file = os.path.join(output_dir, frame_name, CONTENT_HASH_FILE)
+        content_hash = hash_dataframe(df)
+
+        if skip_unchanged and read_json_file(hash_file) == content_hash:
+            logging.info(f'Frame "{frame_name}" is unchanged. Skipping write...')
+            metrics.increment("output_writes_skipped_total", kind="frame")
+            continue
+
+        export_partitioned_dataframe(output_dir, df, frame_name, write_partition, file_extension)
+        write_json_file(hash_file, content_hash)
+
+
+@traced()
+def export_dataframes_to_parquet(output_dir, dataframes, sheet_names, skip_unchanged=False, **options):
+    """
+    Exports multiple dataframes to Parquet files partitioned by extract date and workspace id.
+    With skip_unchanged, only the frames whose content changed are written. Requires pyarrow.
+    """
+    export_partitioned_dataframes(
+        output_dir, dataframes, sheet_names,
+        lambda partition_df, path: partition_df.to_parquet(path, index=False),
+        "parquet", skip_unchanged
+    )
+
+
+@traced()
+def export_dataframes_to_csv(output_dir, dataframes, sheet_names, skip_unchanged=False, **options):
+    """
+    Exports multiple dataframes to gzip CSV files partitioned by extract date and workspace id.
+    Column dtypes are stored in a _schema.json file next to each frame to read them back typed.
+    With skip_unchanged, only the frames whose content changed are written.
+    """
+    export_partitioned_dataframes(
+        output_dir, dataframes, sheet_names,
+        lambda partition_df, path: partition_df.to_csv(path, index=False, compression="gzip", date_format="%Y-%m-%dT%H:%M:%S.%f"),
+        "csv.gz", skip_unchanged
+    )
+
+
+def export_dataframes_to_excel_file(output_dir, dataframes, sheet_names, file_name="PowerBI_Docs.xlsx", streaming=False, skip_unchanged=False,
+                                    **options):
+    """
+    Exports multiple dataframes to a single Excel file in the output directory, with the content hash of each sheet in
+    a hashes file next to it. With skip_unchanged, the workbook is not written again if no sheet changed.
+    """
+    file_path = os.path.join(output_dir, file_name)
+    hashes_file = os.path.join(output_dir, get_hashes_file_name(file_name))
+    hashes = hash_dataframes(dataframes, sheet_names)
+
+    if skip_unchanged and os.path.exists(file_path) and read_json_file(hashes_file) == hashes:
+        logging.info(f'Workbook "{file_name}" is unchanged. Skipping write...')
+        metrics.increment("output_writes_skipped_total", kind="workbook")
+        return
+
+    export_dataframes_to_excel(file_path, dataframes, sheet_names, streaming)
+    write_json_file(hashes_file, hashes)
+
+
+def get_sqlite_type(dtype):
+    """
+    Returns the SQLite column type of a pandas dtype. Datetimes are stored as ISO 8601 text.
+    """
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return "INTEGER"
+
+    if pd.api.types.is_float_dtype(dtype):
+        return "REAL"
+
+    return "TEXT"
+
+
+def quote_sqlite_name(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def format_sqlite_datetimes(values):
+    """
+    Formats a datetime column as ISO 8601 text, with NaT as None. Only the distinct values are formatted, as
+    timestamps repeat across rows (e.g. extract_timestamp).
+    """
+    codes, uniques = pd.factorize(values)
+    formatted = np.append(uniques.strftime("%Y-%m-%dT%H:%M:%S.%f").to_numpy(dtype=object), None)
+    return formatted[codes]
+
+
+def iter_sqlite_rows(df, chunk_size=SQLITE_BATCH_SIZE):
+    """
+    Yields batches of the rows of a dataframe as tuples of SQLite values, with blanks as None.
+    """
+    dates_cols = [col for col, dtype in df.dtypes.items() if pd.api.types.is_datetime64_any_dtype(dtype)]
+
+    if dates_cols:
+        df = df.assign(**{col: format_sqlite_datetimes(df[col]) for col in dates_cols})
+
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size].astype(object)
+        chunk = chunk.where(chunk.notna(), None)
+        yield list(chunk.itertuples(index=False, name=None))
+
+
+def prepare_sqlite_frame(df, primary_key):
+    """
+    Adds the computed key columns to a frame and fills blank keys with empty strings, as primary key columns are NOT NULL.
+    """
+    df = df.copy()
+    computed = [col for col in primary_key if col not in df.columns]
+    other_keys = [col for col in primary_key if col in df.columns]
+
+    for col in other_keys:
+        if df[col].isna().any():
+            df[col] = df[col].astype(object).where(df[col].notna(), "")
+
+    for col in computed:
+        df[col] = df.groupby(other_keys, sort=False, observed=True).cumcount() if other_keys else range(len(df))
+
+    return df
+
+
+def create_sqlite_table(connection, table, df, primary_key, indexes):
+    """
+    Creates the table of a frame and its indexes if needed. A table whose columns differ from the frame (e.g. written by
+    an older version) is recreated.
+    """
+    columns = [(col, get_sqlite_type(dtype)) for col, dtype in df.dtypes.items()]
+    existing = [(row[1], row[2]) for row in connection.execute(f"PRAGMA table_info({quote_sqlite_name(table)})")]
+
+    if existing and existing != columns:
+        logging.warning(f'SQLite table "{table}" has different columns. Recreating it...')
+        connection.execute(f"DROP TABLE {quote_sqlite_name(table)}")
+        existing = []
+
+    if not existing:
+        definitions = [f"{quote_sqlite_name(col)} {sqlite_type}{' NOT NULL' if col in primary_key else ''}" for col, sqlite_type in columns]
+        key = ", ".join(quote_sqlite_name(col) for col in primary_key)
+        connection.execute(f"CREATE TABLE {quote_sqlite_name(table)} ({', '.join(definitions)}, PRIMARY KEY ({key}))")
+
+    for index_columns in indexes:
+        index_name = quote_sqlite_name(f"ix_{table}_{'_'.join(index_columns)}")
+        connection.execute(
+            f"CREATE INDEX IF NOT EXISTS {index_name} ON {quote_sqlite_name(table)} ({', '.join(quote_sqlite_name(col) for col in index_columns)})"
+        )
+
+
+def upsert_sqlite_table(connection, table, df, primary_key, datasets=None):
+    """
+    Upserts the rows of a frame in batches and deletes the rows whose key is no longer in the frame, e.g. of objects
+    which were deleted. With a list of (workspace_id, dataset_id) datasets, only the rows of these semantic models are
+    deleted. Rows are only updated if a column other than extract_timestamp changed, so the extract_timestamp of a row
+    is the one of the run which last changed it. Returns the upserted and deleted row counts.
+    """
+    columns = list(df.columns)
+    values = [col for col in columns if col not in primary_key]
+    compared = [col for col in values if col not in CONTENT_HASH_IGNORED_COLUMNS]
+    name = quote_sqlite_name(table)
+    key = ", ".join(quote_sqlite_name(col) for col in primary_key)
+
+    upsert = (
+        f"INSERT INTO {name} ({', '.join(quote_sqlite_name(col) for col in columns)}) VALUES ({', '.join('?' * len(columns))}) "
+        f"ON CONFLICT ({key}) DO "
+    )
+
+    if values:
+        upsert += (
+            f"UPDATE SET {', '.join(f'{quote_sqlite_name(col)} = excluded.{quote_sqlite_name(col)}' for col in values)}"
+            f"{' WHERE ' + ' OR '.join(f'{name}.{quote_sqlite_name(col)} IS NOT excluded.{quote_sqlite_name(col)}' for col in compared) if compared else ''}"
+        )
     else:
-        raise KeyError(f'Error to get Sharepoint access token: {response.status_code} - {response.text}')
+        upsert += "NOTHING"
+
+    changes = connection.total_changes
+
+    for batch in iter_sqlite_rows(df):
+        connection.executemany(upsert, batch)
+
+    upserted = connection.total_changes - changes
+
+    # Keys of the frame, to delete the rows which are no longer extracted
+    connection.execute("DROP TABLE IF EXISTS temp._keys")
+    connection.execute(f"CREATE TEMP TABLE _keys ({key}, PRIMARY KEY ({key}))")
+
+    for batch in iter_sqlite_rows(df[primary_key].drop_duplicates()):
+        connection.executemany(f"INSERT INTO temp._keys VALUES ({', '.join('?' * len(primary_key))})", batch)
+
+    match = " AND ".join(f"k.{quote_sqlite_name(col)} = {name}.{quote_sqlite_name(col)}" for col in primary_key)
+    delete = f"DELETE FROM {name} WHERE NOT EXISTS (SELECT 1 FROM temp._keys k WHERE {match})"
+
+    if datasets is not None:
+        connection.execute("DROP TABLE IF EXISTS temp._datasets")
+        connection.execute("CREATE TEMP TABLE _datasets (workspace_id, dataset_id, PRIMARY KEY (workspace_id, dataset_id))")
+        connection.executemany("INSERT OR IGNORE INTO temp._datasets VALUES (?, ?)", [(str(w), str(d)) for w, d in datasets])
+        delete += f" AND EXISTS (SELECT 1 FROM temp._datasets d WHERE d.workspace_id = {name}.workspace_id AND d.dataset_id = {name}.dataset_id)"
+
+    changes = connection.total_changes
+    connection.execute(delete)
+    deleted = connection.total_changes - changes
+
+    connection.execute("DROP TABLE temp._keys")
+    connection.execute("DROP TABLE IF EXISTS temp._datasets")
+    return upserted, deleted
+
+
+def delete_sqlite_orphan_rows(connection, table):
+    """
+    Deletes the rows of a dax info table whose semantic model is no longer in the semantic models table, e.g. deleted
+    semantic models. Returns the deleted row count.
+    """
+    exists = connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (SQLITE_DATASETS_TABLE,)).fetchone()
+
+    if not exists:
+        return 0
+
+    name = quote_sqlite_name(table)
+    changes = connection.total_changes
+    connection.execute(
+        f"DELETE FROM {name} WHERE NOT EXISTS (SELECT 1 FROM {quote_sqlite_name(SQLITE_DATASETS_TABLE)} s "
+        f"WHERE s.workspace_id = {name}.workspace_id AND s.dataset_id = {name}.dataset_id)"
+    )
+    return connection.total_changes - changes
+
+
+@traced()
+def export_dataframes_to_sqlite(output_dir, dataframes, sheet_names, file_name="PowerBI_Docs.xlsx", skip_unchanged=False, info_datasets=None,
+                                **options):
+    """
+    Writes multiple dataframes to a local SQLite database named after file_name (e.g. PowerBI_Docs.sqlite), one table
+    per frame, with the primary keys of SQLITE_PRIMARY_KEYS and the indexes of SQLITE_INDEXES. Existing databases are
+    updated incrementally with batched upserts, and the rows which are no longer extracted are deleted, all in a
+    single transaction. With skip_unchanged, frames whose content hash did not change are not synchronized.
+    info_datasets is the list of (workspace_id, dataset_id) whose dax info was extracted in the run (by default, the
+    semantic models of each frame): rows of the SQLITE_DATASET_INFO_FRAMES are only deleted for these semantic models,
+    and for the semantic models which are no longer in the semantic models table.
+    """
+    database = os.path.join(output_dir, f"{os.path.splitext(file_name)[0]}.sqlite")
+    connection = sqlite3.connect(database, isolation_level=None)
+
+    try:
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("BEGIN")
+        connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {SQLITE_CONTENT_HASHES_TABLE} (frame_name TEXT NOT NULL PRIMARY KEY, content_hash TEXT NOT NULL)"
+        )
+        content_hashes = dict(connection.execute(f"SELECT frame_name, content_hash FROM {SQLITE_CONTENT_HASHES_TABLE}").fetchall())
+
+        for df, sheet_name in zip(dataframes, sheet_names):
+            frame_name = get_frame_name(sheet_name)
+            content_hash = hash_dataframe(df)
+
+            if skip_unchanged and content_hashes.get(frame_name) == content_hash:
+                logging.info(f'Frame "{frame_name}" is unchanged. Skipping write...')
+                metrics.increment("output_writes_skipped_total", kind="frame")
+                continue
+
+            primary_key = SQLITE_PRIMARY_KEYS.get(frame_name) or list(df.columns[:1])
+            df = prepare_sqlite_frame(df, primary_key)
+
+            create_sqlite_table(connection, frame_name, df, primary_key, SQLITE_INDEXES.get(frame_name, []))
+
+            if frame_name in SQLITE_DATASET_INFO_FRAMES:
+                datasets = info_datasets if info_datasets is not None else df[["workspace_id", "dataset_id"]].drop_duplicates().itertuples(index=False)
+                upserted, deleted = upsert_sqlite_table(connection, frame_name, df, primary_key, list(datasets))
+                deleted += delete_sqlite_orphan_rows(connection, frame_name)
+            else:
+                upserted, deleted = upsert_sqlite_table(connection, frame_name, df, primary_key)
+            connection.execute(
+                f"INSERT INTO {SQLITE_CONTENT_HASHES_TABLE} VALUES (?, ?) ON CONFLICT (frame_name) DO UPDATE SET content_hash = excluded.content_hash",
+                (frame_name, content_hash)
+            )
+            logging.info(f'SQLite table "{frame_name}": {upserted} rows inserted or updated, {deleted} rows deleted.')
+
+        connection.execute("COMMIT")
+
+    except Exception:
+        if connection.in_transaction:
+            connection.execute("ROLLBACK")
+
+        raise
+
+    finally:
+        connection.close()
+
+
+# Output sinks by name. Every sink takes (output_dir, dataframes, sheet_names, **options).
+OUTPUT_SINKS = {
+    "EXCEL": export_dataframes_to_excel_file,
+    "PARQUET": export_dataframes_to_parquet,
+    "CSV": export_dataframes_to_csv,
+    "SQLITE": export_dataframes_to_sqlite
+}
+
+
+@traced()
+def export_dataframes(sink, output_dir, dataframes, sheet_names, **options):
+    """
+    Exports multiple dataframes to the output directory with the given sink.
+    """
+    if sink not in OUTPUT_SINKS:
+        raise ValueError(f"Unknown output sink: {sink}. Available sinks: {', '.join(OUTPUT_SINKS)}")
     
+    os.makedirs(output_dir, exist_ok=True)
+    OUTPUT_SINKS[sink](output_dir, dataframes, sheet_names, **options)
+    logging.info(f"Exported {len(dataframes)} dataframes to {output_dir} with the {sink} sink.")
+
 
-def resolve_sharepoint_site_name(access_token, site_name):
+def read_partitioned_dataframe(output_dir, frame_name, extract_date=None):
+    """
+    Reads back a frame written by the PARQUET or CSV sinks, restoring the dtypes of _schema.json.
+    If extract_date is None, all extract dates are read.
+    """
+    frame_dir = os.path.join(output_dir, frame_name)
+
+    with open(os.path.join(frame_dir, "_schema.json"), "r", encoding="utf-8") as file:
+        schema = json.load(file)
+
+    date_pattern = f"extract_date={extract_date}" if extract_date else "extract_date=*"
+    files = sorted(glob.glob(os.path.join(frame_dir, date_pattern, "workspace_id=*", "part-0.*")))
+
+    parts = []
+
+    for file_name in files:
+        if file_name.endswith(".parquet"):
+            part_df = pd.read_parquet(file_name)
+        else:
+            dates_cols = [col for col, dtype in schema.items() if dtype.startswith("datetime") and col != "workspace_id"]
+            dtypes = {col: dtype for col, dtype in schema.items() if col not in dates_cols and col != "workspace_id"}
+            part_df = pd.read_csv(file_name, compression="gzip", dtype=dtypes, parse_dates=dates_cols)
+
+        workspace_id = os.path.basename(os.path.dirname(file_name)).split("=", 1)[1]
+        part_df["workspace_id"] = None if workspace_id == NULL_PARTITION else workspace_id
+        parts.append(part_df)
+
+    if not parts:
+        return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in schema.items()})
+    
+    df = pd.concat(parts, ignore_index=True)
+    return df[list(schema)].astype(schema)
+
+
+def get_sharepoint_access_token(tenant_id, client_id, client_secret, http_client=None):
+    """
+    Generate Bearer token for Sharepoint via Microsoft Graph API with service principal.
+    """
+    return TokenProvider(tenant_id, client_id, client_secret, GRAPH_SCOPE, http_client).get_token()
+    
+
+@traced()
+def resolve_sharepoint_site_name(access_token, site_name, http_client=None):
     """
     Resolves Sharepoint drive id based on a given site name.
     """
 
     headers = {
-        'Authorization' : f'Bearer {access_token}'
+        'Authorization' : f'Bearer {resolve_access_token(access_token)}'
     }
     
-    url = f'https://graph.microsoft.com/v1.0/sites?search={site_name}'
-    response = requests.get(url, headers=headers)
+    http = http_client or requests
+
+    url = f'{GRAPH_API_URL}/sites?search={site_name}'
+    response = http.get(url, headers=headers)
     
     if response.status_code == 200:
         site_id = response.json()['value'][0]['id']
         
-        url2 = f'https://graph.microsoft.com/v1.0/sites/{site_id}/drives'
+        url2 = f'{GRAPH_API_URL}/sites/{site_id}/drives'
         
-        response2 = requests.get(url2, headers=headers)
+        response2 = http.get(url2, headers=headers)
 
         if response2.status_code == 200:
             drive_id = response2.json()['value'][0]['id']
@@ -69,31 +611,237 @@ def resolve_sharepoint_site_name(access_token, site_name):
     raise KeyError(f'Error to get Sharepoint Site Id: {response.status_code} - {response.text}')
 
 
-def load_csv_to_sharepoint(access_token, site_url, site_relative_url, file_name, dataframes, sheet_names):
+def get_sharepoint_item(access_token, drive_id, item_path, content=False, http_client=None):
     """
-    Convert Pandas DataFrame to binary and upload it as csv to a Sharepoint Folder.
+    Returns the metadata of a file in a Sharepoint drive, or its content as bytes if content is True.
+    Returns None if the file does not exist.
     """
-    site_name = os.path.basename(site_url)
+    url = f'{GRAPH_API_URL}/drives/{drive_id}/root:/{item_path}' + (':/content' if content else '')
 
-    drive_id = resolve_sharepoint_site_name(access_token, site_name)
+    headers = {
+        'Authorization' : f'Bearer {resolve_access_token(access_token)}'
+    }
 
-    file_buffer = BytesIO()
-    
-    export_dataframes_to_excel(file_buffer, dataframes, sheet_names)
-        
-    file_buffer.seek(0)
+    http = http_client or requests
+    response = http.get(url, headers=headers)
+
+    if response.status_code == 200:
+        return response.content if content else response.json()
+
+    if response.status_code == 404:
+        return None
 
-    url = f"https://graph.microsoft.com/v1.0/drives/{drive_id}/root:/{site_relative_url}/{file_name}:/content"
+    raise requests.HTTPError(f'Error to get Sharepoint file "{item_path}": {response.status_code} - {response.text}')
+
+
+def put_sharepoint_content(access_token, drive_id, item_path, data, http_client=None):
+    """
+    Uploads a small file (up to 4 MB) to a Sharepoint drive in a single request and returns the response.
+    """
+    url = f"{GRAPH_API_URL}/drives/{drive_id}/root:/{item_path}:/content"
 
     headers = {
-        "Authorization": f"Bearer {access_token}",
+        "Authorization": f"Bearer {resolve_access_token(access_token)}",
         "Content-Type": "application/octet-stream",
     }
 
-    response = requests.put(url, headers=headers, data=file_buffer)
+    http = http_client or requests
+    return http.put(url, headers=headers, data=data)
 
-    if response.status_code in [200, 201]:
-        logging.info(f'Sharepoint sucessfully uploaded - file: "{file_name}". Status code: {response.status_code}.')
-    else:
-        logging.error(f'Sharepoint upload failed - file: "{file_name}". Status code: {response.status_code} - {response.text}.')
-        raise requests.HTTPError(f'Sharepoint upload failed - file: "{file_name}". Status code: {response.status_code} - {response.text}.')
\ No newline at end of file
+
+def create_sharepoint_upload_session(access_token, drive_id, item_path, http_client=None):
+    """
+    Creates a Microsoft Graph upload session for a file in a Sharepoint drive and returns its upload url.
+    """
+    url = f'{GRAPH_API_URL}/drives/{drive_id}/root:/{item_path}:/createUploadSession'
+
+    headers = {
+        'Authorization' : f'Bearer {resolve_access_token(access_token)}'
+    }
+
+    payload = {
+        'item': {
+            '@microsoft.graph.conflictBehavior': 'replace'
+        }
+    }
+
+    http = http_client or requests
+    response = http.post(url, headers=headers, json=payload)
+
+    if response.status_code == 200:
+        return response.json()['uploadUrl']
+    
+    raise requests.HTTPError(f'Error to create Sharepoint upload session: {response.status_code} - {response.text}')
+
+
+def send_upload_session_request(method, upload_url, http_client=None, **kwargs):
+    """
+    Sends a request to an upload session once: the rate controller of http_client paces it but does not retry it, as
+    failed chunks and status requests are only retried by upload_file_in_chunks, resuming from the last acknowledged byte.
+    """
+    if http_client is None:
+        return requests.request(method, upload_url, **kwargs)
+
+    return http_client.request(method, upload_url, max_retries=0, **kwargs)
+
+
+def get_upload_session_next_offset(upload_url, http_client=None):
+    """
+    Returns the first byte the upload session expects next, i.e. the byte after the last acknowledged one.
+    """
+    response = send_upload_session_request("GET", upload_url, http_client)
+
+    if response.status_code == 200:
+        next_ranges = response.json().get('nextExpectedRanges') or ['0-']
+        return int(next_ranges[0].split('-')[0])
+
+    raise requests.HTTPError(f'Error to get Sharepoint upload session status: {response.status_code} - {response.text}', response=response)
+
+
+def is_retryable_status(status_code):
+    """
+    Returns whether a failed upload request can be retried: throttling and server errors.
+    """
+    return status_code == 429 or status_code >= 500
+
+
+@traced()
+def upload_file_in_chunks(access_token, drive_id, item_path, file_path, chunk_size=SHAREPOINT_CHUNK_SIZE, max_retries=SHAREPOINT_CHUNK_MAX_RETRIES, http_client=None):
+    """
+    Uploads a file to a Sharepoint drive with a Microsoft Graph upload session, streaming chunks from disk.
+    Chunks which fail with a connection error, a timeout, a 429 or a 5xx response are retried after their Retry-After
+    or with backoff, resuming from the last byte acknowledged by the upload session. Other errors (e.g. an expired
+    session) fail the upload.
+    """
+    chunk_size = max(SHAREPOINT_CHUNK_MULTIPLE, chunk_size // SHAREPOINT_CHUNK_MULTIPLE * SHAREPOINT_CHUNK_MULTIPLE)
+    total_size = os.path.getsize(file_path)
+
+    upload_url = create_sharepoint_upload_session(access_token, drive_id, item_path, http_client)
+
+    offset = 0
+    retries = 0
+    resume = False
+
+    with open(file_path, 'rb') as file:
+        while True:
+            retry_after = None
+
+            try:
+                # After a failed request, the upload resumes from the last byte acknowledged by the upload session
+                if resume:
+                    offset = get_upload_session_next_offset(upload_url, http_client)
+                    resume = False
+
+                file.seek(offset)
+                chunk = file.read(chunk_size)
+                end = offset + len(chunk) - 1
+
+                # The upload url is pre-authenticated, so no Authorization header is sent
+                headers = {
+                    'Content-Length': str(len(chunk)),
+                    'Content-Range': f'bytes {offset}-{end}/{total_size}'
+                }
+
+                response = send_upload_session_request("PUT", upload_url, http_client, headers=headers, data=chunk)
+
+                if response.status_code in [200, 201]:
+                    return response.json()
+
+                if response.status_code == 202:
+                    next_ranges = response.json().get('nextExpectedRanges') or [f'{end + 1}-']
+                    offset = int(next_ranges[0].split('-')[0])
+                    retries = 0
+                    continue
+
+                error = f'{response.status_code} - {response.text}'
+
+                if response.status_code == 404:
+                    raise requests.HTTPError(f'Sharepoint upload session expired - file: "{item_path}". Status code: {error}.')
+
+                if not is_retryable_status(response.status_code):
+                    raise requests.HTTPError(f'Sharepoint upload failed at bytes {offset}-{end}/{total_size} - file: "{item_path}". Error: {error}.')
+
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = str(e)
+
+            # Failed upload session status requests are retried like chunks
+            except requests.HTTPError as e:
+                if e.response is None or not is_retryable_status(e.response.status_code):
+                    raise
+
+                error = str(e)
+                retry_after = parse_retry_after(e.response.headers.get('Retry-After'))
+
+            retries += 1
+
+            if retries > max_retries:
+                raise requests.HTTPError(f'Sharepoint upload failed at bytes {offset}-{end}/{total_size} - file: "{item_path}". Error: {error}.')
+            
+            logging.warning(f'Sharepoint upload of bytes {offset}-{end}/{total_size} failed ({error}). Retrying {retries}/{max_retries}...')
+            time.sleep(retry_after if retry_after is not None else min(2 ** retries, 30))
+            resume = True
+
+
+@traced()
+def load_csv_to_sharepoint(access_token, site_url, site_relative_url, file_name, dataframes, sheet_names, http_client=None, streaming=False,
+                           upload_threshold=SHAREPOINT_UPLOAD_THRESHOLD, chunk_size=SHAREPOINT_CHUNK_SIZE, skip_unchanged=False):
+    """
+    Convert Pandas DataFrame to binary and upload it as csv to a Sharepoint Folder.
+    The workbook is written to a temp file on disk. Files larger than upload_threshold are uploaded in chunks with an upload session.
+    The content hash of each sheet is uploaded in a hashes file next to the workbook. With skip_unchanged, the workbook
+    is neither written nor uploaded if no sheet changed since the last upload.
+    """
+    site_name = os.path.basename(site_url)
+
+    drive_id = resolve_sharepoint_site_name(access_token, site_name, http_client)
+
+    item_path = f'{site_relative_url}/{file_name}'
+    hashes_item_path = f'{site_relative_url}/{get_hashes_file_name(file_name)}'
+    hashes = hash_dataframes(dataframes, sheet_names)
+
+    if skip_unchanged:
+        try:
+            uploaded_hashes = json.loads(get_sharepoint_item(access_token, drive_id, hashes_item_path, content=True, http_client=http_client) or "null")
+
+        except ValueError:
+            uploaded_hashes = None
+
+        if uploaded_hashes == hashes and get_sharepoint_item(access_token, drive_id, item_path, http_client=http_client):
+            logging.info(f'Workbook "{file_name}" is unchanged. Skipping Sharepoint upload...')
+            metrics.increment("output_writes_skipped_total", kind="workbook")
+            return
+
+    file_descriptor, temp_file = tempfile.mkstemp(suffix='.xlsx')
+    os.close(file_descriptor)
+
+    try:
+        export_dataframes_to_excel(temp_file, dataframes, sheet_names, streaming)
+
+        file_size = os.path.getsize(temp_file)
+
+        if file_size > upload_threshold:
+            logging.info(f'Uploading "{file_name}" ({file_size} bytes) to Sharepoint in chunks of {chunk_size} bytes...')
+            upload_file_in_chunks(access_token, drive_id, item_path, temp_file, chunk_size, http_client=http_client)
+            logging.info(f'Sharepoint sucessfully uploaded - file: "{file_name}".')
+
+        else:
+            # Small files are read in memory, so the request body can be sent again on retries
+            with open(temp_file, 'rb') as file_buffer:
+                response = put_sharepoint_content(access_token, drive_id, item_path, file_buffer.read(), http_client)
+
+            if response.status_code in [200, 201]:
+                logging.info(f'Sharepoint sucessfully uploaded - file: "{file_name}". Status code: {response.status_code}.')
+            else:
+                logging.error(f'Sharepoint upload failed - file: "{file_name}". Status code: {response.status_code} - {response.text}.')
+                raise requests.HTTPError(f'Sharepoint upload failed - file: "{file_name}". Status code: {response.status_code} - {response.text}.')
+
+    finally:
+        os.remove(temp_file)
+
+    # Uploaded last, so the hashes never describe a workbook which failed to upload
+    response = put_sharepoint_content(access_token, drive_id, hashes_item_path, json.dumps(hashes, indent=2).encode("utf-8"), http_client)
+
+    if response.status_code not in [200, 201]:
+        logging.warning(f'Failed to upload the content hashes of "{file_name}": {response.status_code} - {response.text}. The next run will upload it again.')
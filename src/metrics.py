@@ -0,0 +1,514 @@
+import os
+import sys
+import json
+import time
+import logging
+import functools
+import threading
+from datetime import datetime
+from collections.abc import Sized
+
+# Histogram buckets in seconds, for span durations and HTTP request latencies
+DURATION_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300]
+
+# Spans kept in the run report. Spans above the limit are still counted in the metrics.
+MAX_SPANS = 10000
+
+PROMETHEUS_PREFIX = "powerbi_docs_"
+
+METRICS_HELP = {
+    "span_duration_seconds": ("histogram", "Duration of instrumented functions."),
+    "span_errors_total": ("counter", "Instrumented function calls which raised an exception."),
+    "span_rows_total": ("counter", "Rows, records or items returned by instrumented functions."),
+    "span_peak_rss_bytes": ("gauge", "Highest resident set size of the process seen while a function was running."),
+    "http_request_duration_seconds": ("histogram", "Latency of HTTP requests by endpoint family, one per attempt."),
+    "http_requests_total": ("counter", "HTTP responses by endpoint family and status code, or error name when no response was received."),
+    "http_request_bytes_total": ("counter", "Bytes sent in HTTP request bodies."),
+    "http_response_bytes_total": ("counter", "Bytes received in HTTP response bodies."),
+    "http_retries_total": ("counter", "Retried HTTP requests by endpoint family and reason."),
+    "http_circuit_open_total": ("counter", "HTTP requests blocked by an open circuit breaker."),
+    "dscmd_output_bytes_total": ("counter", "Bytes of json written by Dax Studio CMD."),
+    "dax_info_cache_hits_total": ("counter", "Semantic models whose dax info was reused from the cache."),
+    "dax_info_export_duration_seconds": ("histogram", "Duration of the dax info exports of semantic models by status (ok, timeout or failed)."),
+    "dax_info_timeouts_total": ("counter", "Dax info exports killed after their timeout."),
+    "dax_info_retries_total": ("counter", "Dax info exports retried after a timeout."),
+    "dax_info_dataset_duration_seconds": ("gauge", "Export duration of the slowest semantic models of the run and of the ones which timed out."),
+    "output_frame_memory_bytes": ("gauge", "Memory used by each output frame after its declared dtypes are applied."),
+    "output_writes_skipped_total": ("counter", "Workbooks or frames not written because their content did not change."),
+    "run_duration_seconds": ("gauge", "Duration of the run."),
+    "run_success": ("gauge", "1 if the run completed without a critical error, else 0."),
+}
+
+
+def get_memory_usage():
+    """
+    Returns the current and peak resident set size of the process in bytes. Either can be None if not available.
+    """
+    if sys.platform.startswith("linux"):
+        try:
+            with open("/proc/self/status", "r") as file:
+                status = dict(line.split(":", 1) for line in file if line.startswith(("VmRSS", "VmHWM")))
+
+            return int(status["VmRSS"].split()[0]) * 1024, int(status["VmHWM"].split()[0]) * 1024
+
+        except (OSError, KeyError, ValueError):
+            return None, None
+
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD), ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t), ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)
+            ]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize, counters.PeakWorkingSetSize
+
+        return None, None
+
+    try:
+        import resource
+        # ru_maxrss is in bytes on macOS and in kilobytes on other platforms
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return None, peak if sys.platform == "darwin" else peak * 1024
+
+    except ImportError:
+        return None, None
+
+
+def count_rows(result):
+    """
+    Returns the number of rows of a function result: the sum over a tuple of results, the "value" list of a Power BI
+    Rest API response, or the length of other sized results (dataframe rows, list items, RecordTable records).
+    Returns None for other results.
+    """
+    if isinstance(result, tuple):
+        counts = [count_rows(i) for i in result]
+        return sum(counts) if counts and None not in counts else None
+
+    if isinstance(result, dict):
+        return len(result["value"]) if isinstance(result.get("value"), list) else None
+
+    if isinstance(result, (str, bytes)):
+        return None
+
+    if isinstance(result, Sized):
+        return len(result)
+
+    return None
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+
+    escaped = [(key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for key, value in labels]
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+class Span:
+    """
+    A timed block of work, see Metrics.span.
+    """
+
+    def __init__(self, name, parent, attributes):
+        self.name = name
+        self.parent = parent
+        self.attributes = attributes
+        self.started_at = None
+        self.duration = None
+        self.status = "ok"
+        self.rss_start = None
+        self.peak_rss = None
+
+    def set(self, **attributes):
+        self.attributes.update({key: value for key, value in attributes.items() if value is not None})
+
+
+class Metrics:
+    """
+    Run metrics: spans with durations, rows and memory high-water marks, HTTP requests, counters and histograms.
+    Disabled until enable() is called; while disabled, instrumented functions only pay a flag check.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.sample_interval = 0.05
+        self.started_at = None
+        self._started_perf = None
+        self._finished_perf = None
+        self.spans = []
+        self.dropped_spans = 0
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self._open_spans = set()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def enable(self, sample_interval=0.05):
+        """
+        Clears the recorded metrics and starts recording. Memory is sampled every sample_interval seconds
+        while spans are open.
+        """
+        self.disable()
+
+        with self._lock:
+            self.sample_interval = sample_interval
+            self.started_at = datetime.now()
+            self._started_perf = time.perf_counter()
+            self._finished_perf = None
+            self.spans = []
+            self.dropped_spans = 0
+            self.counters = {}
+            self.gauges = {}
+            self.histograms = {}
+            self._open_spans = set()
+
+        self.enabled = True
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample_memory, name="metrics-memory-sampler", daemon=True)
+        self._sampler.start()
+
+    def disable(self):
+        """
+        Stops recording. Recorded metrics are kept until the next enable().
+        """
+        if self.enabled:
+            self._finished_perf = time.perf_counter()
+
+        self.enabled = False
+
+        if self._sampler:
+            self._stop.set()
+            self._sampler.join()
+            self._sampler = None
+
+    def elapsed(self):
+        """
+        Returns the seconds from enable() to disable(), or to now while enabled.
+        """
+        if self._started_perf is None:
+            return None
+
+        return (self._finished_perf or time.perf_counter()) - self._started_perf
+
+    def _sample_memory(self):
+        while not self._stop.wait(self.sample_interval):
+            if not self._open_spans:
+                continue
+
+            rss = get_memory_usage()[0]
+
+            if rss is None:
+                return
+
+            with self._lock:
+                for span in self._open_spans:
+                    span.peak_rss = max(span.peak_rss or 0, rss)
+
+    def increment(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+
+        key = (name, tuple(sorted(labels.items())))
+
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_max(self, name, value, **labels):
+        """
+        Sets a gauge to value if it is higher than the current one.
+        """
+        if not self.enabled or value is None:
+            return
+
+        key = (name, tuple(sorted(labels.items())))
+
+        with self._lock:
+            self.gauges[key] = max(self.gauges.get(key, value), value)
+
+    def set_gauge(self, name, value, **labels):
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name, value, buckets=DURATION_BUCKETS, **labels):
+        """
+        Adds a value to a histogram.
+        """
+        if not self.enabled:
+            return
+
+        key = (name, tuple(sorted(labels.items())))
+
+        with self._lock:
+            histogram = self.histograms.get(key)
+
+            if histogram is None:
+                histogram = self.histograms[key] = {"buckets": list(buckets), "counts": [0] * len(buckets), "count": 0, "sum": 0.0}
+
+            for index, bound in enumerate(histogram["buckets"]):
+                if value <= bound:
+                    histogram["counts"][index] += 1
+                    break
+
+            histogram["count"] += 1
+            histogram["sum"] += value
+
+    def span(self, name, **attributes):
+        """
+        Returns a context manager which records the duration, status and memory high-water mark of a block.
+        Attributes, e.g. rows, can be added with span.set(). Spans opened in the block are recorded as its children.
+        """
+        return _SpanContext(self, name, attributes)
+
+    def _start_span(self, span):
+        stack = self._local.__dict__.setdefault("stack", [])
+        stack.append(span)
+        span.rss_start = get_memory_usage()[0]
+        span.peak_rss = span.rss_start
+        span.started_at = time.perf_counter()
+
+        with self._lock:
+            self._open_spans.add(span)
+
+    def _end_span(self, span):
+        span.duration = time.perf_counter() - span.started_at
+        self._local.stack.pop()
+        rss_end, process_peak = get_memory_usage()
+
+        with self._lock:
+            self._open_spans.discard(span)
+
+        # Without the current RSS, the process high-water mark is the best available peak
+        span.peak_rss = max(span.peak_rss or 0, rss_end or 0) or process_peak
+
+        self.observe("span_duration_seconds", span.duration, span=span.name)
+        self.set_max("span_peak_rss_bytes", span.peak_rss, span=span.name)
+
+        if span.status != "ok":
+            self.increment("span_errors_total", span=span.name)
+
+        if isinstance(span.attributes.get("rows"), int):
+            self.increment("span_rows_total", span.attributes["rows"], span=span.name)
+
+        record = {
+            "name": span.name,
+            "parent": span.parent,
+            "thread": threading.current_thread().name,
+            "start_s": round(span.started_at - self._started_perf, 6),
+            "duration_s": round(span.duration, 6),
+            "status": span.status,
+            "rss_start_bytes": span.rss_start,
+            "peak_rss_bytes": span.peak_rss,
+            **span.attributes
+        }
+
+        with self._lock:
+            if len(self.spans) < MAX_SPANS:
+                self.spans.append(record)
+            else:
+                self.dropped_spans += 1
+
+    def current_span_name(self):
+        stack = self._local.__dict__.get("stack")
+        return stack[-1].name if stack else None
+
+    def record_http_request(self, family, method, status, duration, request_bytes=0, response_bytes=0):
+        """
+        Records a single HTTP request attempt. status is the status code, or the exception name if no response was received.
+        """
+        if not self.enabled:
+            return
+
+        self.observe("http_request_duration_seconds", duration, family=family, method=method)
+        self.increment("http_requests_total", family=family, method=method, status=status)
+
+        if request_bytes:
+            self.increment("http_request_bytes_total", request_bytes, family=family)
+
+        if response_bytes:
+            self.increment("http_response_bytes_total", response_bytes, family=family)
+
+    def summarize_spans(self):
+        """
+        Returns the count, total and max duration, errors, rows and peak RSS of the spans by name.
+        """
+        summary = {}
+
+        for (name, labels), histogram in self.histograms.items():
+            if name != "span_duration_seconds":
+                continue
+
+            span_name = dict(labels)["span"]
+            summary[span_name] = {
+                "count": histogram["count"],
+                "total_s": round(histogram["sum"], 6),
+                "errors": self.counters.get(("span_errors_total", labels), 0),
+                "rows": self.counters.get(("span_rows_total", labels)),
+                "peak_rss_bytes": self.gauges.get(("span_peak_rss_bytes", labels))
+            }
+
+        for record in self.spans:
+            item = summary.get(record["name"])
+
+            if item is not None:
+                item["max_s"] = max(item.get("max_s", 0), record["duration_s"])
+
+        return summary
+
+    def to_dict(self):
+        """
+        Returns the run report: spans, their summary by name, and all counters, gauges and histograms.
+        """
+        with self._lock:
+            metrics = {}
+
+            for (name, labels), value in list(self.counters.items()) + list(self.gauges.items()):
+                metrics.setdefault(name, []).append({"labels": dict(labels), "value": value})
+
+            for (name, labels), histogram in self.histograms.items():
+                metrics.setdefault(name, []).append({"labels": dict(labels), **histogram, "counts": list(histogram["counts"])})
+
+            spans = list(self.spans)
+
+        return {
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "duration_s": round(self.elapsed(), 6) if self._started_perf else None,
+            "summary": self.summarize_spans(),
+            "metrics": metrics,
+            "spans": spans,
+            "dropped_spans": self.dropped_spans
+        }
+
+    def save_json(self, file_name):
+        """
+        Writes the run report to a json file.
+        """
+        directory = os.path.dirname(file_name)
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with open(file_name, "w", encoding="utf-8") as file:
+            json.dump(self.to_dict(), file, indent=2, default=str)
+
+        logging.info(f"Saved run metrics to {file_name}.")
+
+    def to_prometheus(self):
+        """
+        Returns the metrics in the Prometheus text exposition format.
+        """
+        with self._lock:
+            series = {}
+
+            for (name, labels), value in list(self.counters.items()) + list(self.gauges.items()):
+                series.setdefault(name, []).append(f"{PROMETHEUS_PREFIX}{name}{format_labels(labels)} {value}")
+
+            for (name, labels), histogram in self.histograms.items():
+                lines = series.setdefault(name, [])
+                cumulative = 0
+
+                for bound, count in zip(histogram["buckets"], histogram["counts"]):
+                    cumulative += count
+                    lines.append(f"{PROMETHEUS_PREFIX}{name}_bucket{format_labels(labels + (('le', bound),))} {cumulative}")
+
+                lines.append(f"{PROMETHEUS_PREFIX}{name}_bucket{format_labels(labels + (('le', '+Inf'),))} {histogram['count']}")
+                lines.append(f"{PROMETHEUS_PREFIX}{name}_sum{format_labels(labels)} {histogram['sum']}")
+                lines.append(f"{PROMETHEUS_PREFIX}{name}_count{format_labels(labels)} {histogram['count']}")
+
+        output = []
+
+        for name in sorted(series):
+            metric_type, help_text = METRICS_HELP.get(name, ("untyped", name))
+            output.append(f"# HELP {PROMETHEUS_PREFIX}{name} {help_text}")
+            output.append(f"# TYPE {PROMETHEUS_PREFIX}{name} {metric_type}")
+            output.extend(series[name])
+
+        return "\n".join(output) + "\n"
+
+    def save_prometheus(self, file_name):
+        """
+        Writes the metrics to a Prometheus textfile, e.g. for the node_exporter textfile collector.
+        The file is replaced atomically, so the collector never reads a partial file.
+        """
+        directory = os.path.dirname(file_name)
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        temp_file = f"{file_name}.tmp"
+
+        with open(temp_file, "w", encoding="utf-8") as file:
+            file.write(self.to_prometheus())
+
+        os.replace(temp_file, file_name)
+        logging.info(f"Saved Prometheus metrics to {file_name}.")
+
+
+class _SpanContext:
+    def __init__(self, metrics, name, attributes):
+        self.metrics = metrics
+        self.name = name
+        self.attributes = attributes
+        self.span = None
+
+    def __enter__(self):
+        if not self.metrics.enabled:
+            self.span = Span(self.name, None, {})
+            return self.span
+
+        self.span = Span(self.name, self.metrics.current_span_name(), dict(self.attributes))
+        self.metrics._start_span(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.span.started_at is None:
+            return False
+
+        if exc_type is not None:
+            self.span.status = "error"
+            self.span.set(error=f"{exc_type.__name__}: {exc_value}")
+
+        self.metrics._end_span(self.span)
+        return False
+
+
+# Metrics of the current run, shared by all modules
+metrics = Metrics()
+
+
+def traced(name=None):
+    """
+    Decorator which records every call of a function as a span, with the rows of its result (see count_rows).
+    """
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return func(*args, **kwargs)
+
+            with metrics.span(span_name) as span:
+                result = func(*args, **kwargs)
+                span.set(rows=count_rows(result))
+                return result
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,89 @@
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+class Pipeline:
+    """
+    Dependency-aware task runner. Each task starts as soon as all of its dependencies are done, in the
+    worker pool it was assigned to, and receives the results of its dependencies as positional arguments.
+    Tasks can be added while the pipeline is running, e.g. by a task that discovers more work.
+    """
+
+    def __init__(self, pools):
+        self.pools = pools
+        self.tasks = {}
+        self.results = {}
+        self._dependents = {}
+        self._missing = {}
+        self._ready = deque()
+        self._lock = threading.Lock()
+
+    def add_task(self, name, func, dependencies=(), pool="default"):
+        """
+        Adds a task to the pipeline. Task names must be unique.
+        """
+        if pool not in self.pools:
+            raise KeyError(f"Unknown pool {pool} for task {name}. Available pools: {', '.join(self.pools)}")
+
+        with self._lock:
+            if name in self.tasks:
+                raise ValueError(f"Duplicated task name: {name}")
+
+            self.tasks[name] = (func, tuple(dependencies), pool)
+            missing = {i for i in dependencies if i not in self.results}
+
+            if missing:
+                self._missing[name] = missing
+
+                for i in missing:
+                    self._dependents.setdefault(i, []).append(name)
+            else:
+                self._ready.append(name)
+
+    def _complete(self, name, result):
+        with self._lock:
+            self.results[name] = result
+
+            for dependent in self._dependents.pop(name, []):
+                missing = self._missing[dependent]
+                missing.discard(name)
+
+                if not missing:
+                    self._missing.pop(dependent)
+                    self._ready.append(dependent)
+
+    def run(self):
+        """
+        Runs all tasks and returns a dict of results by task name.
+        If a task fails, pending tasks are cancelled and its exception is raised.
+        """
+        executors = {pool: ThreadPoolExecutor(max_workers=max_workers) for pool, max_workers in self.pools.items()}
+        running = {}
+
+        try:
+            while True:
+                with self._lock:
+                    while self._ready:
+                        name = self._ready.popleft()
+                        func, dependencies, pool = self.tasks[name]
+                        args = [self.results[i] for i in dependencies]
+                        running[executors[pool].submit(func, *args)] = name
+
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    name = running.pop(future)
+                    self._complete(name, future.result())
+
+            if self._missing:
+                raise ValueError(f"Tasks with unresolved dependencies: {', '.join(sorted(self._missing))}")
+
+        finally:
+            for executor in executors.values():
+                executor.shutdown(wait=True, cancel_futures=True)
+
+        return self.results
@@ -0,0 +1,295 @@
+import re
+import time
+import random
+import logging
+import threading
+import requests
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+from src.metrics import metrics
+
+# Requests per second by endpoint family prefix. The longest matching prefix wins.
+# Admin Scanner API limits: getInfo and scanResult 500 requests per hour, scanStatus 10,000 requests per hour.
+DEFAULT_RATES = {
+    "api.powerbi.com/v1.0/myorg/admin/workspaces/getInfo": 500 / 3600,
+    "api.powerbi.com/v1.0/myorg/admin/workspaces/scanResult": 500 / 3600,
+    "api.powerbi.com/v1.0/myorg/admin/workspaces/scanStatus": 10000 / 3600,
+}
+DEFAULT_RATE = 20
+
+# Path segments which identify a single object, e.g. guids, Sharepoint drive ids or numbers
+ID_SEGMENT_PATTERN = re.compile(r"^([0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|b!.*|\d+)$")
+
+
+class CircuitOpenError(requests.RequestException):
+    """
+    Raised when requests to an endpoint family are blocked by an open circuit breaker.
+    """
+
+
+def get_endpoint_family(url):
+    """
+    Returns the endpoint family of an url: host and path, with object ids replaced by "*" and without query string.
+    E.g. https://api.powerbi.com/v1.0/myorg/groups/<id>/reports -> api.powerbi.com/v1.0/myorg/groups/*/reports
+    """
+    parts = urlsplit(url)
+    segments = ["*" if ID_SEGMENT_PATTERN.match(i) else i for i in parts.path.split("/") if i]
+    return "/".join([parts.netloc] + segments)
+
+
+def parse_retry_after(value):
+    """
+    Returns the number of seconds of a Retry-After header, given either in seconds or as an HTTP date.
+    """
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket which paces requests to a rate in requests per second.
+    The rate is halved on throttling (at most once per second, so concurrent throttled responses count once)
+    and recovers additively on success, up to the configured rate.
+    """
+
+    def __init__(self, rate, burst=None, min_rate=0.05):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.throttled_at = None
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Blocks until a request can be sent.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                    self.updated_at = now
+
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+
+                    wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """
+        Blocks all requests for a number of seconds, e.g. as requested by a Retry-After header.
+        """
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+            self.updated_at = max(self.updated_at, self.paused_until)
+
+    def throttle(self):
+        with self._lock:
+            now = time.monotonic()
+
+            if self.throttled_at is None or now - self.throttled_at >= 1:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self.throttled_at = now
+
+    def recover(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+
+class CircuitBreaker:
+    """
+    Stops requests to an endpoint family after consecutive failed requests (requests which still failed after their
+    retries), and lets a single trial request through once reset_timeout seconds have passed.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        Returns (allowed, trial): whether a request can be sent, and whether it is the trial request of an open
+        breaker. The outcome of a trial request must be recorded, as no other request is allowed until then.
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return True, False
+
+            if time.monotonic() - self.opened_at >= self.reset_timeout and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True, True
+
+            return False, False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_in_flight = False
+
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class RateController:
+    """
+    Shared rate control for all requests: token bucket pacing per endpoint family, Retry-After handling,
+    jittered exponential backoff for 429 and 5xx responses, and a circuit breaker per endpoint family.
+    """
+
+    def __init__(self, rates=None, default_rate=DEFAULT_RATE, max_retries=5, backoff_base=1.0, backoff_max=60.0,
+                 failure_threshold=5, reset_timeout=60):
+        self.rates = DEFAULT_RATES if rates is None else rates
+        self.default_rate = default_rate
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.buckets = {}
+        self.breakers = {}
+        self._lock = threading.Lock()
+
+    def get_rate(self, family):
+        """
+        Returns the configured rate of an endpoint family, by longest matching prefix.
+        """
+        prefixes = [i for i in self.rates if family.startswith(i)]
+        return self.rates[max(prefixes, key=len)] if prefixes else self.default_rate
+
+    def _get_family_controls(self, family):
+        with self._lock:
+            if family not in self.buckets:
+                self.buckets[family] = TokenBucket(self.get_rate(family))
+                self.breakers[family] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+
+            return self.buckets[family], self.breakers[family]
+
+    def get_backoff(self, attempt):
+        """
+        Returns the delay before a retry, with full jitter.
+        """
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def is_failure(self, response):
+        """
+        Returns whether a response counts as a failure of its endpoint family: throttled, or a server error.
+        """
+        return response.status_code == 429 or response.status_code >= 500
+
+    def send(self, url, send_request, idempotent=True, max_retries=None):
+        """
+        Sends a request with send_request(), pacing, retrying and tracking failures for the endpoint family of the url.
+        Returns the last response once retries are exhausted. Requests which are not idempotent (e.g. POSTs starting a
+        scan) are only retried when they were not processed: on 429 responses and connection timeouts.
+        The circuit breaker is only checked before the first attempt, so it never cuts the retries of a request short,
+        and it counts each request once, by its outcome after retries. The trial request of an open breaker is sent
+        once, without retries. max_retries overrides the retries of the controller, e.g. 0 for requests which the caller
+        retries itself.
+        Raises CircuitOpenError if the circuit breaker of the endpoint family is open.
+        """
+        family = get_endpoint_family(url)
+        bucket, breaker = self._get_family_controls(family)
+        allowed, trial = breaker.allow()
+
+        if not allowed:
+            metrics.increment("http_circuit_open_total", family=family)
+            raise CircuitOpenError(f"Circuit breaker open for {family} after {breaker.failures} consecutive failed requests.")
+
+        failed = None
+
+        if max_retries is None:
+            max_retries = self.max_retries
+
+        try:
+            response = self._send_with_retries(family, bucket, send_request, idempotent, 0 if trial else max_retries)
+            failed = self.is_failure(response)
+            return response
+
+        except (requests.ConnectionError, requests.Timeout):
+            failed = True
+            raise
+
+        finally:
+            # Any other outcome of a trial request (e.g. an unexpected exception) reopens the breaker
+            if failed or (failed is None and trial):
+                breaker.record_failure()
+            elif failed is False:
+                breaker.record_success()
+
+    def _send_with_retries(self, family, bucket, send_request, idempotent, max_retries):
+        for attempt in range(max_retries + 1):
+            bucket.acquire()
+
+            try:
+                response = send_request()
+
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == max_retries or not (idempotent or isinstance(e, requests.ConnectTimeout)):
+                    raise
+
+                delay = self.get_backoff(attempt)
+                metrics.increment("http_retries_total", family=family, reason=type(e).__name__)
+                logging.warning(f"Request to {family} failed: {e}. Retrying in {delay:.1f}s ({attempt + 1}/{max_retries})...")
+                time.sleep(delay)
+                continue
+
+            if not self.is_failure(response):
+                bucket.recover()
+                return response
+
+            if response.status_code == 429:
+                bucket.throttle()
+
+            elif not idempotent:
+                return response
+
+            if attempt == max_retries:
+                return response
+
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            delay = retry_after if retry_after is not None else self.get_backoff(attempt)
+            metrics.increment("http_retries_total", family=family, reason=str(response.status_code))
+            logging.warning(f"Request to {family} returned {response.status_code}. Retrying in {delay:.1f}s ({attempt + 1}/{max_retries})...")
+
+            if response.status_code == 429:
+                # Throttling applies to every worker of the endpoint family, not only this request
+                bucket.pause(delay)
+            else:
+                time.sleep(delay)
+
+        return response
@@ -0,0 +1,148 @@
+import sys
+import pandas as pd
+
+# Columns stored once per table instead of once per record, as long as all records share the same value
+CONSTANT_COLUMNS = ("extract_timestamp",)
+
+
+def intern_value(value):
+    """
+    Interns string ids, so the same id repeated across records and entities is stored once.
+    """
+    return sys.intern(value) if type(value) is str else value
+
+
+class RecordTable:
+    """
+    Column-oriented records of an extracted entity (e.g. workspaces or reports): one list of values per column
+    instead of one dict per record. Values of the *_id columns are interned, and constant columns (e.g. the run
+    extract timestamp) are stored once for the whole table.
+    Iterating yields the records as dicts, so a RecordTable can be used where a list of records is expected.
+    to_frame materializes the records as a dataframe once, and the frame is reused until records are added.
+    """
+
+    __slots__ = ("names", "columns", "constants", "length", "_interned", "_frame")
+
+    def __init__(self, names, constants=None):
+        self.names = list(names)
+        self.constants = dict(constants or {})
+        self.columns = {name: [] for name in self.names if name not in self.constants}
+        self.length = 0
+        self._interned = {name for name in self.names if name.endswith("_id")}
+        self._frame = None
+
+    @classmethod
+    def from_records(cls, records, names=None, constant_names=CONSTANT_COLUMNS):
+        """
+        Builds a table from an iterable of record dicts, with the keys of the first record as names if none are given.
+        """
+        records = list(records)
+
+        if names is None:
+            names = list(records[0]) if records else []
+
+        constants = {}
+
+        if records:
+            constants = {name: records[0].get(name) for name in constant_names if name in names}
+
+        table = cls(names, constants)
+        table.extend(records)
+        return table
+
+    def _expand_constant(self, name):
+        """
+        Stores a constant column as a list of values, once a record has another value for it.
+        """
+        value = self.constants.pop(name)
+        self.columns[name] = [value] * self.length
+
+    def append(self, record):
+        """
+        Appends a record dict. Missing keys are None, and keys which are not in names are ignored.
+        Constant columns can be left out of the record.
+        """
+        for name, value in list(self.constants.items()):
+            if name in record and record[name] != value:
+                self._expand_constant(name)
+
+        interned = self._interned
+
+        for name, column in self.columns.items():
+            value = record.get(name)
+            column.append(intern_value(value) if name in interned else value)
+
+        self.length += 1
+        self._frame = None
+
+    def extend(self, records):
+        """
+        Appends the records of an iterable of record dicts or of another RecordTable. An empty table takes the constants
+        of the first RecordTable appended to it.
+        """
+        if isinstance(records, RecordTable):
+            if not self.length:
+                for name, value in records.constants.items():
+                    if name in self.columns:
+                        del self.columns[name]
+                        self.constants[name] = value
+
+            for name, value in list(self.constants.items()):
+                if records.length and (name in records.columns or records.constants.get(name) != value):
+                    self._expand_constant(name)
+
+            for name, column in self.columns.items():
+                if name in records.columns:
+                    column.extend(records.columns[name])
+                else:
+                    column.extend([records.constants.get(name)] * records.length)
+
+            self.length += records.length
+            self._frame = None
+            return
+
+        for record in records:
+            self.append(record)
+
+    def __len__(self):
+        return self.length
+
+    def __bool__(self):
+        return self.length > 0
+
+    def __iter__(self):
+        """
+        Yields the records as dicts.
+        """
+        columns = [self.columns.get(name) for name in self.names]
+
+        for index in range(self.length):
+            yield {
+                name: column[index] if column is not None else self.constants[name]
+                for name, column in zip(self.names, columns)
+            }
+
+    def to_frame(self):
+        """
+        Returns the records as a dataframe with the names as columns. The frame is built once and cached, and callers get
+        a shallow copy, so assigning columns does not change the cached frame.
+        """
+        if self._frame is None:
+            df = pd.DataFrame(self.columns, index=range(self.length))
+
+            for name, value in self.constants.items():
+                df[name] = [value] * self.length
+
+            self._frame = df[self.names]
+
+        return self._frame.copy(deep=False)
+
+
+def as_record_table(records, names):
+    """
+    Returns records as a RecordTable with the given names, e.g. for lists of records read back from a checkpoint.
+    """
+    if isinstance(records, RecordTable):
+        return records
+
+    return RecordTable.from_records(records, names)
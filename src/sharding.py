@@ -0,0 +1,115 @@
+import os
+import shutil
+import hashlib
+import logging
+import importlib.util
+from datetime import datetime
+import pandas as pd
+from src.metrics import traced
+from src.transformer import OUTPUT_SCHEMAS, apply_output_schema
+from src.loader import export_dataframes, read_partitioned_dataframe, get_frame_name, read_json_file, write_json_file
+
+# Manifest written in a shard directory once all its partial outputs are written
+SHARD_MANIFEST_FILE = "_shard.json"
+
+
+def get_workspace_shard(workspace_id, shard_count):
+    """
+    Returns the shard of a workspace id: a stable hash of the id modulo shard_count, the same on every node and run
+    (unlike the built-in hash, which is salted per process).
+    """
+    digest = hashlib.sha256(str(workspace_id).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % shard_count
+
+
+def select_shard(workspaces_ids, shard_index, shard_count):
+    """
+    Returns the workspace ids of a shard, in their original order.
+    """
+    return [i for i in workspaces_ids if get_workspace_shard(i, shard_count) == shard_index]
+
+
+def get_shard_dir(shards_dir, shard_index, shard_count):
+    return os.path.join(shards_dir, f"shard-{shard_index}-of-{shard_count}")
+
+
+def start_shard(shards_dir, shard_index, shard_count):
+    """
+    Removes the manifest of a shard at the start of its run, so the partial outputs of a previous run are never merged
+    if this run fails.
+    """
+    manifest_file = os.path.join(get_shard_dir(shards_dir, shard_index, shard_count), SHARD_MANIFEST_FILE)
+
+    if os.path.exists(manifest_file):
+        os.remove(manifest_file)
+
+
+@traced()
+def write_shard(shards_dir, shard_index, shard_count, run_id, dataframes, sheet_names, workspaces_count, info_datasets):
+    """
+    Writes the output frames of a shard as partial outputs in its shard directory, with the PARQUET sink (or the CSV
+    sink without pyarrow), replacing the partial outputs of a previous run. The manifest is written last, so merge_shards
+    never reads a shard which is being written. A shard without workspaces has no output frames, only its manifest.
+    The manifest lists the (workspace_id, dataset_id) of the semantic models whose dax info was extracted.
+    """
+    shard_dir = get_shard_dir(shards_dir, shard_index, shard_count)
+    shutil.rmtree(shard_dir, ignore_errors=True)
+    os.makedirs(shard_dir, exist_ok=True)
+
+    if dataframes:
+        sink = "PARQUET" if importlib.util.find_spec("pyarrow") else "CSV"
+        export_dataframes(sink, shard_dir, dataframes, sheet_names)
+
+    write_json_file(os.path.join(shard_dir, SHARD_MANIFEST_FILE), {
+        "shard_index": shard_index,
+        "shard_count": shard_count,
+        "run_id": run_id,
+        "workspaces": workspaces_count,
+        "frames": [get_frame_name(i) for i in sheet_names] if dataframes else [],
+        "info_datasets": [list(i) for i in info_datasets],
+        "completed_at": datetime.now().isoformat()
+    })
+    logging.info(f"Wrote the partial outputs of shard {shard_index} of {shard_count} to {shard_dir}.")
+
+
+@traced()
+def merge_shards(shards_dir, shard_count, run_id, sheet_names):
+    """
+    Reads the partial outputs of all the shards written by write_shard, and returns the output frames of the whole
+    tenant in the order of sheet_names, and the (workspace_id, dataset_id) whose dax info was extracted by the shards. The frames of each shard are concatenated in shard order and cast to their
+    declared dtypes again, as the categories of the shards differ. Shards without workspaces are skipped.
+    Raises ValueError if the partial outputs of a shard are missing or of another run than run_id (e.g. a shard which
+    did not run), or if no shard has workspaces.
+    """
+    shard_dirs = [get_shard_dir(shards_dir, i, shard_count) for i in range(shard_count)]
+    manifests = [read_json_file(os.path.join(shard_dir, SHARD_MANIFEST_FILE)) for shard_dir in shard_dirs]
+    missing = [str(i) for i, manifest in enumerate(manifests) if manifest is None]
+
+    if missing:
+        raise ValueError(f"Missing partial outputs of shards {', '.join(missing)} of {shard_count} in {shards_dir}.")
+
+    stale = [str(i) for i, manifest in enumerate(manifests) if manifest.get("run_id") != run_id]
+
+    if stale:
+        raise ValueError(f"Partial outputs of shards {', '.join(stale)} of {shard_count} in {shards_dir} are not of run {run_id}.")
+
+    info_datasets = [tuple(i) for manifest in manifests for i in manifest.get("info_datasets", [])]
+    shard_dirs = [shard_dir for shard_dir, manifest in zip(shard_dirs, manifests) if manifest["frames"]]
+
+    if not shard_dirs:
+        raise ValueError(f"None of the {shard_count} shards in {shards_dir} has workspaces.")
+
+    dataframes = []
+
+    for sheet_name in sheet_names:
+        frame_name = get_frame_name(sheet_name)
+        parts = [read_partitioned_dataframe(shard_dir, frame_name) for shard_dir in shard_dirs]
+        df = pd.concat([i for i in parts if len(i)] or parts[:1], ignore_index=True)
+
+        if frame_name in OUTPUT_SCHEMAS:
+            df = apply_output_schema(df, frame_name)
+
+        dataframes.append(df)
+
+    logging.info(f"Merged the partial outputs of {shard_count} shards from {shards_dir}.")
+    return dataframes, info_datasets
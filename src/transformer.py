@@ -1,24 +1,152 @@
+import numpy as np
 import pandas as pd
+from itertools import chain
+from src.metrics import traced, metrics
+from src.info_rows import InfoRows, concat_info_rows
+from src.records import RecordTable
+from src.dax_dependencies import DaxDependencyIndex, OBJECT_COLUMN, OBJECT_MEASURE, OBJECT_CALCULATION_ITEM
+
+INFO_META = ["workspace_id", "workspace_name", "dataset_id", "dataset_name", "extract_timestamp"]
+INFO_RECORD_PATHS = ["info_relationships", "info_tables", "info_columns", "info_measures", "info_calculation_groups"]
+
+# Columns of the final_*_view results of dax_info_queries.dax, by record path
+INFO_COLUMNS = {
+    "info_relationships": ["relationship_id", "relationship", "from_table_id", "from_table", "from_column_id", "from_column", "from_cardinality_id",
+                           "from_cardinality", "to_cardinality_id", "to_cardinality", "to_table_id", "to_table", "to_column_id", "to_column",
+                           "is_active_flag", "cross_filtering_behavior_id", "cross_filtering_behavior", "security_filtering_behavior_id",
+                           "security_filtering_behavior", "modified_at"],
+    "info_tables": ["table_id", "table_name", "data_category", "description", "is_hidden_flag", "modified_at", "table_type", "definition", "type"],
+    "info_columns": ["column_id", "table_id", "column_name", "column_type_id", "column_type", "dax_expression", "data_type_id", "data_type",
+                     "data_category", "description", "is_hidden_flag", "modified_at", "display_folder"],
+    "info_measures": ["measure_id", "table_id", "measure_name", "description", "data_type_id", "data_type", "format_string", "dax_expression",
+                      "display_folder", "is_hidden_flag", "modified_at"],
+    "info_calculation_groups": ["calc_group_id", "calc_item_id", "calc_item_name", "expression", "calc_item_description", "modified_at", "table_id",
+                                "calc_group_description", "precedence", "table_name"]
+}
+
+# Columns of the raw INFO rowsets of dax_info_raw_queries.dax, by record path
+RAW_INFO_COLUMNS = {
+    "info_raw_relationships": ["ID", "FromTableID", "FromColumnID", "FromCardinality", "ToTableID", "ToColumnID", "ToCardinality", 
+                               "CrossFilteringBehavior", "IsActive", "SecurityFilteringBehavior", "ModifiedTime"],
+    "info_raw_tables": ["ID", "Name", "DataCategory", "Description", "IsHidden", "ModifiedTime", "SystemFlags", "CalculationGroupID"],
+    "info_raw_partitions": ["TableID", "QueryDefinition", "Type"],
+    "info_raw_columns": ["ID", "TableID", "ExplicitName", "InferredName", "Type", "Expression", "ExplicitDataType", "InferredDataType", 
+                         "DataCategory", "Description", "IsHidden", "ModifiedTime", "DisplayFolder"],
+    "info_raw_measures": ["ID", "TableID", "Name", "Description", "DataType", "FormatString", "Expression", "DisplayFolder", "IsHidden", 
+                          "IsSimpleMeasure", "ModifiedTime"],
+    "info_raw_calculation_groups": ["ID", "Description", "Precedence"],
+    "info_raw_calculation_items": ["ID", "CalculationGroupID", "Name", "Expression", "Description", "ModifiedTime"]
+}
+
+# Labels of the INFO rowsets ids, as the SWITCH expressions of dax_info_queries.dax
+INFO_CARDINALITIES = {1: "One", 2: "Many"}
+INFO_CROSS_FILTERING_ARROWS = {1: " <--- ", 2: " <---> "}
+INFO_FILTERING_BEHAVIORS = {1: "Single", 2: "Both"}
+INFO_PARTITION_TYPES = {4: "M", 2: "DAX", 7: "Internal"}
+INFO_COLUMN_TYPES = {1: "M", 2: "DAX", 3: "Row Number", 4: "Auto-generated/Parameter"}
+INFO_COLUMN_DATA_TYPES = {2: "Text", 6: "Integer", 8: "Decimal", 9: "DateTime", 10: "Currency", 11: "Boolean", 20: "Percentage"}
+INFO_MEASURE_DATA_TYPES = {2: "String", 6: "Integer", 8: "Decimal", 9: "DateTime", 10: "Currency", 11: "Boolean", 20: "Percentage"}
+
+# Columns of the workspaces and semantic models of each row, repeated across the rows of the output frames
+WORKSPACE_DTYPES = {"workspace_id": "category", "workspace_name": "category"}
+DATASET_DTYPES = {**WORKSPACE_DTYPES, "dataset_id": "category", "dataset_name": "category"}
+
+# Declared dtypes of the output frames, by frame name (see loader.get_frame_name): categoricals for low-cardinality
+# strings, int8 for 1/0 flags and datetimes for timestamps. Other columns (e.g. object names or DAX expressions) keep their dtype.
+OUTPUT_SCHEMAS = {
+    "workspaces": {
+        "type": "category", "is_dedicated_capacity": "int8", "capacity_id": "category", "dataset_storage_format": "category",
+        "extract_timestamp": "datetime64[ns]"
+    },
+    "reports": {
+        **WORKSPACE_DTYPES, "report_type": "category", "dataset_id": "category", "dataset_name": "category", "extract_timestamp": "datetime64[ns]"
+    },
+    "reports_pages": {
+        **WORKSPACE_DTYPES, "report_id": "category", "report_name": "category", "extract_timestamp": "datetime64[ns]"
+    },
+    "semantic_models": {
+        **WORKSPACE_DTYPES, "created_at": "datetime64[ns]", "extract_timestamp": "datetime64[ns]"
+    },
+    "tables": {
+        **DATASET_DTYPES, "table_type": "category", "type": "category", "is_hidden_flag": "int8", "modified_at": "datetime64[ns]",
+        "extract_timestamp": "datetime64[ns]"
+    },
+    "columns": {
+        **DATASET_DTYPES, "table_name": "category", "column_type": "category", "data_type": "category", "display_folder": "category",
+        "is_hidden_flag": "int8", "modified_at": "datetime64[ns]", "extract_timestamp": "datetime64[ns]"
+    },
+    "measures": {
+        **DATASET_DTYPES, "table_name": "category", "data_type": "category", "format_string": "category", "display_folder": "category",
+        "is_hidden_flag": "int8", "modified_at": "datetime64[ns]", "extract_timestamp": "datetime64[ns]"
+    },
+    "calculation_groups": {
+        **DATASET_DTYPES, "table_name": "category", "calc_group_description": "category", "extract_timestamp": "datetime64[ns]"
+    },
+    "relationships": {
+        **DATASET_DTYPES, "from_table": "category", "to_table": "category", "relationship": "category", "is_active_flag": "int8",
+        "modified_at": "datetime64[ns]", "extract_timestamp": "datetime64[ns]"
+    },
+    "dependencies": {
+        **DATASET_DTYPES, "object_type": "category", "table_name": "category", "referenced_object_type": "category",
+        "referenced_table_name": "category", "extract_timestamp": "datetime64[ns]"
+    },
+    "unused_objects": {
+        **DATASET_DTYPES, "object_type": "category", "table_name": "category", "is_hidden_flag": "int8", "extract_timestamp": "datetime64[ns]"
+    }
+}
+
+DEPENDENCIES_COLUMNS = ["workspace_id", "workspace_name", "dataset_id", "dataset_name", "object_type", "table_name", "object_name", 
+                        "referenced_object_type", "referenced_table_name", "referenced_object_name", "extract_timestamp"]
+UNUSED_OBJECTS_COLUMNS = ["workspace_id", "workspace_name", "dataset_id", "dataset_name", "object_type", "table_name", "object_name", 
+                          "is_hidden_flag", "extract_timestamp"]
+
+
+def to_frame(records):
+    """
+    Returns the dataframe of extracted records: the frame of a RecordTable, built once for all transforms, or the
+    pd.json_normalize of a list of records.
+    """
+    if isinstance(records, RecordTable):
+        return records.to_frame()
+
+    return pd.json_normalize(records)
+
+
+def apply_output_schema(df, frame_name):
+    """
+    Casts the columns of an output frame to the dtypes declared in OUTPUT_SCHEMAS, and records its memory usage
+    in the run metrics.
+    """
+    schema = {col: dtype for col, dtype in OUTPUT_SCHEMAS[frame_name].items() if col in df.columns}
+    df = df.astype(schema)
 
+    if metrics.enabled:
+        metrics.set_gauge("output_frame_memory_bytes", int(df.memory_usage(index=False, deep=True).sum()), frame=frame_name)
+
+    return df
+
+
+@traced()
 def transform_workspaces(workspaces_data):
     """
     Transform workspaces data.
     """
-    df = pd.json_normalize(workspaces_data)
+    df = to_frame(workspaces_data)
     df['is_dedicated_capacity'] = df['is_dedicated_capacity'].astype(int)
-    return df
+    return apply_output_schema(df, "workspaces")
 
 
+@traced()
 def transform_reports(reports_data, datasets_data, workspaces_data):
     """
     Transform reports data.
     """
-    df1 = pd.json_normalize(reports_data)
+    df1 = to_frame(reports_data)
     
-    df2 = pd.json_normalize(datasets_data)
+    df2 = to_frame(datasets_data)
     df2 = df2[["workspace_id", "dataset_id", "dataset_name"]]
 
-    df3 = pd.json_normalize(workspaces_data)
+    df3 = to_frame(workspaces_data)
     df3 = df3[["workspace_id", "workspace_name"]]
     
     df = pd.merge(df1, df2, on=["dataset_id", "workspace_id"], how="left")
@@ -27,19 +155,20 @@ def transform_reports(reports_data, datasets_data, workspaces_data):
     df = df[["workspace_id", "workspace_name", "report_id", "report_name", "report_type", "dataset_id", "dataset_name", "web_url", "extract_timestamp"]]
     df["extract_timestamp"] = pd.to_datetime(df["extract_timestamp"])
 
-    return df
+    return apply_output_schema(df, "reports")
 
 
+@traced()
 def transform_report_pages(reports_pages_data, reports_data, workspaces_data):
     """
     Transform reports pages data.
     """
-    df1 = pd.json_normalize(reports_pages_data)
+    df1 = to_frame(reports_pages_data)
 
-    df2 = pd.json_normalize(reports_data)
+    df2 = to_frame(reports_data)
     df2 = df2[["report_id", "workspace_id","report_name"]]
 
-    df3 = pd.json_normalize(workspaces_data)
+    df3 = to_frame(workspaces_data)
     df3 = df3[["workspace_id", "workspace_name"]]
 
     df = pd.merge(df1, df2, on=["report_id", "workspace_id"], how="left")
@@ -47,16 +176,17 @@ def transform_report_pages(reports_pages_data, reports_data, workspaces_data):
     df = df[["workspace_id", "workspace_name", "report_id", "report_name", "page_id", "page_name", "order", "extract_timestamp"]]
     df["extract_timestamp"] = pd.to_datetime(df["extract_timestamp"])
 
-    return df
+    return apply_output_schema(df, "reports_pages")
 
 
+@traced()
 def transform_datasets(datasets_data, workspaces_data):
     """
     Transform datasets data.
     """
-    df1 = pd.json_normalize(datasets_data)
+    df1 = to_frame(datasets_data)
 
-    df2 = pd.json_normalize(workspaces_data)
+    df2 = to_frame(workspaces_data)
     df2 = df2[["workspace_id", "workspace_name"]]
 
     df = pd.merge(df1, df2, on="workspace_id", how="left")
@@ -64,17 +194,18 @@ def transform_datasets(datasets_data, workspaces_data):
     df[["created_at", "extract_timestamp"]] = df[["created_at", "extract_timestamp"]].apply(pd.to_datetime)
     df[["created_at", "extract_timestamp"]] = df[["created_at", "extract_timestamp"]].apply(lambda col: col.dt.tz_localize(None))
 
-    return df
+    return apply_output_schema(df, "semantic_models")
 
 
+@traced()
 def resolve_workspaces_datasets_list(datasets_data, workspaces_data):
     """
     Generate a list of names and ids from workspaces and datasets.
     """
-    df1 = pd.json_normalize(datasets_data)
+    df1 = to_frame(datasets_data)
     df1 = df1[["dataset_id", "dataset_name", "workspace_id"]]
 
-    df2 = pd.json_normalize(workspaces_data)
+    df2 = to_frame(workspaces_data)
     df2 = df2[["workspace_id", "workspace_name"]]
     
     df_all = pd.merge(df1, df2, on="workspace_id", how="left")
@@ -82,86 +213,449 @@ def resolve_workspaces_datasets_list(datasets_data, workspaces_data):
     return data
 
 
-def transform_relationships_info(datasets_info_data):
+def clean_info_columns_names(df):
     """
-    Transform relationships info data.
+    Removes the square brackets from the columns names of dax info data.
     """
-    df = pd.json_normalize(datasets_info_data, meta=["workspace_id", "workspace_name", "dataset_id", "dataset_name", "extract_timestamp"], record_path="info_relationships")
     cols_cleaned_names = { col : col.lstrip("[").rstrip("]") for col in df.columns if col.startswith("[") and col.endswith("]") }
-    df = df.rename(columns=cols_cleaned_names)
+    return df.rename(columns=cols_cleaned_names)
+
+
+def normalize_info_records(datasets_info_data, record_path):
+    """
+    Flattens one info_* record path of dax info data into a dataframe with the INFO_META columns.
+    Equivalent to pd.json_normalize(datasets_info_data, meta=INFO_META, record_path=record_path) for flat rows, but much faster.
+    Rows can be lists of dicts or columnar InfoRows, which are concatenated column by column without building row dicts.
+    """
+    records = [i.get(record_path) or [] for i in datasets_info_data]
+    counts = [len(i) for i in records]
+
+    if any(isinstance(i, InfoRows) for i in records):
+        df = concat_info_rows([i if isinstance(i, InfoRows) else InfoRows.from_rows(i) for i in records])
+    else:
+        rows = list(chain.from_iterable(records))
+        df = pd.DataFrame.from_records(rows) if rows else pd.DataFrame(index=range(0))
+
+    for col in INFO_META:
+        values = np.array([i.get(col) for i in datasets_info_data], dtype=object)
+        df[col] = np.repeat(values, counts)
+
+    return clean_info_columns_names(df)
+
+
+@traced()
+def normalize_datasets_info(datasets_info_data, record_paths=INFO_RECORD_PATHS):
+    """
+    Normalizes each info_* record path of dax info data exactly once and builds the table id to table name lookup.
+    The returned frames can be shared by all transform_*_info functions. Missing columns (e.g. of record paths without
+    any row, such as calculation groups) are filled with blanks.
+    """
+    info_frames = {}
+
+    for record_path in record_paths:
+        info_frames[record_path] = normalize_info_records(datasets_info_data, record_path).reindex(columns=INFO_COLUMNS[record_path] + INFO_META)
+
+    if "info_tables" in info_frames:
+        info_frames["tables_lookup"] = build_tables_lookup(info_frames["info_tables"])
+
+    return info_frames
+
+
+def build_tables_lookup(info_tables):
+    """
+    Returns the table name of each (workspace_id, dataset_id, table_id) of the info_tables frame.
+    """
+    df = info_tables[["workspace_id", "dataset_id", "table_id", "table_name"]]
+    df = df.drop_duplicates(subset=["workspace_id", "dataset_id", "table_id"])
+    return df.set_index(["workspace_id", "dataset_id", "table_id"])
+
+
+def map_info_labels(values, labels):
+    """
+    Maps the ids of an INFO rowset column to their labels, with None for unknown or blank ids, like a DAX SWITCH with a BLANK() default.
+    """
+    mapped = values.map(labels)
+    return mapped.astype(object).where(mapped.notna(), None)
+
+
+def to_info_flags(values):
+    """
+    Converts a boolean INFO rowset column to 1/0 flags, with blanks as 0, like IF([IsHidden], 1, 0).
+    """
+    return values.fillna(False).astype(bool).astype("int64")
+
+
+def lookup_info_names(df, id_column, names, dataset_keys=("workspace_id", "dataset_id")):
+    """
+    Returns the "name" of names for the id_column of each row of df, within the same dataset, with a left hash join.
+    names must have the dataset keys, an "ID" column and a "name" column.
+    """
+    keys = list(dataset_keys)
+    right = names[keys + ["ID", "name"]].drop_duplicates(subset=keys + ["ID"]).rename(columns={"ID": id_column})
+    return df[keys + [id_column]].merge(right, on=keys + [id_column], how="left")["name"].to_numpy()
+
+
+def normalize_raw_info_records(datasets_info_data, record_path, columns):
+    """
+    Flattens one info_raw_* record path into a dataframe with the given INFO rowset columns and the INFO_META columns.
+    Missing columns (e.g. on datasets without any row) are filled with blanks.
+    """
+    df = normalize_info_records(datasets_info_data, record_path)
+    return df.reindex(columns=columns + INFO_META)
+
+
+def resolve_raw_relationships_info(relationships, tables, columns):
+    """
+    Resolves the raw INFO.RELATIONSHIPS rowset into the final_relationships_view columns of dax_info_queries.dax.
+    """
+    table_names = tables.rename(columns={"Name": "name"})
+    column_names = columns[columns["Type"] != 3].assign(name=lambda df: df["ExplicitName"].fillna(df["InferredName"]))
+
+    from_cardinality = map_info_labels(relationships["FromCardinality"], INFO_CARDINALITIES)
+    to_cardinality = map_info_labels(relationships["ToCardinality"], INFO_CARDINALITIES)
+    arrow = map_info_labels(relationships["CrossFilteringBehavior"], INFO_CROSS_FILTERING_ARROWS)
+
+    df = pd.DataFrame({
+        "relationship_id": relationships["ID"],
+        "relationship": from_cardinality.fillna("") + arrow.fillna("") + to_cardinality.fillna(""),
+        "from_table_id": relationships["FromTableID"],
+        "from_table": lookup_info_names(relationships, "FromTableID", table_names),
+        "from_column_id": relationships["FromColumnID"],
+        "from_column": lookup_info_names(relationships, "FromColumnID", column_names),
+        "from_cardinality_id": relationships["FromCardinality"],
+        "from_cardinality": from_cardinality,
+        "to_cardinality_id": relationships["ToCardinality"],
+        "to_cardinality": to_cardinality,
+        "to_table_id": relationships["ToTableID"],
+        "to_table": lookup_info_names(relationships, "ToTableID", table_names),
+        "to_column_id": relationships["ToColumnID"],
+        "to_column": lookup_info_names(relationships, "ToColumnID", column_names),
+        "is_active_flag": to_info_flags(relationships["IsActive"]),
+        "cross_filtering_behavior_id": relationships["CrossFilteringBehavior"],
+        "cross_filtering_behavior": map_info_labels(relationships["CrossFilteringBehavior"], INFO_FILTERING_BEHAVIORS),
+        "security_filtering_behavior_id": relationships["SecurityFilteringBehavior"],
+        "security_filtering_behavior": map_info_labels(relationships["SecurityFilteringBehavior"], INFO_FILTERING_BEHAVIORS),
+        "modified_at": relationships["ModifiedTime"]
+    })
+
+    return pd.concat([df, relationships[INFO_META]], axis=1)
+
+
+def resolve_raw_tables_info(tables, partitions):
+    """
+    Resolves the raw INFO.TABLES and INFO.PARTITIONS rowsets into the final_tables_view columns of dax_info_queries.dax.
+    """
+    tables = tables[tables["CalculationGroupID"] != 1]
+    is_calculation_group = tables["CalculationGroupID"].notna() & (tables["CalculationGroupID"] != 0)
+
+    df = pd.DataFrame({
+        "table_id": tables["ID"],
+        "table_name": tables["Name"],
+        "data_category": np.where(tables["DataCategory"] == "Time", "Time", "Regular"),
+        "description": tables["Description"],
+        "is_hidden_flag": to_info_flags(tables["IsHidden"]),
+        "modified_at": tables["ModifiedTime"],
+        "table_type": np.where(
+            tables["SystemFlags"].fillna(0) == 0, 
+            np.where(is_calculation_group, "Calculation Group", "Power Query Table"), 
+            "DAX Table"
+        )
+    })
+    df = pd.concat([df, tables[INFO_META]], axis=1)
+
+    partitions = pd.DataFrame({
+        "workspace_id": partitions["workspace_id"],
+        "dataset_id": partitions["dataset_id"],
+        "table_id": partitions["TableID"],
+        "definition": partitions["QueryDefinition"],
+        "type": map_info_labels(partitions["Type"], INFO_PARTITION_TYPES)
+    })
+
+    df = df.merge(partitions, on=["workspace_id", "dataset_id", "table_id"], how="left")
+    return df[["table_id", "table_name", "data_category", "description", "is_hidden_flag", "modified_at", "table_type", "definition", "type"] + INFO_META]
+
+
+def resolve_raw_columns_info(columns):
+    """
+    Resolves the raw INFO.COLUMNS rowset into the final_columns_view columns of dax_info_queries.dax.
+    """
+    columns = columns[columns["Type"] != 3]
+    data_type_id = columns["ExplicitDataType"].where(columns["ExplicitDataType"] != 1, columns["InferredDataType"])
+
+    df = pd.DataFrame({
+        "column_id": columns["ID"],
+        "table_id": columns["TableID"],
+        "column_name": columns["ExplicitName"].fillna(columns["InferredName"]),
+        "column_type_id": columns["Type"],
+        "column_type": map_info_labels(columns["Type"], INFO_COLUMN_TYPES),
+        "dax_expression": columns["Expression"],
+        "data_type_id": data_type_id,
+        "data_type": map_info_labels(data_type_id, INFO_COLUMN_DATA_TYPES),
+        "data_category": columns["DataCategory"],
+        "description": columns["Description"],
+        "is_hidden_flag": to_info_flags(columns["IsHidden"]),
+        "modified_at": columns["ModifiedTime"],
+        "display_folder": columns["DisplayFolder"]
+    })
+
+    return pd.concat([df, columns[INFO_META]], axis=1).reset_index(drop=True)
+
+
+def resolve_raw_measures_info(measures):
+    """
+    Resolves the raw INFO.MEASURES rowset into the final_measures_view columns of dax_info_queries.dax.
+    """
+    measures = measures[~measures["IsSimpleMeasure"].fillna(False).astype(bool)]
+
+    df = pd.DataFrame({
+        "measure_id": measures["ID"],
+        "table_id": measures["TableID"],
+        "measure_name": measures["Name"],
+        "description": measures["Description"],
+        "data_type_id": measures["DataType"],
+        "data_type": map_info_labels(measures["DataType"], INFO_MEASURE_DATA_TYPES),
+        "format_string": measures["FormatString"],
+        "dax_expression": measures["Expression"],
+        "display_folder": measures["DisplayFolder"],
+        "is_hidden_flag": to_info_flags(measures["IsHidden"]),
+        "modified_at": measures["ModifiedTime"]
+    })
+
+    return pd.concat([df, measures[INFO_META]], axis=1).reset_index(drop=True)
+
+
+def resolve_raw_calculation_groups_info(calculation_items, calculation_groups, tables):
+    """
+    Resolves the raw INFO.CALCULATIONITEMS, INFO.CALCULATIONGROUPS and INFO.TABLES rowsets into the
+    final_calculation_groups_view columns of dax_info_queries.dax. The table of a calculation group is the table
+    whose CalculationGroupID is the calculation group ID.
+    """
+    keys = ["workspace_id", "dataset_id"]
+
+    df = pd.DataFrame({
+        "calc_group_id": calculation_items["CalculationGroupID"],
+        "calc_item_id": calculation_items["ID"],
+        "calc_item_name": calculation_items["Name"],
+        "expression": calculation_items["Expression"],
+        "calc_item_description": calculation_items["Description"],
+        "modified_at": calculation_items["ModifiedTime"]
+    })
+    df = pd.concat([df, calculation_items[INFO_META]], axis=1)
+
+    groups_tables = tables[tables["CalculationGroupID"].notna()]
+    groups_tables = groups_tables[keys + ["CalculationGroupID", "ID", "Name"]].drop_duplicates(subset=keys + ["CalculationGroupID"])
+    groups_tables = groups_tables.rename(columns={"CalculationGroupID": "calc_group_id", "ID": "table_id", "Name": "table_name"})
+
+    groups = pd.DataFrame({
+        "workspace_id": calculation_groups["workspace_id"],
+        "dataset_id": calculation_groups["dataset_id"],
+        "calc_group_id": calculation_groups["ID"],
+        "calc_group_description": calculation_groups["Description"],
+        "precedence": calculation_groups["Precedence"]
+    })
+    groups = groups.merge(groups_tables, on=keys + ["calc_group_id"], how="left")
+
+    df = df.merge(groups, on=keys + ["calc_group_id"], how="left")
+    return df[["calc_group_id", "calc_item_id", "calc_item_name", "expression", "calc_item_description", "modified_at", "table_id", 
+               "calc_group_description", "precedence", "table_name"] + INFO_META]
+
+
+@traced()
+def normalize_raw_datasets_info(datasets_info_data):
+    """
+    Normalizes the raw INFO rowsets of dax info data (DAX_QUERY_MODE RAW) and resolves ids to names, labels and flags
+    with hash joins and vectorized mappings instead of DAX lookups.
+    Returns the same info_* frames and tables lookup as normalize_datasets_info on the dax_info_queries.dax results.
+    """
+    raw = {
+        record_path: normalize_raw_info_records(datasets_info_data, record_path, columns)
+        for record_path, columns in RAW_INFO_COLUMNS.items()
+    }
+
+    info_frames = {
+        "info_relationships": resolve_raw_relationships_info(raw["info_raw_relationships"], raw["info_raw_tables"], raw["info_raw_columns"]),
+        "info_tables": resolve_raw_tables_info(raw["info_raw_tables"], raw["info_raw_partitions"]),
+        "info_columns": resolve_raw_columns_info(raw["info_raw_columns"]),
+        "info_measures": resolve_raw_measures_info(raw["info_raw_measures"]),
+        "info_calculation_groups": resolve_raw_calculation_groups_info(
+            raw["info_raw_calculation_items"], raw["info_raw_calculation_groups"], raw["info_raw_tables"]
+        )
+    }
+    info_frames["tables_lookup"] = build_tables_lookup(info_frames["info_tables"])
+
+    return info_frames
+
+
+@traced()
+def transform_relationships_info(datasets_info_data, info_frames=None):
+    """
+    Transform relationships info data.
+    """
+    if info_frames is None:
+        info_frames = normalize_datasets_info(datasets_info_data, ["info_relationships"])
+
+    df = info_frames["info_relationships"]
     df = df[["workspace_id", "workspace_name", "dataset_id", "dataset_name", "from_table", "from_column", "relationship", "to_table", 
-             "to_column", "is_active_flag", "modified_at", "extract_timestamp"]]
+             "to_column", "is_active_flag", "modified_at", "extract_timestamp"]].copy()
     df[["modified_at", "extract_timestamp"]] = df[["modified_at", "extract_timestamp"]].apply(pd.to_datetime)
     df[["modified_at", "extract_timestamp"]] = df[["modified_at", "extract_timestamp"]].apply(lambda col: col.dt.tz_localize(None))
-    return df
+    return apply_output_schema(df, "relationships")
 
 
-def transform_tables_info(datasets_info_data):
+@traced()
+def transform_tables_info(datasets_info_data, info_frames=None):
     """
     Transform tables info data.
     """
-    df = pd.json_normalize(datasets_info_data, meta=["workspace_id", "workspace_name", "dataset_id", "dataset_name", "extract_timestamp"], record_path="info_tables")
-    cols_cleaned_names = { col : col.lstrip("[").rstrip("]") for col in df.columns if col.startswith("[") and col.endswith("]") }
-    df = df.rename(columns=cols_cleaned_names)
+    if info_frames is None:
+        info_frames = normalize_datasets_info(datasets_info_data, ["info_tables"])
+
+    df = info_frames["info_tables"]
     df = df[["workspace_id", "workspace_name", "dataset_id", "dataset_name", "table_name", "description", "table_type", "type", 
-             "is_hidden_flag", "definition", "modified_at", "extract_timestamp"]]
+             "is_hidden_flag", "definition", "modified_at", "extract_timestamp"]].copy()
     df[["modified_at", "extract_timestamp"]] = df[["modified_at", "extract_timestamp"]].apply(pd.to_datetime)
     df[["modified_at", "extract_timestamp"]] = df[["modified_at", "extract_timestamp"]].apply(lambda col: col.dt.tz_localize(None))
-    return df
+    return apply_output_schema(df, "tables")
 
 
-def transform_columns_info(datasets_info_data):
+@traced()
+def transform_columns_info(datasets_info_data, info_frames=None):
     """
     Transform columns info data.
     """
-    df1 = pd.json_normalize(datasets_info_data, meta=["workspace_id", "workspace_name", "dataset_id", "dataset_name", "extract_timestamp"], record_path="info_columns")
-    cols_cleaned_names = { col : col.lstrip("[").rstrip("]") for col in df1.columns if col.startswith("[") and col.endswith("]") }
-    df1 = df1.rename(columns=cols_cleaned_names)
+    if info_frames is None:
+        info_frames = normalize_datasets_info(datasets_info_data, ["info_columns", "info_tables"])
 
-    df2 = pd.json_normalize(datasets_info_data, meta=["workspace_id", "workspace_name", "dataset_id", "dataset_name", "extract_timestamp"], record_path="info_tables")
-    cols_cleaned_names = { col : col.lstrip("[").rstrip("]") for col in df2.columns if col.startswith("[") and col.endswith("]") }
-    df2 = df2.rename(columns=cols_cleaned_names)
-    df2 = df2[["workspace_id", "dataset_id", "table_id", "table_name"]]
-
-    df = pd.merge(df1, df2, on=["workspace_id", "dataset_id", "table_id"], how="left")
+    df = info_frames["info_columns"].join(info_frames["tables_lookup"], on=["workspace_id", "dataset_id", "table_id"])
     df = df[["workspace_id", "workspace_name", "dataset_id", "dataset_name", "table_name", "column_name", "column_type", "dax_expression", 
-            "data_type", "description", "display_folder", "is_hidden_flag", "modified_at", "extract_timestamp"]]
+            "data_type", "description", "display_folder", "is_hidden_flag", "modified_at", "extract_timestamp"]].copy()
     df[["modified_at", "extract_timestamp"]] = df[["modified_at", "extract_timestamp"]].apply(pd.to_datetime)
     df[["modified_at", "extract_timestamp"]] = df[["modified_at", "extract_timestamp"]].apply(lambda col: col.dt.tz_localize(None))
     
-    return df
+    return apply_output_schema(df, "columns")
 
 
-def transform_measures_info(datasets_info_data):
+@traced()
+def transform_measures_info(datasets_info_data, info_frames=None):
     """
     Transform measures info data.
     """
-    df1 = pd.json_normalize(datasets_info_data, meta=["workspace_id", "workspace_name", "dataset_id", "dataset_name", "extract_timestamp"], record_path="info_measures")
-    cols_cleaned_names = { col : col.lstrip("[").rstrip("]") for col in df1.columns if col.startswith("[") and col.endswith("]") }
-    df1 = df1.rename(columns=cols_cleaned_names)
-
-    df2 = pd.json_normalize(datasets_info_data, meta=["workspace_id", "workspace_name", "dataset_id", "dataset_name", "extract_timestamp"], record_path="info_tables")
-    cols_cleaned_names = { col : col.lstrip("[").rstrip("]") for col in df2.columns if col.startswith("[") and col.endswith("]") }
-    df2 = df2.rename(columns=cols_cleaned_names)
-    df2 = df2[["workspace_id", "dataset_id", "table_id", "table_name"]]
+    if info_frames is None:
+        info_frames = normalize_datasets_info(datasets_info_data, ["info_measures", "info_tables"])
 
-    df = pd.merge(df1, df2, on=["workspace_id", "dataset_id", "table_id"], how="left")
+    df = info_frames["info_measures"].join(info_frames["tables_lookup"], on=["workspace_id", "dataset_id", "table_id"])
 
     df = df[["workspace_id", "workspace_name", "dataset_id", "dataset_name", "table_name", "measure_name", "dax_expression", "data_type", 
-             "description", "format_string", "display_folder", "is_hidden_flag", "modified_at", "extract_timestamp"]]
+             "description", "format_string", "display_folder", "is_hidden_flag", "modified_at", "extract_timestamp"]].copy()
     df[["modified_at", "extract_timestamp"]] = df[["modified_at", "extract_timestamp"]].apply(pd.to_datetime)
     df[["modified_at", "extract_timestamp"]] = df[["modified_at", "extract_timestamp"]].apply(lambda col: col.dt.tz_localize(None))
     
-    return df
+    return apply_output_schema(df, "measures")
 
 
-def transform_calc_groups(datasets_info_data):
+@traced()
+def transform_calc_groups(datasets_info_data, info_frames=None):
     """
     Transform calculation groups data.
     """
-    df = pd.json_normalize(datasets_info_data, meta=["workspace_id", "workspace_name", "dataset_id", "dataset_name", "extract_timestamp"], record_path="info_calculation_groups")
-    cols_cleaned_names = { col : col.lstrip("[").rstrip("]") for col in df.columns if col.startswith("[") and col.endswith("]") }
-    df = df.rename(columns=cols_cleaned_names)
-    df = df[["workspace_id", "workspace_name", "dataset_id", "dataset_name", "table_name", "calc_item_name", "expression", "calc_group_description", "extract_timestamp"]]
+    if info_frames is None:
+        info_frames = normalize_datasets_info(datasets_info_data, ["info_calculation_groups"])
+
+    df = info_frames["info_calculation_groups"]
+    df = df[["workspace_id", "workspace_name", "dataset_id", "dataset_name", "table_name", "calc_item_name", "expression", "calc_group_description", "extract_timestamp"]].copy()
+    df["extract_timestamp"] = pd.to_datetime(df["extract_timestamp"])
+    return apply_output_schema(df, "calculation_groups")
+
+
+def iter_frame_rows(df, columns):
+    """
+    Yields the values of columns of each row of a frame as tuples, with None for missing values.
+    """
+    values = [df[col].astype(object).where(df[col].notna(), None).tolist() for col in columns]
+    return zip(*values)
+
+
+@traced()
+def build_dax_dependency_index(columns_df, measures_df, calc_groups_df, relationships_df):
+    """
+    Indexes the columns and measures of the transformed info frames, and resolves the references of the measures,
+    calculated columns and calculation items DAX expressions into a DaxDependencyIndex, in one pass over each frame.
+    Columns of calculation group tables and columns used by relationships are never unused.
+    """
+    index = DaxDependencyIndex()
+    model_columns = ["workspace_id", "workspace_name", "dataset_id", "dataset_name", "extract_timestamp"]
+    calc_group_tables = {
+        (workspace_id, dataset_id, table_name)
+        for workspace_id, dataset_id, table_name in iter_frame_rows(calc_groups_df, ["workspace_id", "dataset_id", "table_name"])
+    }
+
+    for df in [columns_df, measures_df, calc_groups_df]:
+        for workspace_id, workspace_name, dataset_id, dataset_name, extract_timestamp in iter_frame_rows(df, model_columns):
+            index.add_model((workspace_id, dataset_id), workspace_name, dataset_name, extract_timestamp)
+
+    column_rows = list(iter_frame_rows(columns_df, ["workspace_id", "dataset_id", "table_name", "column_name", "dax_expression", "is_hidden_flag"]))
+    measure_rows = list(iter_frame_rows(measures_df, ["workspace_id", "dataset_id", "table_name", "measure_name", "dax_expression", "is_hidden_flag"]))
+
+    for workspace_id, dataset_id, table_name, column_name, _, is_hidden_flag in column_rows:
+        if table_name is not None and column_name is not None:
+            candidate = (workspace_id, dataset_id, table_name) not in calc_group_tables
+            index.add_column((workspace_id, dataset_id), table_name, column_name, is_hidden_flag, candidate)
+
+    for workspace_id, dataset_id, table_name, measure_name, _, is_hidden_flag in measure_rows:
+        if measure_name is not None:
+            index.add_measure((workspace_id, dataset_id), table_name, measure_name, is_hidden_flag)
+
+    for workspace_id, dataset_id, table_name, column_name, expression, _ in column_rows:
+        if expression and column_name is not None:
+            index.add_expression((workspace_id, dataset_id), OBJECT_COLUMN, table_name, column_name, expression)
+
+    for workspace_id, dataset_id, table_name, measure_name, expression, _ in measure_rows:
+        if expression and measure_name is not None:
+            index.add_expression((workspace_id, dataset_id), OBJECT_MEASURE, table_name, measure_name, expression)
+
+    calc_item_columns = ["workspace_id", "dataset_id", "table_name", "calc_item_name", "expression"]
+
+    for workspace_id, dataset_id, table_name, calc_item_name, expression in iter_frame_rows(calc_groups_df, calc_item_columns):
+        if expression and calc_item_name is not None:
+            index.add_expression((workspace_id, dataset_id), OBJECT_CALCULATION_ITEM, table_name, calc_item_name, expression)
+
+    relationship_columns = ["workspace_id", "dataset_id", "from_table", "from_column", "to_table", "to_column"]
+
+    for workspace_id, dataset_id, from_table, from_column, to_table, to_column in iter_frame_rows(relationships_df, relationship_columns):
+        for table_name, column_name in [(from_table, from_column), (to_table, to_column)]:
+            if table_name is not None and column_name is not None:
+                index.add_relationship_column((workspace_id, dataset_id), table_name, column_name)
+
+    return index
+
+
+@traced()
+def transform_dax_dependencies(dependency_index):
+    """
+    Transform the dependency edges of a DaxDependencyIndex: one row per measure, calculated column or calculation item
+    and column or measure its DAX expression refers to.
+    """
+    models = dependency_index.models
+    rows = [
+        (model[0], models[model][0], model[1], models[model][1]) + source + target + (models[model][2],)
+        for model, source, target in dependency_index.edges
+    ]
+    df = pd.DataFrame(rows, columns=DEPENDENCIES_COLUMNS)
+    df["extract_timestamp"] = pd.to_datetime(df["extract_timestamp"])
+    return apply_output_schema(df, "dependencies")
+
+
+@traced()
+def transform_unused_objects(dependency_index):
+    """
+    Transform the columns and measures of a DaxDependencyIndex which no DAX expression or relationship of their semantic
+    model refers to. They may still be used by reports visuals, which are not part of the semantic models info.
+    """
+    models = dependency_index.models
+    rows = [
+        (model[0], models[model][0], model[1], models[model][1], object_type, table_name, name, is_hidden_flag, models[model][2])
+        for model, object_type, table_name, name, is_hidden_flag in dependency_index.iter_unused()
+    ]
+    df = pd.DataFrame(rows, columns=UNUSED_OBJECTS_COLUMNS)
     df["extract_timestamp"] = pd.to_datetime(df["extract_timestamp"])
-    return df
\ No newline at end of file
+    return apply_output_schema(df, "unused_objects")